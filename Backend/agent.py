@@ -1,19 +1,41 @@
 
 import os
-from google.adk.agents import LlmAgent
+from google.adk.agents import LlmAgent, SequentialAgent
 from google.adk.runners import Runner
 from google.adk.sessions.in_memory_session_service import InMemorySessionService
 from google.genai import types
 from dotenv import load_dotenv
 from google.adk.models.lite_llm import LiteLlm
 from tools.doc_checker import query_manim_docs, search_manim_docs
-from tools.cloud_render import render_manim_code, check_render_status, stitch_cloud_video
+from tools.cloud_render import render_manim_code, check_render_status, stitch_cloud_video, wait_for_render
+from tools.preflight import preflight_manim_code
+from tools.concurrency import offload
+from session_store import SqliteSessionService
+from context_compaction import compact_context
+from response_cache import serve_cached_response, cache_response
+from agent_telemetry import TelemetryPlugin
+from pipeline import (
+    EXPLANATION_KEY, STORYBOARD_KEY, RENDER_SUMMARY_KEY, LessonAssembler, StageReset, forward_state
+)
 
 load_dotenv()
 
 # Get OpenAI API key from environment
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Per-call deadlines (seconds) for tools run off the event loop.
+# The local render fallback runs manim for every scene, so it gets a much longer budget.
+DOC_TOOL_TIMEOUT = float(os.getenv("DOC_TOOL_TIMEOUT", "30"))
+RENDER_TOOL_TIMEOUT = float(os.getenv("RENDER_TOOL_TIMEOUT", "900"))
+DISPATCH_TOOL_TIMEOUT = float(os.getenv("DISPATCH_TOOL_TIMEOUT", "60"))
+
+# "pipeline": Tutor -> ScriptWriter -> ManimCoder in fixed order, lesson JSON built in Python.
+# "agentic": the Orchestrator LLM decides the handoffs and writes the JSON itself.
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "agentic").lower()
+
+# "sqlite": persistent, bounded store (see session_store.py). "memory": ADK's unbounded in-process store.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite").lower()
+
 def load_prompt(name):
     path = os.path.join(os.path.dirname(__file__), "prompts", f"{name}.md")
     if os.path.exists(path):
@@ -31,47 +53,169 @@ def openai_model(model_name: str = "gpt-4o"):
     )
 
 
-# Initialize Agents - ALL using OpenAI now
-# Agent Hierarchy: Central Orchestrator
-# Orchestrator manages optimal flow between specialized agents
-
-# 1. Specialized Agents (Leaf nodes)
-manim_coder = LlmAgent(
-    name="ManimCoder",
-    model=openai_model("gpt-5.2"),
-    instruction=load_prompt("manim"),
-    tools=[query_manim_docs, search_manim_docs, render_manim_code, check_render_status, stitch_cloud_video]
+# Tutor and ScriptWriter answers depend only on the topic, so repeats are served from cache
+CACHED_RESPONSE_CALLBACKS = dict(
+    before_model_callback=[serve_cached_response, compact_context],
+    after_model_callback=cache_response,
 )
 
-script_writer = LlmAgent(
-    name="ScriptWriter",
-    model=openai_model("gpt-4o"),
-    instruction=load_prompt("script")
-)
 
-tutor = LlmAgent(
-    name="Tutor",
-    model=openai_model("gpt-4o"),
-    instruction=load_prompt("tutor")
-)
+# Model assigned to each agent
+AGENT_MODELS = {
+    "ManimCoder": "gpt-5.2",
+    "ScriptWriter": "gpt-4o",
+    "Tutor": "gpt-4o",
+    "Orchestrator": "gpt-4o",
+}
 
-# 2. Orchestrator (Root)
-# Controls the entire flow and hands off to specialists
-orchestrator = LlmAgent(
-    name="Orchestrator",
-    model=openai_model("gpt-4o"),
-    instruction=load_prompt("orchestrator"),
-    sub_agents=[tutor, script_writer, manim_coder]
-)
+
+def default_manim_tools():
+    """ManimCoder's tools, each run off the event loop with its own deadline."""
+    return [
+        offload(query_manim_docs, timeout=DOC_TOOL_TIMEOUT),
+        offload(search_manim_docs, timeout=DOC_TOOL_TIMEOUT),
+        # Long calls get their own pool so they cannot starve the doc lookups
+        offload(preflight_manim_code, timeout=RENDER_TOOL_TIMEOUT, pool="render"),
+        offload(render_manim_code, timeout=RENDER_TOOL_TIMEOUT, pool="render"),
+        offload(wait_for_render, timeout=RENDER_TOOL_TIMEOUT, pool="render"),
+        offload(check_render_status, timeout=DISPATCH_TOOL_TIMEOUT),
+        offload(stitch_cloud_video, timeout=DISPATCH_TOOL_TIMEOUT),
+    ]
+
+
+def build_orchestrator(model_for=None, manim_tools=None):
+    """
+    Build the agent tree.
+
+    Args:
+        model_for: Callable (agent_name, model_name) -> model. Defaults to
+            OpenAI via LiteLLM; the replay harness swaps in recorded models.
+        manim_tools: Tool list for ManimCoder. Defaults to the real tools.
+    """
+    if model_for is None:
+        model_for = lambda agent_name, model_name: openai_model(model_name)
+    if manim_tools is None:
+        manim_tools = default_manim_tools()
+
+    # Initialize Agents - ALL using OpenAI now
+    # Agent Hierarchy: Central Orchestrator
+    # Orchestrator manages optimal flow between specialized agents
+
+    # 1. Specialized Agents (Leaf nodes)
+    manim_coder = LlmAgent(
+        name="ManimCoder",
+        model=model_for("ManimCoder", AGENT_MODELS["ManimCoder"]),
+        before_model_callback=compact_context,
+        instruction=load_prompt("manim"),
+        tools=manim_tools
+    )
+
+    script_writer = LlmAgent(
+        name="ScriptWriter",
+        model=model_for("ScriptWriter", AGENT_MODELS["ScriptWriter"]),
+        **CACHED_RESPONSE_CALLBACKS,
+        instruction=load_prompt("script")
+    )
+
+    tutor = LlmAgent(
+        name="Tutor",
+        model=model_for("Tutor", AGENT_MODELS["Tutor"]),
+        **CACHED_RESPONSE_CALLBACKS,
+        instruction=load_prompt("tutor")
+    )
+
+    # 2. Orchestrator (Root)
+    # Controls the entire flow and hands off to specialists
+    return LlmAgent(
+        name="Orchestrator",
+        model=model_for("Orchestrator", AGENT_MODELS["Orchestrator"]),
+        before_model_callback=compact_context,
+        instruction=load_prompt("orchestrator"),
+        sub_agents=[tutor, script_writer, manim_coder]
+    )
+
+
+def build_pipeline(model_for=None, manim_tools=None):
+    """
+    Build the deterministic agent tree: no Orchestrator model calls or
+    transfer_to_agent handoffs. Each stage stores its final text in session
+    state (output_key) and the next stage receives it in its instruction.
+
+    Args:
+        model_for: Callable (agent_name, model_name) -> model, as in build_orchestrator.
+        manim_tools: Tool list for ManimCoder. Defaults to the real tools.
+    """
+    if model_for is None:
+        model_for = lambda agent_name, model_name: openai_model(model_name)
+    if manim_tools is None:
+        manim_tools = default_manim_tools()
+
+    no_transfers = dict(disallow_transfer_to_parent=True, disallow_transfer_to_peers=True)
+
+    tutor = LlmAgent(
+        name="Tutor",
+        model=model_for("Tutor", AGENT_MODELS["Tutor"]),
+        **CACHED_RESPONSE_CALLBACKS,
+        instruction=load_prompt("tutor"),
+        output_key=EXPLANATION_KEY,
+        **no_transfers
+    )
+
+    script_writer = LlmAgent(
+        name="ScriptWriter",
+        model=model_for("ScriptWriter", AGENT_MODELS["ScriptWriter"]),
+        **CACHED_RESPONSE_CALLBACKS,
+        instruction=forward_state(load_prompt("script"), (EXPLANATION_KEY, "Explanation from the Tutor")),
+        output_key=STORYBOARD_KEY,
+        **no_transfers
+    )
+
+    manim_coder = LlmAgent(
+        name="ManimCoder",
+        model=model_for("ManimCoder", AGENT_MODELS["ManimCoder"]),
+        before_model_callback=compact_context,
+        instruction=forward_state(load_prompt("manim"), (STORYBOARD_KEY, "Storyboard from the ScriptWriter")),
+        tools=manim_tools,
+        output_key=RENDER_SUMMARY_KEY,
+        **no_transfers
+    )
+
+    return SequentialAgent(
+        name="Pipeline",
+        sub_agents=[
+            StageReset(name="StageReset"),
+            tutor, script_writer, manim_coder,
+            LessonAssembler(name="LessonAssembler")
+        ]
+    )
+
+
+def build_agent(mode=None, model_for=None, manim_tools=None):
+    """Build the agent tree for `mode` ("pipeline" or "agentic"; defaults to PIPELINE_MODE)."""
+    mode = (mode or PIPELINE_MODE).lower()
+    if mode == "agentic":
+        return build_orchestrator(model_for=model_for, manim_tools=manim_tools)
+    if mode == "pipeline":
+        return build_pipeline(model_for=model_for, manim_tools=manim_tools)
+    raise ValueError(f"Unknown PIPELINE_MODE '{mode}' (expected 'pipeline' or 'agentic')")
+
+
+def build_runner(agent, session_service=None):
+    """Create a Runner for `agent`, with an in-memory session service by default."""
+    return Runner(
+        agent=agent,
+        app_name="Chalkline",
+        session_service=session_service or InMemorySessionService(),
+        plugins=[TelemetryPlugin()],
+        auto_create_session=True
+    )
+
+
+orchestrator = build_agent()
 
 # Create Runner with session service
-session_service = InMemorySessionService()
-runner = Runner(
-    agent=orchestrator,
-    app_name="Chalkline",
-    session_service=session_service,
-    auto_create_session=True
-)
+session_service = SqliteSessionService() if SESSION_BACKEND == "sqlite" else InMemorySessionService()
+runner = build_runner(orchestrator, session_service)
 
 async def process_request(user_prompt: str):
     """
@@ -0,0 +1,89 @@
+"""
+Agent Telemetry Plugin
+Records Prometheus latency metrics for every agent turn, model call and
+tool call. ADK already opens OpenTelemetry spans for each of these; they
+are exported alongside ours once cloud.telemetry.setup_tracing runs.
+"""
+
+import time
+from typing import Any, Optional
+
+from google.adk.agents.base_agent import BaseAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+from cloud.telemetry import AGENT_LATENCY, ERRORS, MODEL_LATENCY, TOOL_LATENCY
+
+
+class TelemetryPlugin(BasePlugin):
+    """Times agents, model calls and tools for every agent run by the Runner."""
+
+    def __init__(self):
+        super().__init__(name="telemetry")
+        # (kind, invocation/call id, name) -> (start time, model name)
+        self._started: dict[tuple, tuple[float, str]] = {}
+
+    def _start(self, key: tuple, model: str = ""):
+        self._started[key] = (time.perf_counter(), model)
+
+    def _stop(self, key: tuple) -> Optional[tuple[float, str]]:
+        started = self._started.pop(key, None)
+        if started is None:
+            return None
+        return time.perf_counter() - started[0], started[1]
+
+    async def before_agent_callback(self, *, agent: BaseAgent, callback_context: CallbackContext) -> None:
+        self._start(("agent", callback_context.invocation_id, agent.name))
+
+    async def after_agent_callback(self, *, agent: BaseAgent, callback_context: CallbackContext) -> None:
+        stopped = self._stop(("agent", callback_context.invocation_id, agent.name))
+        if stopped:
+            AGENT_LATENCY.labels(agent=agent.name).observe(stopped[0])
+
+    async def before_model_callback(self, *, callback_context: CallbackContext,
+                                    llm_request: LlmRequest) -> None:
+        self._start(("model", callback_context.invocation_id, callback_context.agent_name),
+                    llm_request.model or "")
+
+    async def after_model_callback(self, *, callback_context: CallbackContext,
+                                   llm_response: LlmResponse) -> None:
+        if llm_response.partial:
+            return None
+        stopped = self._stop(("model", callback_context.invocation_id, callback_context.agent_name))
+        if stopped:
+            status = "error" if llm_response.error_code else "ok"
+            MODEL_LATENCY.labels(agent=callback_context.agent_name, model=stopped[1], status=status).observe(stopped[0])
+            if llm_response.error_code:
+                ERRORS.labels(component="model", kind=str(llm_response.error_code)).inc()
+
+    async def on_model_error_callback(self, *, callback_context: CallbackContext,
+                                      llm_request: LlmRequest, error: Exception) -> None:
+        stopped = self._stop(("model", callback_context.invocation_id, callback_context.agent_name))
+        if stopped:
+            MODEL_LATENCY.labels(agent=callback_context.agent_name, model=stopped[1], status="error").observe(stopped[0])
+        ERRORS.labels(component="model", kind=type(error).__name__).inc()
+
+    async def before_tool_callback(self, *, tool: BaseTool, tool_args: dict[str, Any],
+                                   tool_context: ToolContext) -> None:
+        self._start(("tool", tool_context.function_call_id, tool.name))
+
+    async def after_tool_callback(self, *, tool: BaseTool, tool_args: dict[str, Any],
+                                  tool_context: ToolContext, result: dict) -> None:
+        stopped = self._stop(("tool", tool_context.function_call_id, tool.name))
+        # Our tools report failures as {"status": "error", ...} rather than raising
+        failed = isinstance(result, dict) and result.get("status") == "error"
+        if stopped:
+            TOOL_LATENCY.labels(tool=tool.name, status="error" if failed else "ok").observe(stopped[0])
+        if failed:
+            ERRORS.labels(component="tool", kind=tool.name).inc()
+
+    async def on_tool_error_callback(self, *, tool: BaseTool, tool_args: dict[str, Any],
+                                     tool_context: ToolContext, error: Exception) -> None:
+        stopped = self._stop(("tool", tool_context.function_call_id, tool.name))
+        if stopped:
+            TOOL_LATENCY.labels(tool=tool.name, status="error").observe(stopped[0])
+        ERRORS.labels(component="tool", kind=type(error).__name__).inc()
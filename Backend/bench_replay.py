@@ -0,0 +1,152 @@
+"""
+Offline Replay Benchmark
+Runs the full agent pipeline (runner.run_async, sessions, tool code) against
+recorded model transcripts and stub render backends, with no network.
+Reports wall time, per-agent time, event count and memory.
+
+Usage:
+    python bench_replay.py                              # replay the bundled transcript
+    python bench_replay.py --transcript replay/transcripts/pythagoras_pipeline.json
+    python bench_replay.py --iterations 20 --json out.json
+    python bench_replay.py --max-wall-ms 250            # non-zero exit on regression
+    python bench_replay.py --record new.json --prompt "Explain fractions"   # live, needs OPENAI_API_KEY
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+
+from google.genai import types
+
+from agent import PIPELINE_MODE, build_agent, build_runner, openai_model
+from replay.model import load_transcript, replay_models, recording_models, save_transcript
+from replay.stubs import stub_manim_tools
+from response_cache import BYPASS_CACHE_KEY
+
+DEFAULT_TRANSCRIPT = os.path.join(os.path.dirname(__file__), "replay", "transcripts", "pythagoras.json")
+
+
+async def run_once(runner, prompt: str) -> dict:
+    """Drive one request through the runner and time every event by author."""
+    per_agent: dict[str, float] = {}
+    events = 0
+    start = last = time.perf_counter()
+
+    async for event in runner.run_async(
+        user_id="bench-user",
+        session_id=f"bench-{uuid.uuid4().hex[:8]}",
+        new_message=types.Content(role="user", parts=[types.Part(text=prompt)]),
+        # Every iteration should exercise the model turns, not the response cache
+        state_delta={BYPASS_CACHE_KEY: True}
+    ):
+        now = time.perf_counter()
+        author = getattr(event, 'author', None) or "unknown"
+        per_agent[author] = per_agent.get(author, 0.0) + (now - last)
+        last = now
+        events += 1
+
+    return {
+        "wall_ms": (time.perf_counter() - start) * 1000,
+        "events": events,
+        "per_agent_ms": {name: secs * 1000 for name, secs in per_agent.items()},
+    }
+
+
+async def replay(transcript: dict, iterations: int, warmup: int) -> dict:
+    # Transcripts recorded before pipeline mode existed are agentic
+    mode = transcript.get("mode", "agentic")
+    runs = []
+    tracemalloc.start()
+    for i in range(warmup + iterations):
+        model_for, models = replay_models(transcript)
+        runner = build_runner(build_agent(mode, model_for=model_for, manim_tools=stub_manim_tools()))
+        result = await run_once(runner, transcript["prompt"])
+        result["model_calls"] = {name: model.calls for name, model in models.items()}
+        if i >= warmup:
+            runs.append(result)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    walls = [run["wall_ms"] for run in runs]
+    agents = sorted({name for run in runs for name in run["per_agent_ms"]})
+    return {
+        "mode": mode,
+        "iterations": iterations,
+        "wall_ms": {
+            "mean": statistics.mean(walls),
+            "p50": statistics.median(walls),
+            "max": max(walls),
+        },
+        "per_agent_ms": {
+            name: statistics.mean(run["per_agent_ms"].get(name, 0.0) for run in runs)
+            for name in agents
+        },
+        "events": runs[-1]["events"],
+        "model_calls": runs[-1]["model_calls"],
+        "tracemalloc_peak_mb": peak / (1024 * 1024),
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+async def record(path: str, prompt: str, mode: str):
+    """Run the live pipeline once and save every agent's model turns."""
+    model_for, recorders = recording_models(lambda agent_name, model_name: openai_model(model_name))
+    runner = build_runner(build_agent(mode, model_for=model_for, manim_tools=stub_manim_tools()))
+    result = await run_once(runner, prompt)
+    save_transcript(path, prompt, recorders, mode=mode)
+    print(f"✓ Recorded {result['events']} events to {path}")
+
+
+def print_report(report: dict):
+    print("=" * 60)
+    print(f"🔁 Replay benchmark ({report['mode']} mode, {report['iterations']} iterations)")
+    print("=" * 60)
+    wall = report["wall_ms"]
+    print(f"⏱️  Wall time: mean {wall['mean']:.1f} ms | p50 {wall['p50']:.1f} ms | max {wall['max']:.1f} ms")
+    print(f"📦 Events per run: {report['events']}")
+    print(f"🧠 Memory: tracemalloc peak {report['tracemalloc_peak_mb']:.1f} MB | max RSS {report['max_rss_mb']:.1f} MB")
+    print("👤 Per-agent time (mean):")
+    for name, ms in sorted(report["per_agent_ms"].items(), key=lambda item: -item[1]):
+        calls = report["model_calls"].get(name)
+        suffix = f"  ({calls} model calls)" if calls is not None else ""
+        print(f"   {name:<14} {ms:8.1f} ms{suffix}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transcript", default=DEFAULT_TRANSCRIPT)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--max-wall-ms", type=float, help="Fail if mean wall time exceeds this budget")
+    parser.add_argument("--record", help="Record a live transcript to this path instead of replaying")
+    parser.add_argument("--prompt", help="Prompt to use with --record")
+    parser.add_argument("--mode", choices=["pipeline", "agentic"], default=PIPELINE_MODE,
+                        help="Agent tree to record with (replays use the transcript's mode)")
+    args = parser.parse_args()
+
+    if args.record:
+        asyncio.run(record(args.record, args.prompt or load_transcript(args.transcript)["prompt"], args.mode))
+        return
+
+    report = asyncio.run(replay(load_transcript(args.transcript), args.iterations, args.warmup))
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.max_wall_ms is not None and report["wall_ms"]["mean"] > args.max_wall_ms:
+        print(f"❌ Mean wall time {report['wall_ms']['mean']:.1f} ms exceeds budget {args.max_wall_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
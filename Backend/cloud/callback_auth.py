@@ -0,0 +1,51 @@
+"""
+Callback Signatures
+Shared by the render worker (imported as callback_auth), which signs each
+completion callback, and the API (imported as cloud.callback_auth), which
+refuses callbacks without a valid signature. Both sides read the same
+RENDER_CALLBACK_SECRET; the signature is an HMAC-SHA256 of the timestamp
+and raw body, so a captured callback cannot be replayed after
+`MAX_SKEW_SECONDS` or altered.
+"""
+
+import hashlib
+import hmac
+import os
+import time
+from typing import Optional
+
+RENDER_CALLBACK_SECRET = os.getenv("RENDER_CALLBACK_SECRET")
+
+SIGNATURE_HEADER = "X-Chalkline-Signature"
+TIMESTAMP_HEADER = "X-Chalkline-Timestamp"
+MAX_SKEW_SECONDS = 300
+
+
+def _digest(secret: str, timestamp: str, body: bytes) -> str:
+    mac = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256)
+    return "sha256=" + mac.hexdigest()
+
+
+def sign(body: bytes, secret: Optional[str] = RENDER_CALLBACK_SECRET) -> dict:
+    """Headers carrying the signature of `body`; empty when no secret is configured."""
+    if not secret:
+        return {}
+    timestamp = str(int(time.time()))
+    return {TIMESTAMP_HEADER: timestamp, SIGNATURE_HEADER: _digest(secret, timestamp, body)}
+
+
+def verify(body: bytes, headers, secret: Optional[str] = RENDER_CALLBACK_SECRET) -> bool:
+    """
+    True if `headers` carry a fresh, valid signature of `body`.
+    Always False when no secret is configured, so callbacks stay closed by default.
+    """
+    timestamp = headers.get(TIMESTAMP_HEADER)
+    signature = headers.get(SIGNATURE_HEADER)
+    if not (secret and timestamp and signature):
+        return False
+    try:
+        if abs(time.time() - int(timestamp)) > MAX_SKEW_SECONDS:
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(signature, _digest(secret, timestamp, body))
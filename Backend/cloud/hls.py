@@ -0,0 +1,116 @@
+"""
+HLS packaging for progressive playback.
+Each rendered scene is cut into fMP4 segments with its own media playlist
+under hls/{id}/. A lesson playlist chains the scene playlists in order, up
+to the first scene that is not ready yet, so players can start on scene 1
+while later scenes are still rendering. It only ever grows, and is left
+alone once ended (RFC 8216); the final-quality renders get a separate
+playlist next to it, written once when all of them are ready.
+"""
+
+import math
+import os
+import posixpath
+from typing import Optional
+
+SEGMENT_SECONDS = int(os.environ.get("HLS_SEGMENT_SECONDS", "4"))
+# EXT-X-TARGETDURATION of lesson playlists. A growing playlist must keep the
+# value it was first written with, so it is an upper bound rather than the
+# longest segment so far: `-c copy` can only cut at keyframes, so segments run
+# past SEGMENT_SECONDS up to the encoder's keyframe interval (x264's default
+# 250 frames is ~17s at 15fps)
+TARGET_DURATION = int(os.environ.get("HLS_TARGET_DURATION", "20"))
+
+PLAYLIST_NAME = "index.m3u8"
+FINAL_PLAYLIST_NAME = "final.m3u8"
+INIT_NAME = "init.mp4"
+
+
+def segment_command(video_path: str, out_dir: str) -> list[str]:
+    """ffmpeg command that packages `video_path` as fMP4 HLS in `out_dir` without re-encoding."""
+    return [
+        "ffmpeg", "-y", "-i", video_path, "-c", "copy",
+        "-f", "hls", "-hls_time", str(SEGMENT_SECONDS),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_type", "fmp4",
+        "-hls_fmp4_init_filename", INIT_NAME,
+        "-hls_segment_filename", os.path.join(out_dir, "seg_%03d.m4s"),
+        os.path.join(out_dir, PLAYLIST_NAME)
+    ]
+
+
+def parse_media_playlist(text: str) -> dict:
+    """
+    Read the init segment and (duration, uri) segments of a media playlist.
+
+    Returns:
+        {"map": init uri or None, "segments": [(duration, uri), ...]}
+    """
+    init_uri = None
+    segments = []
+    duration: Optional[float] = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-MAP:"):
+            init_uri = line.split('URI="', 1)[1].split('"', 1)[0]
+        elif line.startswith("#EXTINF:"):
+            duration = float(line[len("#EXTINF:"):].split(",", 1)[0])
+        elif line and not line.startswith("#") and duration is not None:
+            segments.append((duration, line))
+            duration = None
+    return {"map": init_uri, "segments": segments}
+
+
+def final_playlist_name(playlist_name: str) -> str:
+    """Blob name of the final-quality playlist published next to a lesson playlist."""
+    return posixpath.join(posixpath.dirname(playlist_name), FINAL_PLAYLIST_NAME)
+
+
+def is_ended(text: str) -> bool:
+    """True if a playlist is complete; its contents must not change after that."""
+    return "#EXT-X-ENDLIST" in text
+
+
+def lesson_playlist(playlist_name: str, scenes: list[tuple[str, dict]], complete: bool,
+                    playlist_type: str = "EVENT", target_duration: Optional[int] = None) -> str:
+    """
+    Build the lesson playlist stored at `playlist_name` from the parsed
+    playlists of the scenes that are ready, in order. Segment URIs are made
+    relative to the lesson playlist, so it works behind any base URL.
+
+    Args:
+        playlist_name: Blob name of the lesson playlist
+        scenes: (scene playlist blob name, parse_media_playlist result) pairs
+        complete: Whether every scene is included; adds #EXT-X-ENDLIST
+        playlist_type: "EVENT" for a playlist that grows as scenes finish,
+            "VOD" for one written complete
+        target_duration: Fixed EXT-X-TARGETDURATION, required for a playlist
+            that is rewritten; by default the longest segment, rounded up
+    """
+    base = posixpath.dirname(playlist_name)
+    durations = [d for _, parsed in scenes for d, _ in parsed["segments"]]
+    if target_duration is None:
+        target_duration = max([math.ceil(d) for d in durations] + [SEGMENT_SECONDS])
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:7",
+        f"#EXT-X-TARGETDURATION:{target_duration}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        f"#EXT-X-PLAYLIST-TYPE:{playlist_type}",
+    ]
+    for i, (scene_playlist, parsed) in enumerate(scenes):
+        scene_dir = posixpath.dirname(scene_playlist)
+
+        def uri(name: str) -> str:
+            return posixpath.relpath(posixpath.join(scene_dir, name), base or ".")
+
+        if i:
+            lines.append("#EXT-X-DISCONTINUITY")
+        if parsed["map"]:
+            lines.append(f'#EXT-X-MAP:URI="{uri(parsed["map"])}"')
+        for duration, segment in parsed["segments"]:
+            lines.append(f"#EXTINF:{duration:.3f},")
+            lines.append(uri(segment))
+    if complete:
+        lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,154 @@
+"""
+Bounded job queue for the render worker.
+Every job runs in its own working directory on a fixed set of threads;
+jobs beyond capacity wait in a priority queue instead of competing for CPU,
+so preview renders overtake background final-quality ones. Callers can
+block on completion (`wait`) or register an `on_done` hook.
+"""
+
+import contextvars
+import itertools
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from typing import Callable, Optional
+
+try:
+    from telemetry import JOB_LATENCY, JOB_WAIT, timed
+except ImportError:
+    from cloud.telemetry import JOB_LATENCY, JOB_WAIT, timed
+
+FINISHED = ("done", "failed")
+
+# Lower runs first; equal priorities run in submission order
+PRIORITY_HIGH = 0
+PRIORITY_LOW = 10
+
+
+class JobQueue:
+    """
+    Runs `fn(*args, workdir=..., **kwargs)` jobs with at most `workers`
+    in flight, tracking each job's status by ID.
+    """
+
+    def __init__(self, workers: int, jobs_dir: str, ttl: float = 3600):
+        self.workers = workers
+        self.jobs_dir = jobs_dir
+        self.ttl = ttl
+        self._jobs: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._order = itertools.count()
+        os.makedirs(jobs_dir, exist_ok=True)
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"job-{i}", daemon=True).start()
+
+    def submit(self, kind: str, fn: Callable, *args, meta: Optional[dict] = None,
+               on_done: Optional[Callable[[dict], None]] = None,
+               priority: int = PRIORITY_HIGH, **kwargs) -> dict:
+        """
+        Queue `fn`. `meta` is merged into the job record (e.g. the scene
+        name), and `on_done(job)` is called once the job finishes. Jobs
+        with a lower `priority` value start first.
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            **(meta or {}),
+            "job_id": job_id,
+            "kind": kind,
+            "status": "queued",
+            "priority": priority,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+        # Run in a copy of the submitter's context so the job inherits its request ID and trace
+        context = contextvars.copy_context()
+        self._queue.put((priority, next(self._order), lambda: context.run(
+            self._run, job_id, fn, args, kwargs, on_done
+        )))
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def wait(self, job_ids: list[str], timeout: float) -> list[Optional[dict]]:
+        """
+        Block until every known job in `job_ids` has finished or `timeout`
+        elapses. Returns the current records (None for unknown IDs).
+        """
+        deadline = time.time() + timeout
+        with self._finished:
+            while True:
+                jobs = [self._jobs.get(job_id) for job_id in job_ids]
+                pending = [job for job in jobs if job and job["status"] not in FINISHED]
+                remaining = deadline - time.time()
+                if not pending or remaining <= 0:
+                    return [dict(job) if job else None for job in jobs]
+                self._finished.wait(remaining)
+
+    def depth(self) -> dict:
+        with self._lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "workers": self.workers,
+        }
+
+    def _work(self):
+        while True:
+            _, _, run = self._queue.get()
+            run()
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run(self, job_id: str, fn: Callable, args: tuple, kwargs: dict,
+             on_done: Optional[Callable[[dict], None]]):
+        started_at = time.time()
+        self._update(job_id, status="running", started_at=started_at)
+        job = self.get(job_id)
+        JOB_WAIT.labels(kind=job["kind"]).observe(started_at - job["created_at"])
+        workdir = tempfile.mkdtemp(prefix=f"{job_id}-", dir=self.jobs_dir)
+        try:
+            with timed(f"job.{job['kind']}", JOB_LATENCY, "job", kind=job["kind"]) as span:
+                span.set_attribute("job.id", job_id)
+                fn(*args, workdir=workdir, **kwargs)
+            self._update(job_id, status="done", finished_at=time.time())
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+            with self._finished:
+                self._finished.notify_all()
+
+        if on_done:
+            try:
+                on_done(self.get(job_id))
+            except Exception as e:
+                print(f"⚠️ on_done hook failed for job {job_id}: {e}")
+
+    def _prune(self):
+        # Forget finished jobs older than the TTL (caller holds the lock)
+        cutoff = time.time() - self.ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] and job["finished_at"] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,270 @@
+"""
+Content-addressed cache of rendered scene videos.
+Keys combine the scene's normalized source hash with the render quality and
+the Manim version, so a hit is guaranteed to be byte-for-byte reusable.
+
+Also home to the persistent cache of Manim's partial movie files, which
+lets a re-render skip every animation whose hash has not changed.
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+from importlib.metadata import version, PackageNotFoundError
+
+
+def manim_version() -> str:
+    try:
+        return version("manim")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def render_cache_key(source_hash: str, quality: str) -> str:
+    payload = f"{source_hash}|{quality}|{manim_version()}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class RenderCache:
+    """
+    Size-capped local directory of `{key}.mp4` files with LRU eviction
+    (by last access time) and hit/miss counters.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.remote_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.mp4")
+
+    def get(self, key: str):
+        """Return the cached file path for `key`, or None."""
+        path = self._path(key)
+        if os.path.exists(path):
+            os.utime(path)  # mark as recently used
+            return path
+        return None
+
+    def put(self, key: str, video_path: str) -> str:
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        shutil.copyfile(video_path, tmp_path)
+        os.replace(tmp_path, path)
+        self._evict()
+        return path
+
+    def record(self, hit: bool, remote: bool = False):
+        with self._lock:
+            if not hit:
+                self.misses += 1
+            elif remote:
+                self.remote_hits += 1
+            else:
+                self.hits += 1
+
+    def _evict(self):
+        with self._lock:
+            files = []
+            for name in os.listdir(self.directory):
+                if name.endswith(".mp4"):
+                    stat = os.stat(os.path.join(self.directory, name))
+                    files.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in files)
+            for _, size, name in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                os.unlink(os.path.join(self.directory, name))
+                total -= size
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.remote_hits + self.misses
+            return {
+                "hits": self.hits,
+                "remote_hits": self.remote_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.remote_hits) / lookups, 3) if lookups else 0.0,
+                "entries": len([n for n in os.listdir(self.directory) if n.endswith(".mp4")]),
+            }
+
+
+PARTIAL_LIST_FILE = "partial_movie_file_list.txt"
+
+
+def listed_partials(partial_dir: str) -> list[str]:
+    """Paths of the partial movies Manim concatenated in its last render in `partial_dir`."""
+    try:
+        with open(os.path.join(partial_dir, PARTIAL_LIST_FILE)) as f:
+            return re.findall(r"file '(?:file:)?(.+)'", f.read())
+    except OSError:
+        return []
+
+
+def write_manim_config(path: str, partial_movie_dir: str):
+    """
+    Write a manim.cfg that points partial movies at `partial_movie_dir` and
+    leaves their cleanup to PartialMovieCache (max_files_cached = -1).
+    """
+    with open(path, "w") as f:
+        f.write("[CLI]\n")
+        f.write(f"partial_movie_dir = {partial_movie_dir}\n")
+        f.write("max_files_cached = -1\n")
+    return path
+
+
+class PartialMovieCache:
+    """
+    Size-capped directory of Manim partial movie files, one subdirectory
+    per scene name. Manim names each partial by a hash of the animation,
+    the mobjects and the camera config, so files are safe to share between
+    jobs and survive worker restarts.
+
+    Manim writes its concat list into the partial directory, so each render
+    gets a private directory of hard links instead of the scene directory
+    itself. The scene directory is locked (flock) only while a render is
+    seeded from it and while new partials are linked back, so renders of
+    the same scene name run side by side. Eviction removes the least
+    recently used files; a render holding links to them is unaffected.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.reused = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # Private per-render directories; dot-prefixed so eviction skips it
+        self.work_root = os.path.join(directory, ".work")
+        os.makedirs(self.work_root, exist_ok=True)
+
+    def scene_dir(self, scene_name: str) -> str:
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", scene_name)
+        return os.path.join(self.directory, safe)
+
+    @contextlib.contextmanager
+    def use(self, scene_name: str):
+        """
+        Yield a private partial movie directory for one render of
+        `scene_name`, seeded with the scene's cached partials. After a
+        successful render its new partials join the cache, every partial it
+        used is marked as recently used, and the cache is trimmed to
+        `max_bytes`.
+        """
+        scene_dir = self.scene_dir(scene_name)
+        os.makedirs(scene_dir, exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix=f"{os.path.basename(scene_dir)}-", dir=self.work_root)
+        try:
+            with _locked(scene_dir):
+                seeded = link_partials(scene_dir, work_dir)
+            yield work_dir
+            used = [os.path.basename(path) for path in listed_partials(work_dir)]
+            with _locked(scene_dir):
+                link_partials(work_dir, scene_dir)
+            self._touch_used(scene_dir, used, seeded)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        self._evict()
+
+    def _touch_used(self, scene_dir: str, used: list[str], seeded: set):
+        for name in used:
+            with contextlib.suppress(OSError):
+                os.utime(os.path.join(scene_dir, name))
+        with self._lock:
+            self.reused += len([name for name in used if name in seeded])
+
+    def _evict(self):
+        with self._lock:
+            files = []
+            locks = []
+            try:
+                for name in os.listdir(self.directory):
+                    scene_dir = os.path.join(self.directory, name)
+                    if name.startswith(".") or not os.path.isdir(scene_dir):
+                        continue
+                    # Skip directories being seeded or linked back right now
+                    lock_file = open(os.path.join(scene_dir, ".lock"), "a")
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        lock_file.close()
+                        continue
+                    locks.append(lock_file)
+                    for entry in os.scandir(scene_dir):
+                        if entry.name.endswith(".mp4"):
+                            stat = entry.stat()
+                            files.append((stat.st_mtime, stat.st_size, entry.path))
+                total = sum(size for _, size, _ in files)
+                for _, size, path in sorted(files):
+                    if total <= self.max_bytes:
+                        break
+                    os.unlink(path)
+                    total -= size
+                    self.evictions += 1
+            finally:
+                for lock_file in locks:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    lock_file.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"reused_partials": self.reused, "evictions": self.evictions}
+
+
+@contextlib.contextmanager
+def _locked(scene_dir: str):
+    with open(os.path.join(scene_dir, ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def link_partials(source_dir: str, target_dir: str) -> set:
+    """
+    Hard-link every partial movie in `source_dir` that `target_dir` lacks.
+    Returns the names of the partials in `source_dir`.
+    """
+    names = {name for name in os.listdir(source_dir) if name.endswith(".mp4")}
+    for name in names:
+        target = os.path.join(target_dir, name)
+        if not os.path.exists(target):
+            os.link(os.path.join(source_dir, name), target)
+    return names
+
+
+@contextlib.contextmanager
+def slice_partial_dir(scene_dir: str, label: str):
+    """
+    Private partial movie directory for one slice of a scene render, seeded
+    with hard links to the scene's cached partials. Manim writes its concat
+    list into the partial directory, so slices of one scene rendering at the
+    same time cannot share it. New partials are linked back afterwards.
+    """
+    work_dir = os.path.join(scene_dir, "slices", label)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    link_partials(scene_dir, work_dir)
+    try:
+        yield work_dir
+    finally:
+        # Links share an inode, so this also marks the scene's copies as used
+        for path in listed_partials(work_dir):
+            with contextlib.suppress(OSError):
+                os.utime(path)
+        link_partials(work_dir, scene_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
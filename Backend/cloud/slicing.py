@@ -0,0 +1,194 @@
+"""
+Intra-scene time slicing.
+A long scene is split at play/wait boundaries into contiguous animation
+ranges that render at the same time on the warm pool (Manim skips the
+animations outside a range), then joined losslessly with ffmpeg's concat
+demuxer. A scene's wall-clock time is then bounded by its slice length.
+
+Shared by the render worker (imported as slicing) and the API's local
+fallback (imported as cloud.slicing).
+"""
+
+import ast
+import contextlib
+import itertools
+import math
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+try:
+    from render_cache import slice_partial_dir
+    from warm_render import WarmRenderer
+except ImportError:
+    from cloud.render_cache import slice_partial_dir
+    from cloud.warm_render import WarmRenderer
+
+# Target seconds of animation per slice, and the most slices one scene may use
+SLICE_SECONDS = float(os.getenv("RENDER_SLICE_SECONDS", "15"))
+MAX_SLICES = int(os.getenv("RENDER_MAX_SLICES", "8"))
+# Scenes with fewer play/wait calls than this render directly, skipping the
+# dry run: a handful of calls rarely adds up to more than one slice
+MIN_SLICE_CALLS = int(os.getenv("RENDER_SLICE_MIN_CALLS", "4"))
+
+_LOOPS = (ast.For, ast.AsyncFor, ast.While, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+def count_animation_calls(script_path: str, scene_name: str) -> Optional[int]:
+    """
+    Count the self.play/self.wait calls written directly in `scene_name`'s
+    construct().
+
+    Returns:
+        The count, or None when it cannot be known without running the
+        scene: the file does not parse, the class or its construct() is
+        missing, or construct() calls super(), calls a method defined in the
+        file (self.helper()), passes `self` to a function, or has a play/wait
+        inside a loop or a nested function
+    """
+    try:
+        with open(script_path) as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError):
+        return None
+    scene = next((node for node in tree.body
+                  if isinstance(node, ast.ClassDef) and node.name == scene_name), None)
+    construct = next((node for node in (scene.body if scene else [])
+                      if isinstance(node, ast.FunctionDef) and node.name == "construct"), None)
+    if construct is None:
+        return None
+    # Methods of any class in the file, so helpers inherited from an in-file base count too
+    helpers = {node.name for cls in ast.walk(tree) if isinstance(cls, ast.ClassDef)
+               for node in cls.body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))}
+
+    def is_self(node: ast.AST) -> bool:
+        return isinstance(node, ast.Name) and node.id == "self"
+
+    count = 0
+
+    def visit(node: ast.AST, opaque: bool) -> bool:
+        # `opaque`: inside a loop or nested function, where a call may run any number of times
+        nonlocal count
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.Call):
+                func = child.func
+                if isinstance(func, ast.Name) and func.id == "super":
+                    return False
+                if any(is_self(arg) for arg in child.args + [kw.value for kw in child.keywords]):
+                    return False
+                if isinstance(func, ast.Attribute) and is_self(func.value):
+                    if func.attr in ("play", "wait"):
+                        if opaque:
+                            return False
+                        count += 1
+                    elif func.attr in helpers:
+                        return False
+            nested = isinstance(child, _LOOPS + (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda))
+            if not visit(child, opaque or nested):
+                return False
+        return True
+
+    return count if visit(construct, False) else None
+
+
+def plan_slices(durations: list[float], slice_seconds: float = SLICE_SECONDS,
+                max_slices: int = MAX_SLICES) -> list[tuple[int, int]]:
+    """
+    Group consecutive play/wait calls into ranges of roughly equal length.
+
+    Args:
+        durations: Run time of each play/wait call, in order
+        slice_seconds: Target length of one slice
+        max_slices: Upper bound on the number of slices
+
+    Returns:
+        Inclusive (first, last) animation numbers per slice, in order
+    """
+    if not durations:
+        return [(0, 0)]
+    total = sum(durations)
+    count = min(max_slices, len(durations), max(1, math.ceil(total / slice_seconds)))
+    # Cut after the call whose end is closest to each k/count of the total
+    ends = list(itertools.accumulate(durations))
+    cuts = []
+    for k in range(1, count):
+        cut = min(range(len(durations) - 1), key=lambda i: abs(ends[i] - total * k / count))
+        if not cuts or cut > cuts[-1]:
+            cuts.append(cut)
+    starts = [0] + [cut + 1 for cut in cuts]
+    return list(zip(starts, cuts + [len(durations) - 1]))
+
+
+def render_sliced(renderer: WarmRenderer, script_path: str, scene_name: str, media_dir: str,
+                  quality: str = "-ql", partial_dir: Optional[str] = None,
+                  timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Render a scene on `renderer`, split into time slices when it is long
+    enough. A dry run first measures every play/wait call; scenes that fit
+    in one slice render directly. Scenes with fewer than `MIN_SLICE_CALLS`
+    play/wait calls in their source skip the dry run and render directly.
+
+    Args:
+        partial_dir: The render's partial movie directory, from
+            PartialMovieCache.use
+
+    Returns:
+        Same shape as WarmRenderer.render, plus the number of `slices`
+    """
+    options = {"partial_movie_dir": partial_dir, "max_files_cached": -1} if partial_dir else {}
+    calls = count_animation_calls(script_path, scene_name)
+    if calls is not None and calls < MIN_SLICE_CALLS:
+        result = renderer.render(script_path, scene_name, media_dir, quality, options=options, timeout=timeout)
+        return {**result, "slices": 1}
+
+    analysis = renderer.render(script_path, scene_name, media_dir, quality, timeout=timeout, dry_run=True)
+    if analysis["status"] != "success":
+        return {**analysis, "slices": 0}
+    slices = plan_slices(analysis["durations"])
+    if len(slices) == 1:
+        result = renderer.render(script_path, scene_name, media_dir, quality, options=options, timeout=timeout)
+        return {**result, "duration": round(result["duration"] + analysis["duration"], 2), "slices": 1}
+
+    # Per-scene, since other scenes may be slicing into the same media_dir
+    slices_dir = os.path.join(media_dir, "slices", scene_name)
+
+    def render_slice(span: tuple[int, int]) -> Dict[str, Any]:
+        label = f"{span[0]}-{span[1]}"
+        with contextlib.ExitStack() as stack:
+            slice_options = {"from_animation_number": span[0], "upto_animation_number": span[1]}
+            if partial_dir:
+                slice_options.update(options, partial_movie_dir=stack.enter_context(slice_partial_dir(partial_dir, label)))
+            return renderer.render(
+                script_path, scene_name, os.path.join(slices_dir, label), quality,
+                options=slice_options, timeout=timeout
+            )
+
+    with ThreadPoolExecutor(max_workers=len(slices), thread_name_prefix="slice") as pool:
+        results = list(pool.map(render_slice, slices))
+
+    duration = round(analysis["duration"] + max(r["duration"] for r in results), 2)
+    failed = next((r for r in results if r["status"] != "success"), None)
+    if failed:
+        return {**failed, "duration": duration, "slices": len(slices)}
+
+    # Put the joined video where an unsliced render would have written it
+    first_slice_dir = os.path.join(slices_dir, f"{slices[0][0]}-{slices[0][1]}")
+    output_path = os.path.join(media_dir, os.path.relpath(results[0]["path"], first_slice_dir))
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    list_path = os.path.join(slices_dir, "slices.txt")
+    with open(list_path, "w") as f:
+        for result in results:
+            f.write(f"file '{result['path']}'\n")
+    concat = subprocess.run([
+        "ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+        "-c", "copy", "-movflags", "+faststart", output_path
+    ], capture_output=True, text=True)
+    shutil.rmtree(slices_dir, ignore_errors=True)
+    if concat.returncode != 0:
+        return {
+            "status": "error", "path": None, "duration": duration, "slices": len(slices),
+            "stderr_tail": "\n".join(concat.stderr.strip().splitlines()[-20:])
+        }
+    return {"status": "success", "path": output_path, "stderr_tail": "", "duration": duration, "slices": len(slices)}
@@ -0,0 +1,427 @@
+"""
+Object storage backends.
+Everything the render pipeline stores (scripts, rendered scenes, HLS
+segments, partial movies, lesson playlists) goes through one small
+bucket-level interface, so the pipeline can run against GCS, a local disk
+or shared volume, or process memory. `STORAGE_BACKEND` picks one:
+
+- `gcs` (default): Google Cloud Storage through one process-wide client,
+  so credentials are discovered and connections set up once per process.
+- `local`: files under `STORAGE_LOCAL_ROOT/{bucket}/`. Point the backend
+  and the worker at the same volume to run the whole pipeline offline.
+- `memory`: a per-process dict, for tests and benchmarks.
+
+Shared by the render worker (imported as storage_backend) and the API
+(imported as cloud.storage_backend).
+"""
+
+import contextlib
+import io
+import itertools
+import os
+import shutil
+import threading
+import uuid
+from typing import IO, Iterator, Optional, Union
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gcs")
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "/tmp/storage")
+# HTTP connections the shared GCS client keeps per host; cover the
+# concurrent downloads of a stitch plus the job threads
+STORAGE_POOL_SIZE = int(os.getenv("STORAGE_POOL_SIZE", "32"))
+
+
+class NotFoundError(Exception):
+    """Raised when an object does not exist."""
+
+
+class PreconditionError(Exception):
+    """Raised when a conditional write finds a different generation."""
+
+
+class StorageBackend:
+    """
+    One bucket. Object names are `/`-separated keys such as
+    `cache/{key}.mp4`; generations are integers that change on every write
+    of an object and are 0 for objects that do not exist.
+    """
+
+    scheme = ""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def uri(self, object_name: str) -> str:
+        """Human-readable location, for logs and tool results."""
+        return f"{self.scheme}://{self.name}/{object_name}"
+
+    def exists(self, object_name: str) -> bool:
+        raise NotImplementedError
+
+    def generation(self, object_name: str) -> int:
+        raise NotImplementedError
+
+    def list(self, prefix: str) -> dict[str, int]:
+        """Name -> size in bytes of every object starting with `prefix`."""
+        raise NotImplementedError
+
+    def upload_file(self, object_name: str, path: str, content_type: Optional[str] = None):
+        raise NotImplementedError
+
+    def upload_bytes(self, object_name: str, data: Union[bytes, str], content_type: Optional[str] = None,
+                     cache_control: Optional[str] = None, if_generation_match: Optional[int] = None):
+        """
+        Write `data` to `object_name`. With `if_generation_match`, the write
+        only happens if the object is still at that generation.
+
+        Raises:
+            PreconditionError: if the object changed since that generation
+        """
+        raise NotImplementedError
+
+    def open_write(self, object_name: str, content_type: Optional[str] = None,
+                   chunk_size: Optional[int] = None) -> contextlib.AbstractContextManager[IO[bytes]]:
+        """
+        Writable binary stream for `object_name`. The object appears when the
+        `with` block exits normally; an exception discards what was written.
+        """
+        raise NotImplementedError
+
+    def download_file(self, object_name: str, path: str):
+        """
+        Raises:
+            NotFoundError: if the object does not exist
+        """
+        raise NotImplementedError
+
+    def download_text(self, object_name: str) -> str:
+        """
+        Raises:
+            NotFoundError: if the object does not exist
+        """
+        raise NotImplementedError
+
+    def copy(self, source_name: str, dest_name: str):
+        raise NotImplementedError
+
+    def delete(self, object_name: str):
+        """Delete an object; a missing object is not an error."""
+        raise NotImplementedError
+
+    def touch(self, object_name: str):
+        """Mark an object as recently used, for least-recently-used expiry."""
+        raise NotImplementedError
+
+
+_gcs_client = None
+_gcs_lock = threading.Lock()
+
+
+def gcs_client():
+    """The process-wide google-cloud-storage client, created on first use."""
+    global _gcs_client
+    if _gcs_client is None:
+        with _gcs_lock:
+            if _gcs_client is None:
+                from google.cloud import storage
+                from requests.adapters import HTTPAdapter
+
+                client = storage.Client()
+                # The default pool (10) is smaller than our concurrent transfers
+                adapter = HTTPAdapter(pool_connections=STORAGE_POOL_SIZE, pool_maxsize=STORAGE_POOL_SIZE)
+                client._http.mount("https://", adapter)
+                _gcs_client = client
+    return _gcs_client
+
+
+class GCSBackend(StorageBackend):
+    """A GCS bucket, on the shared client."""
+
+    scheme = "gs"
+
+    @property
+    def bucket(self):
+        # Created on first use, so building URIs needs no credentials
+        return gcs_client().bucket(self.name)
+
+    @contextlib.contextmanager
+    def _errors(self):
+        from google.api_core.exceptions import NotFound, PreconditionFailed
+
+        try:
+            yield
+        except NotFound as e:
+            raise NotFoundError(str(e)) from e
+        except PreconditionFailed as e:
+            raise PreconditionError(str(e)) from e
+
+    def exists(self, object_name: str) -> bool:
+        return self.bucket.blob(object_name).exists()
+
+    def generation(self, object_name: str) -> int:
+        blob = self.bucket.get_blob(object_name)
+        return blob.generation if blob else 0
+
+    def list(self, prefix: str) -> dict[str, int]:
+        return {blob.name: blob.size or 0 for blob in self.bucket.list_blobs(prefix=prefix)}
+
+    def upload_file(self, object_name: str, path: str, content_type: Optional[str] = None):
+        self.bucket.blob(object_name).upload_from_filename(path, content_type=content_type)
+
+    def upload_bytes(self, object_name: str, data: Union[bytes, str], content_type: Optional[str] = None,
+                     cache_control: Optional[str] = None, if_generation_match: Optional[int] = None):
+        blob = self.bucket.blob(object_name)
+        if cache_control:
+            blob.cache_control = cache_control
+        with self._errors():
+            blob.upload_from_string(data, content_type=content_type or "text/plain",
+                                    if_generation_match=if_generation_match)
+
+    @contextlib.contextmanager
+    def open_write(self, object_name: str, content_type: Optional[str] = None,
+                   chunk_size: Optional[int] = None) -> Iterator[IO[bytes]]:
+        blob = self.bucket.blob(object_name)
+        if chunk_size:
+            blob.chunk_size = chunk_size
+        # Leaving the writer with an exception cancels the resumable upload
+        with blob.open("wb", content_type=content_type) as writer:
+            yield writer
+
+    def download_file(self, object_name: str, path: str):
+        with self._errors():
+            self.bucket.blob(object_name).download_to_filename(path)
+
+    def download_text(self, object_name: str) -> str:
+        with self._errors():
+            return self.bucket.blob(object_name).download_as_text()
+
+    def copy(self, source_name: str, dest_name: str):
+        with self._errors():
+            self.bucket.copy_blob(self.bucket.blob(source_name), self.bucket, dest_name)
+
+    def delete(self, object_name: str):
+        with contextlib.suppress(NotFoundError), self._errors():
+            self.bucket.blob(object_name).delete()
+
+    def touch(self, object_name: str):
+        # A lifecycle rule on daysSinceCustomTime expires unused objects
+        from datetime import datetime, timezone
+
+        blob = self.bucket.blob(object_name)
+        blob.custom_time = datetime.now(timezone.utc)
+        with self._errors():
+            blob.patch()
+
+
+class LocalBackend(StorageBackend):
+    """
+    A directory per bucket. Writes go to a temporary file that is renamed
+    into place, so readers (also in other processes on a shared volume)
+    never see partial objects. Every write creates a new file, so the inode
+    number plus the mtime identifies a generation even when two writes land
+    within one timestamp tick.
+    """
+
+    scheme = "file"
+
+    def __init__(self, name: str, root: str = STORAGE_LOCAL_ROOT):
+        super().__init__(name)
+        self.directory = os.path.join(os.path.abspath(root), name)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def uri(self, object_name: str) -> str:
+        return f"file://{self.path(object_name)}"
+
+    def path(self, object_name: str) -> str:
+        path = os.path.normpath(os.path.join(self.directory, object_name))
+        if not path.startswith(self.directory + os.sep):
+            raise ValueError(f"Object name escapes the bucket: {object_name}")
+        return path
+
+    def _tmp_path(self, object_name: str) -> str:
+        path = self.path(object_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.{uuid.uuid4().hex}.tmp"
+
+    def exists(self, object_name: str) -> bool:
+        return os.path.isfile(self.path(object_name))
+
+    def generation(self, object_name: str) -> int:
+        try:
+            stat = os.stat(self.path(object_name))
+        except FileNotFoundError:
+            return 0
+        return (stat.st_ino << 64) | stat.st_mtime_ns
+
+    def list(self, prefix: str) -> dict[str, int]:
+        objects = {}
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                if name.startswith(prefix) and not name.endswith(".tmp") and name != ".lock":
+                    with contextlib.suppress(FileNotFoundError):
+                        objects[name] = os.path.getsize(path)
+        return dict(sorted(objects.items()))
+
+    def upload_file(self, object_name: str, path: str, content_type: Optional[str] = None):
+        tmp_path = self._tmp_path(object_name)
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, self.path(object_name))
+
+    def upload_bytes(self, object_name: str, data: Union[bytes, str], content_type: Optional[str] = None,
+                     cache_control: Optional[str] = None, if_generation_match: Optional[int] = None):
+        tmp_path = self._tmp_path(object_name)
+        with open(tmp_path, "wb") as f:
+            f.write(data.encode() if isinstance(data, str) else data)
+        if if_generation_match is None:
+            os.replace(tmp_path, self.path(object_name))
+            return
+        # Check and rename under a bucket-wide lock, shared with other processes;
+        # fcntl is POSIX-only, so it is imported here rather than at module level
+        import fcntl
+        with open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if self.generation(object_name) != if_generation_match:
+                    os.unlink(tmp_path)
+                    raise PreconditionError(f"{object_name} is not at generation {if_generation_match}")
+                os.replace(tmp_path, self.path(object_name))
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextlib.contextmanager
+    def open_write(self, object_name: str, content_type: Optional[str] = None,
+                   chunk_size: Optional[int] = None) -> Iterator[IO[bytes]]:
+        tmp_path = self._tmp_path(object_name)
+        try:
+            with open(tmp_path, "wb") as writer:
+                yield writer
+            os.replace(tmp_path, self.path(object_name))
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+
+    def download_file(self, object_name: str, path: str):
+        try:
+            shutil.copyfile(self.path(object_name), path)
+        except FileNotFoundError as e:
+            raise NotFoundError(object_name) from e
+
+    def download_text(self, object_name: str) -> str:
+        try:
+            with open(self.path(object_name)) as f:
+                return f.read()
+        except FileNotFoundError as e:
+            raise NotFoundError(object_name) from e
+
+    def copy(self, source_name: str, dest_name: str):
+        tmp_path = self._tmp_path(dest_name)
+        try:
+            shutil.copyfile(self.path(source_name), tmp_path)
+        except FileNotFoundError as e:
+            raise NotFoundError(source_name) from e
+        os.replace(tmp_path, self.path(dest_name))
+
+    def delete(self, object_name: str):
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path(object_name))
+
+    def touch(self, object_name: str):
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(self.path(object_name))
+
+
+class MemoryBackend(StorageBackend):
+    """
+    A dict of bytes. Buckets with the same name share their objects within
+    the process, like a real bucket shared by the API and the worker.
+    """
+
+    scheme = "memory"
+    _buckets: dict[str, dict[str, tuple[bytes, int]]] = {}
+    _generations = itertools.count(1)
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._lock = threading.Lock()
+        self.objects = self._buckets.setdefault(name, {})
+
+    def _get(self, object_name: str) -> bytes:
+        try:
+            return self.objects[object_name][0]
+        except KeyError as e:
+            raise NotFoundError(object_name) from e
+
+    def _put(self, object_name: str, data: bytes):
+        self.objects[object_name] = (data, next(self._generations))
+
+    def exists(self, object_name: str) -> bool:
+        return object_name in self.objects
+
+    def generation(self, object_name: str) -> int:
+        entry = self.objects.get(object_name)
+        return entry[1] if entry else 0
+
+    def list(self, prefix: str) -> dict[str, int]:
+        return {name: len(data) for name, (data, _) in sorted(self.objects.items()) if name.startswith(prefix)}
+
+    def upload_file(self, object_name: str, path: str, content_type: Optional[str] = None):
+        with open(path, "rb") as f:
+            self._put(object_name, f.read())
+
+    def upload_bytes(self, object_name: str, data: Union[bytes, str], content_type: Optional[str] = None,
+                     cache_control: Optional[str] = None, if_generation_match: Optional[int] = None):
+        data = data.encode() if isinstance(data, str) else data
+        with self._lock:
+            if if_generation_match is not None and self.generation(object_name) != if_generation_match:
+                raise PreconditionError(f"{object_name} is not at generation {if_generation_match}")
+            self._put(object_name, data)
+
+    @contextlib.contextmanager
+    def open_write(self, object_name: str, content_type: Optional[str] = None,
+                   chunk_size: Optional[int] = None) -> Iterator[IO[bytes]]:
+        writer = io.BytesIO()
+        yield writer
+        self._put(object_name, writer.getvalue())
+
+    def download_file(self, object_name: str, path: str):
+        data = self._get(object_name)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def download_text(self, object_name: str) -> str:
+        return self._get(object_name).decode()
+
+    def copy(self, source_name: str, dest_name: str):
+        self._put(dest_name, self._get(source_name))
+
+    def delete(self, object_name: str):
+        self.objects.pop(object_name, None)
+
+    def touch(self, object_name: str):
+        pass
+
+
+BACKENDS = {"gcs": GCSBackend, "local": LocalBackend, "memory": MemoryBackend}
+
+_buckets: dict[tuple[str, str], StorageBackend] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(name: str, backend: Optional[str] = None) -> StorageBackend:
+    """
+    The bucket `name` on the configured backend (`STORAGE_BACKEND` unless
+    `backend` is given). Instances are cached, so callers may ask per call.
+
+    Raises:
+        ValueError: for an unknown backend name
+    """
+    backend = backend or STORAGE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown storage backend {backend!r}; use {', '.join(BACKENDS)}")
+    with _buckets_lock:
+        bucket = _buckets.get((backend, name))
+        if bucket is None:
+            bucket = _buckets[(backend, name)] = BACKENDS[backend](name)
+        return bucket
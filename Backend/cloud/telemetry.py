@@ -0,0 +1,161 @@
+"""
+Tracing, Metrics and Request IDs
+Shared by the API (imported as cloud.telemetry) and the render worker
+(imported as telemetry). Spans go through OpenTelemetry and are exported
+when OTEL_EXPORTER_OTLP_ENDPOINT is set; metrics are served in Prometheus
+format from /metrics on each app.
+"""
+
+import contextlib
+import contextvars
+import os
+import time
+import uuid
+from typing import Optional
+
+from opentelemetry import propagate, trace
+from opentelemetry.trace import Status, StatusCode
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Buckets sized for everything from a doc lookup to a multi-minute render
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+tracer = trace.get_tracer("chalkline")
+
+HTTP_LATENCY = Histogram(
+    "chalkline_http_request_seconds", "HTTP request latency",
+    ["service", "method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+AGENT_LATENCY = Histogram(
+    "chalkline_agent_turn_seconds", "Time an agent holds the turn", ["agent"], buckets=LATENCY_BUCKETS
+)
+MODEL_LATENCY = Histogram(
+    "chalkline_model_call_seconds", "Model call latency", ["agent", "model", "status"], buckets=LATENCY_BUCKETS
+)
+TOOL_LATENCY = Histogram(
+    "chalkline_tool_call_seconds", "Agent tool call latency", ["tool", "status"], buckets=LATENCY_BUCKETS
+)
+STORAGE_LATENCY = Histogram(
+    "chalkline_storage_seconds", "Bucket upload/download latency", ["op", "status"], buckets=LATENCY_BUCKETS
+)
+SUBPROCESS_LATENCY = Histogram(
+    "chalkline_subprocess_seconds", "manim / ffmpeg subprocess latency", ["command", "status"],
+    buckets=LATENCY_BUCKETS
+)
+JOB_LATENCY = Histogram(
+    "chalkline_job_seconds", "Worker job run time", ["kind", "status"], buckets=LATENCY_BUCKETS
+)
+JOB_WAIT = Histogram(
+    "chalkline_job_queue_wait_seconds", "Time a worker job waits before it starts", ["kind"],
+    buckets=LATENCY_BUCKETS
+)
+QUEUE_DEPTH = Gauge("chalkline_queue_depth", "Jobs waiting or running", ["queue", "state"])
+ERRORS = Counter("chalkline_errors_total", "Errors by component", ["component", "kind"])
+
+
+def setup_tracing(service_name: str):
+    """
+    Install an OTLP-exporting tracer provider when OTEL_EXPORTER_OTLP_ENDPOINT
+    is set. Without it spans are still created (and carry request IDs
+    between services) but nothing is exported.
+    """
+    if not os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        print("⚠️ OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry-sdk / "
+              "opentelemetry-exporter-otlp-proto-http are not installed; spans are not exported")
+        return
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+
+
+def current_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+def outgoing_headers() -> dict:
+    """Headers that carry the request ID and trace context to another service."""
+    headers = {}
+    request_id = current_request_id()
+    if request_id:
+        headers[REQUEST_ID_HEADER] = request_id
+    propagate.inject(headers)
+    return headers
+
+
+@contextlib.contextmanager
+def timed(name: str, histogram: Histogram, component: str, **labels):
+    """
+    Run the block in a span named `name` and observe its duration on
+    `histogram` with `labels` plus status="ok"/"error". Errors are also
+    counted under `component`.
+    """
+    start = time.perf_counter()
+    status = "ok"
+    with tracer.start_as_current_span(name, attributes={k: str(v) for k, v in labels.items()}) as span:
+        request_id = current_request_id()
+        if request_id:
+            span.set_attribute("request.id", request_id)
+        try:
+            yield span
+        except BaseException as e:
+            status = "error"
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+            ERRORS.labels(component=component, kind=type(e).__name__).inc()
+            raise
+        finally:
+            histogram.labels(**labels, status=status).observe(time.perf_counter() - start)
+
+
+def instrument_app(app, service_name: str):
+    """
+    Add request-ID handling, a server span and latency metrics to every
+    request, and a Prometheus /metrics endpoint, to a FastAPI app.
+    """
+    from fastapi import Request
+    from fastapi.responses import Response
+
+    setup_tracing(service_name)
+
+    @app.middleware("http")
+    async def telemetry_middleware(request: Request, call_next):
+        request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        parent = propagate.extract(dict(request.headers))
+        start = time.perf_counter()
+        status = 500
+        try:
+            with tracer.start_as_current_span(
+                f"{request.method} {request.url.path}", context=parent, kind=trace.SpanKind.SERVER,
+                attributes={"request.id": request_id, "http.method": request.method}
+            ) as span:
+                response = await call_next(request)
+                status = response.status_code
+                span.set_attribute("http.status_code", status)
+                response.headers[REQUEST_ID_HEADER] = request_id
+                return response
+        finally:
+            # Label by route template, not raw path, to keep cardinality bounded
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            HTTP_LATENCY.labels(
+                service=service_name, method=request.method, route=route, status=str(status)
+            ).observe(time.perf_counter() - start)
+            if status >= 500:
+                ERRORS.labels(component="http", kind=str(status)).inc()
+            request_id_var.reset(token)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
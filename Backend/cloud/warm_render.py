@@ -0,0 +1,210 @@
+"""
+Warm Manim renderer.
+Keeps a pool of long-lived processes forked from a server that has already
+imported manim (and numpy, cairo, pango), and renders scenes through the
+Python API instead of spawning the `manim` CLI. A render then starts in
+milliseconds instead of paying interpreter start-up and imports.
+
+Shared by the render worker (imported as warm_render) and the API's local
+fallback (imported as cloud.warm_render). Workers are recycled after
+`WARM_RENDER_TASKS_PER_CHILD` renders, so scenes that leak memory or patch
+module globals cannot pollute later renders for long, and a crashed worker
+is replaced by rebuilding the pool.
+"""
+
+import importlib.util
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+WARM_RENDER = os.getenv("WARM_RENDER", "1") == "1"
+WARM_RENDER_TASKS_PER_CHILD = int(os.getenv("WARM_RENDER_TASKS_PER_CHILD", "20"))
+
+# CLI quality flag (-ql, -pql, ...) -> manim quality name
+QUALITIES = {
+    "l": "low_quality",
+    "m": "medium_quality",
+    "h": "high_quality",
+    "p": "production_quality",
+    "k": "fourk_quality",
+}
+
+# Quality flag letter -> folder manim writes videos to under media_dir/videos/{module}/
+QUALITY_FOLDERS = {
+    "l": "480p15",
+    "m": "720p30",
+    "h": "1080p60",
+    "p": "1440p60",
+    "k": "2160p60",
+}
+
+# Quality profiles a render job can ask for -> CLI-style quality flag
+QUALITY_PROFILES = {
+    "preview": os.getenv("RENDER_QUALITY", "-ql"),
+    "final": os.getenv("FINAL_RENDER_QUALITY", "-qh"),
+}
+
+STDERR_TAIL_LINES = 20
+
+
+def quality_flag(quality: Optional[str] = None) -> str:
+    """Resolve a profile name or an explicit flag (-qm, -pqh, ...); defaults to the preview profile."""
+    if not quality:
+        return QUALITY_PROFILES["preview"]
+    if quality in QUALITY_PROFILES:
+        return QUALITY_PROFILES[quality]
+    if quality.startswith("-") and quality[-1] in QUALITIES:
+        return quality
+    raise ValueError(f"Unknown quality {quality!r}; use {', '.join(QUALITY_PROFILES)} or a flag like -qm")
+
+
+class RenderTimeout(Exception):
+    pass
+
+
+def _alarm(signum, frame):
+    raise RenderTimeout()
+
+
+def _render_in_child(script_path: str, scene_name: str, media_dir: str, quality: str,
+                     options: Dict[str, Any], timeout: Optional[float], dry_run: bool) -> Dict[str, Any]:
+    """
+    Runs inside a pool process: import the scene module fresh and render
+    `scene_name` under a temporary config, so module-level config changes
+    made by the scene code are undone afterwards. Also reports the run time
+    of every play/wait call, which a dry run yields without drawing frames.
+    """
+    from manim import config, tempconfig
+
+    module_name = os.path.splitext(os.path.basename(script_path))[0]
+    if timeout:
+        signal.signal(signal.SIGALRM, _alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        with tempconfig({}):
+            config.quality = QUALITIES.get(quality[-1], "low_quality")
+            config.media_dir = media_dir
+            config.input_file = script_path
+            config.scene_names = [scene_name]
+            config.preview = False
+            config.write_to_movie = not dry_run
+            config.dry_run = dry_run
+            for key, value in options.items():
+                setattr(config, key, value)
+
+            spec = importlib.util.spec_from_file_location(module_name, script_path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
+            spec.loader.exec_module(module)
+
+            scene = getattr(module, scene_name)()
+            durations = []
+            play = scene.renderer.play
+
+            def timed_play(scene, *args, **kwargs):
+                play(scene, *args, **kwargs)
+                durations.append(float(scene.duration))
+
+            scene.renderer.play = timed_play
+            scene.render()
+            path = None if dry_run else str(scene.renderer.file_writer.movie_file_path)
+        return {"status": "success", "path": path, "stderr_tail": "", "durations": durations}
+    except RenderTimeout:
+        return {"status": "timeout", "path": None, "stderr_tail": f"Render exceeded {timeout:g}s"}
+    except Exception:
+        tail = "\n".join(traceback.format_exc().strip().splitlines()[-STDERR_TAIL_LINES:])
+        return {"status": "error", "path": None, "stderr_tail": tail}
+    finally:
+        sys.modules.pop(module_name, None)
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+class WarmRenderer:
+    """
+    Process pool of warm manim renderers. Thread-safe: callers on several
+    threads (job queue, local render pool) share it and block on their own
+    render only.
+    """
+
+    def __init__(self, workers: int, tasks_per_child: int = WARM_RENDER_TASKS_PER_CHILD):
+        self.workers = workers
+        self.tasks_per_child = tasks_per_child
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # forkserver: workers fork from a process that has manim imported,
+                # and max_tasks_per_child needs a non-fork start method anyway
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["manim"])
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=context,
+                    max_tasks_per_child=self.tasks_per_child
+                )
+            return self._executor
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+                self.restarts += 1
+        # Kill stuck or half-dead workers rather than waiting on them
+        for process in list((getattr(broken, "_processes", None) or {}).values()):
+            process.kill()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def warm_up(self):
+        """Start the pool (and the forkserver's manim import) ahead of the first render."""
+        self._pool().submit(int).result()
+
+    def render(self, script_path: str, scene_name: str, media_dir: str, quality: str = "-ql",
+               options: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None,
+               dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Render one scene in a warm process.
+
+        Args:
+            script_path: Python file containing the scene
+            scene_name: Scene class to render
+            media_dir: Manim media directory for the output
+            quality: CLI-style quality flag (-ql, -pqm, ...)
+            options: Extra manim config values, e.g. partial_movie_dir
+            timeout: Seconds before the render is aborted
+
+        Returns:
+            Dictionary with status ("success", "error" or "timeout"), path,
+            duration, stderr tail and, on success, the run time of each
+            play/wait call
+        """
+        start = time.monotonic()
+        # A crash in one worker breaks every render in flight on the pool, so
+        # each render gets one retry on the fresh pool
+        for attempt in range(2):
+            pool = self._pool()
+            try:
+                future = pool.submit(_render_in_child, script_path, scene_name, media_dir, quality,
+                                     options or {}, timeout, dry_run)
+                # The child enforces `timeout` itself; the grace period covers
+                # a worker stuck in native code that never sees the alarm
+                result = future.result(timeout=timeout + 30 if timeout else None)
+                break
+            except FutureTimeout:
+                self._restart(pool)
+                result = {"status": "timeout", "path": None, "stderr_tail": "Renderer stopped responding"}
+                break
+            except BrokenProcessPool:
+                # A worker died (segfault, OOM kill); start a fresh pool
+                self._restart(pool)
+                result = {"status": "error", "path": None, "stderr_tail": "Render process crashed"}
+        return {**result, "duration": round(time.monotonic() - start, 2)}
@@ -1,138 +1,783 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, Header, HTTPException
 from pydantic import BaseModel
+from typing import Optional, Union
+import asyncio
+import collections
+import contextvars
+import json
+import posixpath
+import requests
 import os
+import random
 import sys
 import subprocess
-from google.cloud import storage
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import shutil
+try:
+    from render_cache import PartialMovieCache, RenderCache, render_cache_key, write_manim_config
+    from jobs import PRIORITY_HIGH, PRIORITY_LOW, JobQueue
+    from warm_render import QUALITY_FOLDERS, WARM_RENDER, WarmRenderer, quality_flag
+    from slicing import render_sliced
+    from hls import (
+        PLAYLIST_NAME, TARGET_DURATION, final_playlist_name, is_ended, lesson_playlist, parse_media_playlist,
+        segment_command
+    )
+    from storage_backend import NotFoundError, PreconditionError, get_bucket
+    from callback_auth import sign
+    from telemetry import (
+        QUEUE_DEPTH, STORAGE_LATENCY, SUBPROCESS_LATENCY,
+        current_request_id, instrument_app, outgoing_headers, timed
+    )
+except ImportError:
+    from cloud.render_cache import PartialMovieCache, RenderCache, render_cache_key, write_manim_config
+    from cloud.jobs import PRIORITY_HIGH, PRIORITY_LOW, JobQueue
+    from cloud.warm_render import QUALITY_FOLDERS, WARM_RENDER, WarmRenderer, quality_flag
+    from cloud.slicing import render_sliced
+    from cloud.hls import (
+        PLAYLIST_NAME, TARGET_DURATION, final_playlist_name, is_ended, lesson_playlist, parse_media_playlist,
+        segment_command
+    )
+    from cloud.storage_backend import NotFoundError, PreconditionError, get_bucket
+    from cloud.callback_auth import sign
+    from cloud.telemetry import (
+        QUEUE_DEPTH, STORAGE_LATENCY, SUBPROCESS_LATENCY,
+        current_request_id, instrument_app, outgoing_headers, timed
+    )
 
 app = FastAPI()
 
+# X-Request-ID (propagated from the API), a span per request, metrics and GET /metrics
+instrument_app(app, "chalkline-worker")
+
+# One render per core by default; extra jobs queue instead of thrashing
+job_queue = JobQueue(
+    workers=int(os.environ.get("RENDER_WORKERS", os.cpu_count() or 1)),
+    jobs_dir=os.environ.get("JOBS_DIR", "/tmp/jobs")
+)
+
+# Long-lived processes with manim already imported, one per job slot
+warm_renderer = WarmRenderer(workers=job_queue.workers)
+
+# Local tier of the content-addressed render cache; the shared tier lives
+# in the bucket under cache/ (expire it with a daysSinceCustomTime rule)
+render_cache = RenderCache(
+    directory=os.environ.get("RENDER_CACHE_DIR", "/tmp/render-cache"),
+    max_bytes=int(os.environ.get("RENDER_CACHE_MAX_MB", "2048")) * 1024 * 1024
+)
+
+# Manim's partial movie files (one per animation), kept across jobs so a
+# near-identical re-render only re-encodes the animations that changed
+partial_cache = PartialMovieCache(
+    directory=os.environ.get("PARTIAL_CACHE_DIR", "/tmp/manim-partials"),
+    max_bytes=int(os.environ.get("PARTIAL_CACHE_MAX_MB", "4096")) * 1024 * 1024
+)
+# Also mirror partials to the job's bucket under partials/{scene}/, so a fresh
+# instance starts warm
+PARTIAL_CACHE_SYNC = os.environ.get("PARTIAL_CACHE_SYNC", "0") == "1"
+
+QUEUE_DEPTH.labels(queue="jobs", state="queued").set_function(lambda: job_queue.depth()["queued"])
+QUEUE_DEPTH.labels(queue="jobs", state="running").set_function(lambda: job_queue.depth()["running"])
+
 class RenderRequest(BaseModel):
     bucket: str
     script: str
     scene: str
+    source_hash: Optional[str] = None
+    # Lesson playlist (e.g. lessons/{id}/index.m3u8) to refresh once this scene is ready
+    playlist: Optional[str] = None
+    # Quality profile ("preview", "final") or flag (-qm); defaults to preview
+    quality: Optional[str] = None
+    # Lower runs first; defaults to low for "final" renders, high otherwise
+    priority: Optional[int] = None
+    callback_url: Optional[str] = None
+
+class PlaylistRequest(BaseModel):
+    bucket: str
+    # Blob name of the lesson playlist, e.g. lessons/{id}/index.m3u8
+    name: str
+    # Scene playlists (the `hls_playlist` returned by /render), in playback order
+    scenes: list[str]
+    # Final-quality scene playlists in the same order, published together as a
+    # separate playlist once all exist; omit when no final renders were queued
+    finals: Optional[list[str]] = None
 
 class StitchRequest(BaseModel):
     bucket: str
     scenes: str
+    # Explicit blobs to concatenate, in order (e.g. content-addressed cache/{key}.mp4
+    # renders reused across edits); defaults to output/{scene}.mp4 for each scene.
+    # A list names candidates by preference, e.g. [final, preview]
+    blobs: Optional[list[Union[str, list[str]]]] = None
+    callback_url: Optional[str] = None
+
+class BatchScene(BaseModel):
+    scene: str
+    source_hash: Optional[str] = None
+
+class BatchRenderRequest(BaseModel):
+    bucket: str
+    # The script body itself; nothing is read from the bucket
+    script: str
+    scenes: list[BatchScene]
+    playlist: Optional[str] = None
+    # Every scene is rendered once per profile, each at its default priority
+    qualities: list[str] = ["preview"]
+    callback_url: Optional[str] = None
+
+class WaitRequest(BaseModel):
+    job_ids: list[str]
+    timeout: float = 30
+
+# Scene downloads in flight per stitch, and the resumable upload chunk size
+# for the streamed result (must be a multiple of 256 KB)
+STITCH_DOWNLOAD_THREADS = int(os.environ.get("STITCH_DOWNLOAD_THREADS", "8"))
+STITCH_UPLOAD_CHUNK_MB = int(os.environ.get("STITCH_UPLOAD_CHUNK_MB", "8"))
+
+# Upper bound for a single long-poll, to stay under proxy idle timeouts
+MAX_WAIT_SECONDS = 60
+
+# batch_id -> job IDs of the most recent batches
+MAX_BATCHES = 1000
+batches: collections.OrderedDict[str, list[str]] = collections.OrderedDict()
+
+# "{endpoint}:{Idempotency-Key}" -> the response to the first request that
+# used the key, so a client retry gets the same jobs instead of new ones
+MAX_IDEMPOTENCY_KEYS = 1000
+idempotent_responses: collections.OrderedDict[str, dict] = collections.OrderedDict()
+
+
+def remember(store: collections.OrderedDict, key: str, value, limit: int):
+    """Add `key` to a bounded store, dropping the oldest entries past `limit`."""
+    store[key] = value
+    while len(store) > limit:
+        store.popitem(last=False)
+
+
+# Completion callbacks are retried off the job threads, so a slow or
+# unreachable backend never holds up a render slot
+CALLBACK_RETRIES = int(os.environ.get("CALLBACK_RETRIES", "5"))
+callback_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="callback")
+
+
+def post_callback(callback_url: str, job: dict, headers: dict):
+    """POST a signed job record, retrying transport errors and 5xx with jittered backoff."""
+    body = json.dumps(job).encode()
+    for attempt in range(CALLBACK_RETRIES + 1):
+        try:
+            resp = requests.post(callback_url, data=body, timeout=10, headers={
+                **headers, **sign(body), "Content-Type": "application/json"
+            })
+            if resp.status_code < 500:
+                if resp.status_code != 200:
+                    print(f"⚠️ Callback for job {job['job_id']} rejected: HTTP {resp.status_code}")
+                else:
+                    print(f"📣 Reported job {job['job_id']} ({job['status']}) to {callback_url}")
+                return
+            error = f"HTTP {resp.status_code}"
+        except requests.RequestException as e:
+            error = str(e)
+        if attempt < CALLBACK_RETRIES:
+            time.sleep(random.uniform(0, min(30, 2 ** attempt)))
+    print(f"⚠️ Gave up reporting job {job['job_id']} to {callback_url}: {error}")
+
+
+def notify_callback(callback_url: Optional[str]):
+    """Build an on_done hook that POSTs the finished job record to the backend."""
+    if not callback_url:
+        return None
+    def post_job(job: dict):
+        # Headers are read here, in the job's context, not on the callback thread
+        callback_executor.submit(post_callback, callback_url, job, outgoing_headers())
+
+    return post_job
+
+def hls_dir_name(scene_name: str, source_hash: Optional[str], quality: str) -> str:
+    """Where a scene's HLS segments live; content-addressed like its video when hashed."""
+    if source_hash:
+        return f"hls/{render_cache_key(source_hash, quality)}"
+    return f"hls/{scene_name}"
+
+
+def output_blob_name(scene_name: str, source_hash: Optional[str], quality: str) -> str:
+    """Where a finished render can be read back: its content-addressed cache blob when hashed."""
+    if source_hash:
+        return f"cache/{render_cache_key(source_hash, quality)}.mp4"
+    return f"output/{scene_name}.mp4"
+
+
+@app.on_event("startup")
+def warm_up_renderer():
+    # Pay the manim import once at boot rather than on the first render
+    if WARM_RENDER:
+        threading.Thread(target=warm_renderer.warm_up, daemon=True).start()
+
+def queue_render(bucket: str, scene: str, source_hash: Optional[str], playlist: Optional[str],
+                 profile: Optional[str], priority: Optional[int], callback_url: Optional[str],
+                 script_blob: Optional[str] = None, script_text: Optional[str] = None,
+                 batch_id: Optional[str] = None) -> dict:
+    """
+    Queue one scene render; the script comes from `script_blob` in the
+    bucket or inline as `script_text`.
+
+    Raises:
+        ValueError: if `profile` is not a known quality
+    """
+    quality = quality_flag(profile)
+    if priority is None:
+        priority = PRIORITY_LOW if profile == "final" else PRIORITY_HIGH
+    output_blob = output_blob_name(scene, source_hash, quality)
+    hls_playlist = f"{hls_dir_name(scene, source_hash, quality)}/{PLAYLIST_NAME}"
+    job = job_queue.submit(
+        "render", render_scene, bucket, script_blob, scene, source_hash, playlist,
+        quality=quality, script_text=script_text, priority=priority,
+        meta={
+            "scene": scene, "quality": quality, "output_blob": output_blob,
+            "hls_playlist": hls_playlist, "batch_id": batch_id, "request_id": current_request_id()
+        },
+        on_done=notify_callback(callback_url)
+    )
+    return {
+        "job_id": job["job_id"], "scene": scene, "profile": profile or "preview", "quality": quality,
+        "output_blob": output_blob, "hls_playlist": hls_playlist
+    }
+
 
 @app.post("/render")
-async def render_endpoint(req: RenderRequest, background_tasks: BackgroundTasks):
+async def render_endpoint(req: RenderRequest, idempotency_key: Optional[str] = Header(None)):
+    if idempotency_key and f"render:{idempotency_key}" in idempotent_responses:
+        return idempotent_responses[f"render:{idempotency_key}"]
     try:
-        background_tasks.add_task(render_scene, req.bucket, req.script, req.scene)
-        return {"status": "accepted", "scene": req.scene, "message": "Render started in background"}
+        job = queue_render(
+            req.bucket, req.scene, req.source_hash, req.playlist, req.quality, req.priority,
+            req.callback_url, script_blob=req.script
+        )
+        response = {"status": "accepted", **job, "message": "Render queued"}
+        if idempotency_key:
+            remember(idempotent_responses, f"render:{idempotency_key}", response, MAX_IDEMPOTENCY_KEYS)
+        return response
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error queuing render: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/render_batch")
+async def render_batch_endpoint(req: BatchRenderRequest, idempotency_key: Optional[str] = Header(None)):
+    """
+    Queue every scene of one script (at every requested quality) in a
+    single request. The script travels inline, so jobs skip the bucket
+    round trip for it. Returns a batch handle plus each job's record.
+    """
+    if idempotency_key and f"render_batch:{idempotency_key}" in idempotent_responses:
+        return idempotent_responses[f"render_batch:{idempotency_key}"]
+    for profile in req.qualities:
+        try:
+            quality_flag(profile)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        batch_id = uuid.uuid4().hex
+        # Queue all previews before any final render, so they start first
+        jobs = [
+            queue_render(
+                req.bucket, item.scene, item.source_hash, req.playlist, profile, None,
+                req.callback_url, script_text=req.script, batch_id=batch_id
+            )
+            for profile in req.qualities for item in req.scenes
+        ]
+        remember(batches, batch_id, [job["job_id"] for job in jobs], MAX_BATCHES)
+        response = {
+            "status": "accepted", "batch_id": batch_id, "jobs": jobs,
+            "message": f"Queued {len(jobs)} renders"
+        }
+        if idempotency_key:
+            remember(idempotent_responses, f"render_batch:{idempotency_key}", response, MAX_IDEMPOTENCY_KEYS)
+        return response
+    except Exception as e:
+        print(f"Error queuing batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/batches/{batch_id}")
+async def batch_status(batch_id: str, wait: float = 0):
+    """
+    Status of every job in a batch. With `wait`, long-polls until all of
+    them finish or `wait` seconds pass.
+    """
+    job_ids = batches.get(batch_id)
+    if job_ids is None:
+        # Batches are tracked in memory by the instance that queued them
+        raise HTTPException(status_code=404, detail=f"Unknown batch {batch_id} on this instance")
+    timeout = min(max(wait, 0), MAX_WAIT_SECONDS)
+    jobs = await asyncio.to_thread(job_queue.wait, job_ids, timeout)
+    records = [
+        job if job else {"job_id": job_id, "status": "unknown"}
+        for job_id, job in zip(job_ids, jobs)
+    ]
+    return {
+        "batch_id": batch_id,
+        "done": all(job["status"] in ("done", "failed", "unknown") for job in records),
+        "jobs": records
+    }
+
 @app.post("/stitch")
-async def stitch_endpoint(req: StitchRequest, background_tasks: BackgroundTasks):
+async def stitch_endpoint(req: StitchRequest, idempotency_key: Optional[str] = Header(None)):
+    if idempotency_key and f"stitch:{idempotency_key}" in idempotent_responses:
+        return idempotent_responses[f"stitch:{idempotency_key}"]
     try:
-        background_tasks.add_task(stitch_videos, req.bucket, req.scenes)
-        return {"status": "accepted", "message": "Stitching started in background"}
+        job = job_queue.submit(
+            "stitch", stitch_videos, req.bucket, req.scenes, req.blobs,
+            meta={"scenes": req.scenes, "request_id": current_request_id()},
+            on_done=notify_callback(req.callback_url)
+        )
+        response = {"status": "accepted", "job_id": job["job_id"], "message": "Stitching queued"}
+        if idempotency_key:
+            remember(idempotent_responses, f"stitch:{idempotency_key}", response, MAX_IDEMPOTENCY_KEYS)
+        return response
     except Exception as e:
         print(f"Error queuing stitch: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/playlist")
+async def playlist_endpoint(req: PlaylistRequest):
+    """
+    Set the scene order of a lesson playlist and build it from the scenes
+    that are already segmented. Renders submitted with `playlist` extend it
+    as they finish.
+    """
+    try:
+        bucket = get_bucket(req.bucket)
+        ready = await asyncio.to_thread(set_lesson_layout, bucket, req.name, req.scenes, req.finals)
+        return {"status": "ok", "playlist": req.name, "ready": ready, "total": len(req.scenes)}
+    except Exception as e:
+        print(f"Error building playlist: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, wait: float = 0):
+    """
+    Job status. With `wait`, long-polls until the job finishes or `wait`
+    seconds pass, whichever comes first.
+    """
+    timeout = min(max(wait, 0), MAX_WAIT_SECONDS)
+    job, = await asyncio.to_thread(job_queue.wait, [job_id], timeout)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job
+
+@app.post("/jobs/wait")
+async def wait_for_jobs(req: WaitRequest):
+    """
+    Long-poll several jobs at once; returns when all have finished or the
+    timeout passes. Unknown job IDs are reported as `unknown`.
+    """
+    timeout = min(max(req.timeout, 0), MAX_WAIT_SECONDS)
+    jobs = await asyncio.to_thread(job_queue.wait, req.job_ids, timeout)
+    records = [
+        job if job else {"job_id": job_id, "status": "unknown"}
+        for job_id, job in zip(req.job_ids, jobs)
+    ]
+    return {
+        "done": all(job["status"] in ("done", "failed", "unknown") for job in records),
+        "jobs": records
+    }
+
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    return {"status": "ok", **job_queue.depth()}
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {**render_cache.stats(), "partials": partial_cache.stats()}
 
 
-def render_scene(bucket_name: str, script_blob_name: str, scene_name: str):
+def reuse_cached_render(bucket, cache_key: str, scene_name: str) -> bool:
     """
-    Download script, render one scene, upload the result.
+    Publish a cached render as output/{scene}.mp4 without rendering.
+    Checks the local cache first, then the shared cache/ prefix in the bucket.
     """
+    output_blob = f"output/{scene_name}.mp4"
+
+    cached_blob = f"cache/{cache_key}.mp4"
+    local_path = render_cache.get(cache_key)
+    if local_path:
+        with timed("storage.upload", STORAGE_LATENCY, "storage", op="upload"):
+            bucket.upload_file(output_blob, local_path)
+            # Stitches may read the cache blob directly, so restore it if the bucket expired it
+            if not bucket.exists(cached_blob):
+                bucket.upload_file(cached_blob, local_path)
+        render_cache.record(hit=True)
+        print(f"♻️ Cache hit (local) for {scene_name}: {cache_key[:12]}")
+        return True
+
+    if bucket.exists(cached_blob):
+        with timed("storage.copy", STORAGE_LATENCY, "storage", op="copy"):
+            bucket.copy(cached_blob, output_blob)
+        # Bump custom_time so the bucket lifecycle rule evicts least-recently-used
+        bucket.touch(cached_blob)
+        render_cache.record(hit=True, remote=True)
+        print(f"♻️ Cache hit (bucket) for {scene_name}: {cache_key[:12]}")
+        return True
+
+    render_cache.record(hit=False)
+    return False
+
+
+def sync_partials(bucket, scene_name: str, partial_dir: str, upload: bool):
+    """
+    Mirror a scene's partial movies with partials/{scene}/ in the bucket.
+    Downloads only when the local directory is cold (a new instance);
+    uploads only files the bucket does not have yet.
+    """
+    # partial_dir is the render's private copy, so name the prefix after the scene
+    prefix = f"partials/{os.path.basename(partial_cache.scene_dir(scene_name))}/"
+    local = {name for name in os.listdir(partial_dir) if name.endswith(".mp4")}
+    if not upload and local:
+        return
+    with timed("storage.list", STORAGE_LATENCY, "storage", op="list"):
+        remote = {name[len(prefix):] for name in bucket.list(prefix)}
+
+    if upload:
+        missing = local - remote
+        with timed("storage.upload", STORAGE_LATENCY, "storage", op="upload"):
+            for name in missing:
+                bucket.upload_file(prefix + name, os.path.join(partial_dir, name))
+    else:
+        missing = remote - local
+        with timed("storage.download", STORAGE_LATENCY, "storage", op="download"):
+            for name in missing:
+                bucket.download_file(prefix + name, os.path.join(partial_dir, name))
+    if missing:
+        print(f"🔁 {'Uploaded' if upload else 'Downloaded'} {len(missing)} partial movies for {scene_name}")
+
+
+def publish_hls(bucket, video_path: str, hls_dir: str, workdir: str):
+    """
+    Cut a scene video into fMP4 HLS segments under `hls_dir`/ in the bucket.
+    The playlist is uploaded last, so its existence means the scene is
+    playable. Best effort: the MP4 is already uploaded, so a failure only
+    holds back progressive playback.
+    """
+    out_dir = os.path.join(workdir, "hls")
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        with timed("ffmpeg.segment", SUBPROCESS_LATENCY, "hls", command="ffmpeg"):
+            subprocess.run(segment_command(video_path, out_dir), capture_output=True, check=True)
+        content_types = {".m3u8": "application/vnd.apple.mpegurl", ".m4s": "video/iso.segment", ".mp4": "video/mp4"}
+        names = sorted(os.listdir(out_dir), key=lambda name: name == PLAYLIST_NAME)
+        with timed("storage.upload", STORAGE_LATENCY, "storage", op="upload"):
+            for name in names:
+                bucket.upload_file(
+                    f"{hls_dir}/{name}", os.path.join(out_dir, name),
+                    content_type=content_types.get(os.path.splitext(name)[1])
+                )
+        print(f"✓ Segmented for streaming: {bucket.uri(f'{hls_dir}/{PLAYLIST_NAME}')}")
+    except Exception as e:
+        print(f"⚠️ HLS segmenting failed for {video_path}: {e}")
+
+
+def set_lesson_layout(bucket, playlist_name: str, scene_playlists: list[str],
+                      final_playlists: Optional[list[str]] = None) -> int:
+    """
+    Store the lesson's scene order next to its playlist and build it.
+    Scenes that are not segmented yet get a watcher entry, so whichever job
+    finishes them (possibly one dispatched for an earlier lesson) refreshes
+    this playlist too.
+    """
+    lesson_dir = posixpath.dirname(playlist_name)
+    # The target duration is pinned here, so every rewrite of the playlist keeps it
+    layout = {"scenes": scene_playlists, "finals": final_playlists, "target_duration": TARGET_DURATION}
+    bucket.upload_bytes(posixpath.join(lesson_dir, "layout.json"), json.dumps(layout),
+                        content_type="application/json")
+    for scene_playlist in set(scene_playlists + (final_playlists or [])):
+        if not bucket.exists(scene_playlist):
+            watcher = posixpath.join(posixpath.dirname(scene_playlist), "watchers", posixpath.basename(lesson_dir))
+            bucket.upload_bytes(watcher, playlist_name)
+    return update_lesson_playlist(bucket, playlist_name)
+
+
+def watching_playlists(bucket, hls_dir: str) -> set[str]:
+    """Lesson playlists registered (by set_lesson_layout) as waiting for the scene in `hls_dir`."""
+    return {bucket.download_text(name) for name in bucket.list(f"{hls_dir}/watchers/")}
+
+
+def ready_prefix(bucket, scene_playlists: list[str]) -> list[tuple[str, dict]]:
+    """Parsed playlists of the leading scenes that are segmented, up to the first that is not."""
+    ready = []
+    for scene_playlist in scene_playlists:
+        try:
+            ready.append((scene_playlist, parse_media_playlist(bucket.download_text(scene_playlist))))
+        except NotFoundError:
+            break
+    return ready
+
+
+def update_lesson_playlist(bucket, playlist_name: str, attempts: int = 5) -> int:
+    """
+    Extend a lesson playlist to the contiguous prefix of scenes whose own
+    playlists exist, and publish the final-quality playlist once all of its
+    scenes exist. An ended playlist is never rewritten. Several jobs may
+    finish at once, so the write is conditional on the generation read
+    before building; on a conflict the playlist is rebuilt from the newer
+    state. Returns the number of ready scenes.
+    """
+    layout_blob = posixpath.join(posixpath.dirname(playlist_name), "layout.json")
+    try:
+        layout = json.loads(bucket.download_text(layout_blob))
+    except NotFoundError:
+        return 0  # The backend has not set the scene order yet; /playlist will build it
+    scene_playlists = layout["scenes"]
+    target_duration = layout.get("target_duration", TARGET_DURATION)
+    if layout.get("finals"):
+        publish_final_playlist(bucket, final_playlist_name(playlist_name), layout["finals"])
+
+    for _ in range(attempts):
+        generation = bucket.generation(playlist_name)
+        if generation:
+            try:
+                if is_ended(bucket.download_text(playlist_name)):
+                    return len(scene_playlists)
+            except NotFoundError:
+                continue
+        ready = ready_prefix(bucket, scene_playlists)
+        longest = max((d for _, parsed in ready for d, _ in parsed["segments"]), default=0)
+        if round(longest) > target_duration:
+            print(f"⚠️ {playlist_name} has a {longest:.1f}s segment, over its target duration of "
+                  f"{target_duration}s; raise HLS_TARGET_DURATION")
+
+        try:
+            bucket.upload_bytes(
+                playlist_name,
+                lesson_playlist(playlist_name, ready, complete=len(ready) == len(scene_playlists),
+                                target_duration=target_duration),
+                content_type="application/vnd.apple.mpegurl", cache_control="no-cache",
+                if_generation_match=generation
+            )
+        except PreconditionError:
+            continue
+        print(f"📺 Lesson playlist {playlist_name}: {len(ready)}/{len(scene_playlists)} scenes ready")
+        return len(ready)
+    raise Exception(f"Could not update {playlist_name}: too many concurrent writers")
+
+
+def publish_final_playlist(bucket, playlist_name: str, final_playlists: list[str]) -> bool:
+    """
+    Write the complete final-quality playlist once every scene's final
+    rendition exists. It is created once (generation 0) and never changed.
+    Returns whether the playlist exists.
+    """
+    if bucket.exists(playlist_name):
+        return True
+    ready = ready_prefix(bucket, final_playlists)
+    if len(ready) < len(final_playlists):
+        return False
+    try:
+        bucket.upload_bytes(
+            playlist_name,
+            lesson_playlist(playlist_name, ready, complete=True, playlist_type="VOD"),
+            content_type="application/vnd.apple.mpegurl", if_generation_match=0
+        )
+        print(f"📺 Final playlist {playlist_name} published")
+    except PreconditionError:
+        pass  # Another job published it first
+    return True
+
+
+def render_scene(bucket_name: str, script_blob_name: Optional[str], scene_name: str,
+                 source_hash: Optional[str] = None, playlist: Optional[str] = None,
+                 quality: Optional[str] = None, script_text: Optional[str] = None,
+                 workdir: str = "."):
+    """
+    Download script (unless it came inline as `script_text`), render one
+    scene at `quality` (a flag such as -pql), upload the result and its
+    HLS segments.
+    Skips rendering when a video for the same source hash is already cached.
+    With `playlist`, the lesson playlist is refreshed once the scene is ready,
+    as is every other lesson playlist waiting for it.
+    All files are written under `workdir` so concurrent jobs never collide.
+    """
+    bucket = get_bucket(bucket_name)
+
+    quality = quality or quality_flag()
+    cache_key = render_cache_key(source_hash, quality) if source_hash else None
+    scene_hls_dir = hls_dir_name(scene_name, source_hash, quality)
+    if cache_key and reuse_cached_render(bucket, cache_key, scene_name):
+        if not bucket.exists(f"{scene_hls_dir}/{PLAYLIST_NAME}"):
+            video_path = render_cache.get(cache_key)
+            if not video_path:
+                video_path = os.path.join(workdir, "cached.mp4")
+                download_blob(bucket, f"cache/{cache_key}.mp4", video_path)
+            publish_hls(bucket, video_path, scene_hls_dir, workdir)
+    else:
+        output_path = render_and_upload(bucket, script_blob_name, scene_name, quality, cache_key, workdir,
+                                        script_text)
+        publish_hls(bucket, output_path, scene_hls_dir, workdir)
+
+    # Checked after segmenting, so a lesson registered meanwhile sees the scene itself
+    playlists = watching_playlists(bucket, scene_hls_dir) | ({playlist} if playlist else set())
+    for lesson in sorted(playlists):
+        try:
+            update_lesson_playlist(bucket, lesson)
+        except Exception as e:
+            print(f"⚠️ Could not update lesson playlist {lesson}: {e}")
+
+
+def render_and_upload(bucket, script_blob_name: Optional[str], scene_name: str, quality: str,
+                      cache_key: Optional[str], workdir: str, script_text: Optional[str] = None) -> str:
+    """Render `scene_name` from the script (blob or inline) and upload it; returns the local video path."""
     # 1. Download the script
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(bucket_name)
-    blob = bucket.blob(script_blob_name)
-    blob.download_to_filename("myscript.py")
-    
-    print(f"✓ Downloaded script from gs://{bucket_name}/{script_blob_name}")
+    script_path = os.path.join(workdir, "myscript.py")
+    media_dir = os.path.join(workdir, "media")
+    if script_text is not None:
+        with open(script_path, "w") as f:
+            f.write(script_text)
+    else:
+        with timed("storage.download", STORAGE_LATENCY, "storage", op="download"):
+            bucket.download_file(script_blob_name, script_path)
+        print(f"✓ Downloaded script from {bucket.uri(script_blob_name)}")
     print(f"🎬 Rendering scene: {scene_name}...")
 
-    # 2. Render
-    quality = os.environ.get("RENDER_QUALITY", "-pql")
-    
-    result = subprocess.run([
-        "manim", quality, "myscript.py", scene_name,
-        "--media_dir", "./media"
-    ], capture_output=True, text=True)
-    
-    if result.returncode != 0:
-        print(f"❌ Render failed: {result.stderr}")
-        raise Exception(f"Manim failed: {result.stderr}")
+    # 2. Render, reusing partial movies from earlier jobs for this scene name
+    with partial_cache.use(scene_name) as partial_dir:
+        if PARTIAL_CACHE_SYNC:
+            sync_partials(bucket, scene_name, partial_dir, upload=False)
+        with timed("manim.render", SUBPROCESS_LATENCY, "render", command="manim") as span:
+            span.set_attribute("scene", scene_name)
+            if WARM_RENDER:
+                # Long scenes are split into time slices rendered side by side
+                result = render_sliced(warm_renderer, script_path, scene_name, media_dir, quality, partial_dir)
+                span.set_attribute("slices", result["slices"])
+                if result["status"] != "success":
+                    print(f"❌ Render failed: {result['stderr_tail']}")
+                    raise Exception(f"Manim failed: {result['stderr_tail']}")
+                output_path = result["path"]
+            else:
+                config_path = write_manim_config(os.path.join(workdir, "manim.cfg"), partial_dir)
+                result = subprocess.run([
+                    "manim", quality, script_path, scene_name,
+                    "--media_dir", media_dir, "--config_file", config_path
+                ], capture_output=True, text=True, cwd=workdir)
+
+                if result.returncode != 0:
+                    print(f"❌ Render failed: {result.stderr}")
+                    raise Exception(f"Manim failed: {result.stderr}")
+                # Manim names the output after the module, quality and scene
+                output_path = os.path.join(media_dir, "videos", "myscript",
+                                           QUALITY_FOLDERS.get(quality[-1], "480p15"), f"{scene_name}.mp4")
+
+        if PARTIAL_CACHE_SYNC:
+            sync_partials(bucket, scene_name, partial_dir, upload=True)
     
     print(f"✓ Render complete")
 
-    # 3. Find output
-    quality_folders = {
-        "-pql": "480p15",
-        "-pqm": "720p30", 
-        "-pqh": "1080p60",
-        "-pqk": "2160p60"
-    }
-    quality_folder = quality_folders.get(quality, "480p15")
-    output_path = f"./media/videos/myscript/{quality_folder}/{scene_name}.mp4"
-    
-    if not os.path.exists(output_path):
-        for root, dirs, files in os.walk("./media"):
-            for f in files:
-                if f == f"{scene_name}.mp4":
-                    output_path = os.path.join(root, f)
-                    break
-    
-    if os.path.exists(output_path):
-        # 4. Upload result
-        output_blob = bucket.blob(f"output/{scene_name}.mp4")
-        output_blob.upload_from_filename(output_path)
-        print(f"✓ Uploaded: gs://{bucket_name}/output/{scene_name}.mp4")
-    else:
-        raise Exception(f"Video file not found at {output_path}")
+    if output_path and os.path.exists(output_path):
+        # 4. Upload result. The cache blob is written from the local file, never
+        # copied from output/{scene}.mp4: that name is shared by every job
+        # rendering a scene of that name, so it is only a best-effort alias
+        output_blob = f"output/{scene_name}.mp4"
+        with timed("storage.upload", STORAGE_LATENCY, "storage", op="upload"):
+            if cache_key:
+                render_cache.put(cache_key, output_path)
+                bucket.upload_file(f"cache/{cache_key}.mp4", output_path)
+                bucket.touch(f"cache/{cache_key}.mp4")
+            bucket.upload_file(output_blob, output_path)
+        print(f"✓ Uploaded: {bucket.uri(output_blob)}")
+        return output_path
+    raise Exception(f"Video file not found at {output_path}")
+
+
+def download_blob(bucket, blob_name: Union[str, list[str]], local_path: str) -> bool:
+    """
+    Download one blob; returns False (with a warning) if it does not exist.
+    A list names candidates by preference, and the first one found is used.
+    """
+    candidates = [blob_name] if isinstance(blob_name, str) else blob_name
+    for name in candidates:
+        try:
+            with timed("storage.download", STORAGE_LATENCY, "storage", op="download"):
+                bucket.download_file(name, local_path)
+        except NotFoundError:
+            continue
+        print(f"✓ Downloaded {name}")
+        return True
+    print(f"⚠️ Warning: {' / '.join(candidates)} does not exist in bucket!")
+    return False
+
+
+def stream_to_blob(bucket, blob_name: str, cmd: list[str], workdir: str):
+    """
+    Run `cmd` and upload its stdout to `blob_name` while it is produced,
+    as a chunked resumable upload, so the output never lands on disk.
+    The bytes go to a temporary blob that replaces `blob_name` only once
+    the command succeeds, so a failure never leaves a truncated video.
+    """
+    tmp_blob = f"{blob_name}.{uuid.uuid4().hex}.part"
+    chunk_size = STITCH_UPLOAD_CHUNK_MB * 1024 * 1024
+    stderr_path = os.path.join(workdir, "ffmpeg.log")
+    with open(stderr_path, "w") as stderr:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+    try:
+        # Leaving the writer with an exception cancels the resumable upload
+        with bucket.open_write(tmp_blob, content_type="video/mp4", chunk_size=chunk_size) as writer:
+            shutil.copyfileobj(process.stdout, writer, chunk_size)
+            returncode = process.wait()
+            if returncode != 0:
+                with open(stderr_path) as f:
+                    raise Exception(f"{cmd[0]} failed ({returncode}): {f.read()[-2000:]}")
+        bucket.copy(tmp_blob, blob_name)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        bucket.delete(tmp_blob)
 
 
-def stitch_videos(bucket_name: str, scene_names: str):
+def stitch_videos(bucket_name: str, scene_names: str, blobs: Optional[list[Union[str, list[str]]]] = None,
+                  workdir: str = "."):
     """
-    Download multiple scene videos and stitch them together.
+    Download the scene videos concurrently and stitch them together inside
+    `workdir`, streaming ffmpeg's output straight into the bucket.
+    `blobs` names the exact video per scene; otherwise output/{scene}.mp4 is used.
     """
     if not shutil.which("ffmpeg"):
         raise Exception("ffmpeg not found!")
 
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(bucket_name)
+    bucket = get_bucket(bucket_name)
     scenes = scene_names.split(",")
+    if blobs and len(blobs) != len(scenes):
+        raise Exception(f"Got {len(blobs)} blobs for {len(scenes)} scenes")
+    blob_names = blobs or [f"output/{scene}.mp4" for scene in scenes]
     
     print(f"🧵 Stitching {len(scenes)} scenes...")
     
-    # Prepare list for ffmpeg
-    with open("input.txt", "w") as f:
-        for i, scene in enumerate(scenes):
-            blob_name = f"output/{scene}.mp4"
-            local_path = f"scene_{i}.mp4"
-            
-            blob = bucket.blob(blob_name)
-            if not blob.exists():
-                print(f"⚠️ Warning: {blob_name} does not exist in bucket!")
-                continue
-                
-            blob.download_to_filename(local_path)
-            f.write(f"file '{local_path}'\n")
-            print(f"✓ Downloaded {blob_name}")
+    input_list = os.path.join(workdir, "input.txt")
+    local_paths = [os.path.join(workdir, f"scene_{i}.mp4") for i in range(len(blob_names))]
 
-    # Run ffmpeg concat
-    print("🎬 Running ffmpeg...")
-    subprocess.run([
-        "ffmpeg", "-f", "concat", "-safe", "0", "-i", "input.txt",
-        "-c", "copy", "final_video.mp4", "-y"
-    ], check=True)
-    
-    if os.path.exists("final_video.mp4"):
-        output_blob = bucket.blob("output/final_video.mp4")
-        output_blob.upload_from_filename("final_video.mp4")
-        print(f"✅ Stitched video uploaded to: gs://{bucket_name}/output/final_video.mp4")
-    else:
-        raise Exception("Stitching failed - output file not created")
+    # The concat demuxer needs seekable inputs, so scenes are downloaded to
+    # disk, but all at once rather than one round trip after another
+    with ThreadPoolExecutor(max_workers=STITCH_DOWNLOAD_THREADS, thread_name_prefix="download") as pool:
+        found = list(pool.map(
+            lambda item: contextvars.copy_context().run(download_blob, bucket, *item),
+            zip(blob_names, local_paths)
+        ))
 
+    # Prepare list for ffmpeg, in scene order
+    with open(input_list, "w") as f:
+        for local_path, ok in zip(local_paths, found):
+            if ok:
+                f.write(f"file '{local_path}'\n")
+    if not any(found):
+        raise Exception("Stitching failed - none of the scene videos exist")
 
+    # Run ffmpeg concat; fragmented MP4 can be written to a pipe, so the
+    # upload runs alongside ffmpeg instead of after it
+    print("🎬 Running ffmpeg...")
+    with timed("ffmpeg.concat", SUBPROCESS_LATENCY, "stitch", command="ffmpeg"):
+        stream_to_blob(bucket, "output/final_video.mp4", [
+            "ffmpeg", "-f", "concat", "-safe", "0", "-i", input_list,
+            "-c", "copy", "-movflags", "frag_keyframe+empty_moov",
+            "-f", "mp4", "pipe:1"
+        ], workdir)
+    print(f"✅ Stitched video uploaded to: {bucket.uri('output/final_video.mp4')}")
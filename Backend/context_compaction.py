@@ -0,0 +1,226 @@
+"""
+Context Compaction
+A before_model_callback that shrinks the history sent with each agent's
+model call: superseded Manim code and storyboards are always replaced by
+short placeholders, and when the request is still over the token budget,
+old tool responses are summarized and the oldest turns dropped.
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+# Approximate tokens of history allowed per model call (0 disables compaction)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "32000"))
+# Trailing contents (the turn in progress) that are never summarized or dropped
+CONTEXT_KEEP_RECENT = int(os.getenv("CONTEXT_KEEP_RECENT", "6"))
+
+# Rough chars-per-token ratio for English text and code
+CHARS_PER_TOKEN = 4
+# Tools whose `manim_code` argument is a full copy of the lesson code
+CODE_TOOLS = {"render_manim_code", "preflight_manim_code"}
+# Old tool results and cross-agent context notes are cut to this many characters
+SUMMARY_CHARS = 400
+
+CODE_BLOCK = re.compile(r"```(?:python|py)[ \t]*\n.*?```", re.DOTALL)
+STORYBOARD_BLOCK = re.compile(r"```json[ \t]*\n[^`]*?\"scene_name\".*?```", re.DOTALL)
+
+
+def estimate_tokens(contents: list) -> int:
+    """Cheap token estimate for a list of genai Contents."""
+    chars = 0
+    for content in contents:
+        for part in content.parts or []:
+            if part.text:
+                chars += len(part.text)
+            elif part.function_call:
+                chars += len(json.dumps(part.function_call.args or {}, default=str))
+            elif part.function_response:
+                chars += len(json.dumps(part.function_response.response or {}, default=str))
+    return chars // CHARS_PER_TOKEN
+
+
+def _placeholder(kind: str, body: str) -> str:
+    return f"[{kind} omitted: superseded by a later version ({body.count(chr(10)) + 1} lines)]"
+
+
+def _new_report() -> dict:
+    return {
+        "tokens_before": 0,
+        "tokens_after": 0,
+        "code_versions_dropped": 0,
+        "storyboards_dropped": 0,
+        "tool_responses_compacted": 0,
+        "contents_dropped": 0,
+    }
+
+
+def _drop_superseded(contents: list, report: dict) -> list:
+    """
+    Walk the history newest-first and replace every code version and
+    storyboard except the latest with a placeholder.
+    """
+    seen = {"code": False, "storyboard": False}
+
+    def replace_blocks(text: str, pattern, kind: str, counter: str) -> str:
+        matches = list(pattern.finditer(text))
+        for match in reversed(matches):
+            if seen[kind]:
+                text = text[:match.start()] + _placeholder(kind, match.group(0)) + text[match.end():]
+                report[counter] += 1
+            seen[kind] = True
+        return text
+
+    compacted = []
+    for content in reversed(contents):
+        parts = []
+        for part in reversed(content.parts or []):
+            call = part.function_call
+            if call and call.name in CODE_TOOLS and (call.args or {}).get("manim_code"):
+                if seen["code"]:
+                    args = dict(call.args)
+                    args["manim_code"] = _placeholder("code", args["manim_code"])
+                    part = part.model_copy(update={"function_call": call.model_copy(update={"args": args})})
+                    report["code_versions_dropped"] += 1
+                seen["code"] = True
+            elif part.text:
+                text = replace_blocks(part.text, CODE_BLOCK, "code", "code_versions_dropped")
+                text = replace_blocks(text, STORYBOARD_BLOCK, "storyboard", "storyboards_dropped")
+                if text != part.text:
+                    part = part.model_copy(update={"text": text})
+            parts.append(part)
+        compacted.append(content.model_copy(update={"parts": list(reversed(parts))}))
+    return list(reversed(compacted))
+
+
+def _summarize_response(response: dict) -> dict:
+    """Keep short scalar fields (status, message, ids) and drop the rest."""
+    summary = {
+        key: value for key, value in response.items()
+        if isinstance(value, (str, int, float, bool)) and len(str(value)) <= SUMMARY_CHARS
+    }
+    summary["compacted"] = True
+    return summary
+
+
+def _summarize_old(contents: list, keep_recent: int, report: dict) -> list:
+    """Summarize tool responses and long context notes outside the recent tail."""
+    cutoff = max(0, len(contents) - keep_recent)
+    compacted = []
+    for index, content in enumerate(contents):
+        if index >= cutoff:
+            compacted.append(content)
+            continue
+        parts = []
+        for part in content.parts or []:
+            response = part.function_response
+            if response and response.response and not response.response.get("compacted"):
+                part = part.model_copy(update={
+                    "function_response": response.model_copy(update={"response": _summarize_response(response.response)})
+                })
+                report["tool_responses_compacted"] += 1
+            elif part.text and part.text.startswith("For context:") and len(part.text) > SUMMARY_CHARS:
+                part = part.model_copy(update={
+                    "text": f"{part.text[:SUMMARY_CHARS]}… [{len(part.text) - SUMMARY_CHARS} chars compacted]"
+                })
+                report["tool_responses_compacted"] += 1
+            parts.append(part)
+        compacted.append(content.model_copy(update={"parts": parts}))
+    return compacted
+
+
+def _is_user_prompt(content) -> bool:
+    return content.role == "user" and any(part.text for part in content.parts or [])
+
+
+def _drop_oldest(contents: list, budget: int, keep_recent: int, report: dict) -> list:
+    """
+    Drop whole leading turns until under budget. A cut always lands on a
+    user prompt so no function call loses its response.
+    """
+    limit = len(contents) - keep_recent
+    start = 0
+    while estimate_tokens(contents[start:]) > budget:
+        following = next(
+            (i for i in range(start + 1, limit) if _is_user_prompt(contents[i])), None
+        )
+        if following is None:
+            break
+        start = following
+    report["contents_dropped"] += start
+    return contents[start:]
+
+
+def compact_contents(contents: list, budget: int = CONTEXT_TOKEN_BUDGET,
+                     keep_recent: int = CONTEXT_KEEP_RECENT) -> tuple[list, dict]:
+    """
+    Compact a model request's history.
+
+    Args:
+        contents: genai Contents, oldest first. Not modified.
+        budget: Approximate token budget for the history.
+        keep_recent: Trailing contents that are never summarized or dropped.
+
+    Returns:
+        (compacted contents, report of what was trimmed)
+    """
+    report = _new_report()
+    report["tokens_before"] = estimate_tokens(contents)
+
+    contents = _drop_superseded(contents, report)
+    if estimate_tokens(contents) > budget:
+        contents = _summarize_old(contents, keep_recent, report)
+    if estimate_tokens(contents) > budget:
+        contents = _drop_oldest(contents, budget, keep_recent, report)
+
+    report["tokens_after"] = estimate_tokens(contents)
+    return contents, report
+
+
+class CompactionStats:
+    """Running totals of what compaction trimmed, per agent."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents: dict[str, dict] = {}
+
+    def record(self, agent_name: str, report: dict):
+        with self._lock:
+            totals = self._agents.setdefault(agent_name, {"calls": 0, "compacted_calls": 0})
+            totals["calls"] += 1
+            if report["tokens_after"] < report["tokens_before"]:
+                totals["compacted_calls"] += 1
+            for key, value in report.items():
+                totals[key] = totals.get(key, 0) + value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            agents = {name: dict(totals) for name, totals in self._agents.items()}
+        for totals in agents.values():
+            before = totals.get("tokens_before", 0)
+            totals["tokens_saved"] = before - totals.get("tokens_after", 0)
+            totals["saved_ratio"] = round(totals["tokens_saved"] / before, 3) if before else 0.0
+        return agents
+
+
+compaction_stats = CompactionStats()
+
+
+def compact_context(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """before_model_callback: compact llm_request.contents to CONTEXT_TOKEN_BUDGET."""
+    if CONTEXT_TOKEN_BUDGET <= 0 or not llm_request.contents:
+        return None
+
+    contents, report = compact_contents(llm_request.contents)
+    llm_request.contents = contents
+    compaction_stats.record(callback_context.agent_name, report)
+    if report["tokens_after"] < report["tokens_before"]:
+        print(f"🗜️  {callback_context.agent_name}: context {report['tokens_before']} -> "
+              f"{report['tokens_after']} tokens")
+    return None
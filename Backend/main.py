@@ -1,15 +1,29 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
 from agent import runner
+from tools.render_jobs import render_jobs
+from pipeline import LESSON_KEY
+from context_compaction import compaction_stats
+from response_cache import BYPASS_CACHE_KEY, response_cache_stats
+from cloud.telemetry import instrument_app
+from cloud.callback_auth import verify
+import json
 import os
+import uuid
 from dotenv import load_dotenv
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.genai import types
 
 load_dotenv()
 
 app = FastAPI()
 
+# X-Request-ID, a span per request, latency/error metrics and GET /metrics
+instrument_app(app, "chalkline-api")
+
 # CORS — allow the frontend dev server to call the backend
 app.add_middleware(
     CORSMiddleware,
@@ -26,7 +40,10 @@ app.add_middleware(
 class PromptRequest(BaseModel):
     prompt: str
     user_id: str = "default_user"
-    session_id: str = "default_session"
+    # Omit to start a new session; send back the returned session_id to continue it
+    session_id: Optional[str] = None
+    # Skip cached Tutor/ScriptWriter answers and generate fresh ones
+    fresh: bool = False
 
 
 @app.post("/api/agent")
@@ -35,27 +52,158 @@ async def process_prompt(request: PromptRequest):
     Receive a user prompt and return the orchestrator agent's response.
     Reuses the Runner defined in agent.py (which holds session state).
     """
+    session_id = request.session_id or str(uuid.uuid4())
     try:
         response_text = ""
+        lesson = None
         async for event in runner.run_async(
             user_id=request.user_id,
-            session_id=request.session_id,
+            session_id=session_id,
             new_message=types.Content(
                 role="user",
                 parts=[types.Part(text=request.prompt)]
-            )
+            ),
+            state_delta={BYPASS_CACHE_KEY: request.fresh}
         ):
             if hasattr(event, 'content') and event.content:
                 for part in event.content.parts:
                     if hasattr(part, 'text') and part.text:
                         response_text += part.text
+            lesson = _lesson_from(event) or lesson
 
-        return {"response": response_text}
+        return {"response": response_text, "lesson": lesson, "session_id": session_id}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _lesson_from(event):
+    """The lesson JSON assembled by the pipeline's final step, if `event` carries it."""
+    actions = getattr(event, 'actions', None)
+    if actions and actions.state_delta:
+        return actions.state_delta.get(LESSON_KEY)
+    return None
+
+
+# Tool responses that mean a render/stitch job was handed to the renderer
+RENDER_TOOLS = {"render_manim_code", "stitch_cloud_video", "check_render_status"}
+
+
+def _event_payloads(event, previous_author):
+    """
+    Translate one ADK event into (sse_event_name, payload) pairs.
+    """
+    payloads = []
+    author = getattr(event, 'author', None)
+    if author and author != previous_author and author != "user":
+        payloads.append(("agent", {"agent": author}))
+
+    if not (hasattr(event, 'content') and event.content and event.content.parts):
+        return payloads
+
+    partial = bool(getattr(event, 'partial', False))
+    for part in event.content.parts:
+        if getattr(part, 'function_call', None):
+            fc = part.function_call
+            if fc.name == "transfer_to_agent":
+                payloads.append(("handoff", {"from": author, "to": (fc.args or {}).get("agent_name")}))
+            else:
+                payloads.append(("tool_call", {"agent": author, "name": fc.name, "args": fc.args}))
+        elif getattr(part, 'function_response', None):
+            fr = part.function_response
+            name = "render" if fr.name in RENDER_TOOLS else "tool_response"
+            payloads.append((name, {"agent": author, "name": fr.name, "response": fr.response}))
+        elif getattr(part, 'text', None):
+            payloads.append(("text", {"agent": author, "text": part.text, "partial": partial}))
+    return payloads
+
+
+def _sse(event_name: str, payload: dict) -> str:
+    return f"event: {event_name}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+@app.post("/api/agent/stream")
+async def stream_prompt(request: PromptRequest):
+    """
+    Same pipeline as /api/agent, streamed as Server-Sent Events.
+
+    Emits `agent`, `handoff`, `tool_call`, `tool_response`, `render` and
+    `text` (with partial model tokens) events as the ADK runner yields
+    them, then a final `done` event carrying the assembled response (and,
+    in pipeline mode, the lesson JSON).
+    """
+    session_id = request.session_id or str(uuid.uuid4())
+
+    async def event_stream():
+        response_text = ""
+        lesson = None
+        previous_author = None
+        try:
+            async for event in runner.run_async(
+                user_id=request.user_id,
+                session_id=session_id,
+                new_message=types.Content(
+                    role="user",
+                    parts=[types.Part(text=request.prompt)]
+                ),
+                state_delta={BYPASS_CACHE_KEY: request.fresh},
+                run_config=RunConfig(streaming_mode=StreamingMode.SSE)
+            ):
+                for event_name, payload in _event_payloads(event, previous_author):
+                    yield _sse(event_name, payload)
+                previous_author = getattr(event, 'author', None) or previous_author
+
+                # Partial chunks are repeated in the final aggregated event
+                if not getattr(event, 'partial', False) and event.content and event.content.parts:
+                    for part in event.content.parts:
+                        if hasattr(part, 'text') and part.text:
+                            response_text += part.text
+                lesson = _lesson_from(event) or lesson
+
+            yield _sse("done", {"response": response_text, "lesson": lesson, "session_id": session_id})
+
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/render/callback")
+async def render_callback(request: Request):
+    """
+    Completion push from the render worker (see RENDER_CALLBACK_URL).
+    Must be signed with RENDER_CALLBACK_SECRET. Wakes any wait_for_render()
+    call blocked on this job.
+    """
+    body = await request.body()
+    if not verify(body, request.headers):
+        raise HTTPException(status_code=401, detail="Invalid or missing callback signature")
+    try:
+        job = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON job record")
+    if not isinstance(job, dict) or "job_id" not in job or "status" not in job:
+        raise HTTPException(status_code=400, detail="job_id and status are required")
+    render_jobs.complete(job)
+    return {"status": "ok"}
+
+
+@app.get("/api/context/stats")
+def context_stats():
+    """Per-agent totals of tokens trimmed by context compaction."""
+    return compaction_stats.snapshot()
+
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    """Hit/miss counters for the Tutor/ScriptWriter response cache."""
+    return response_cache_stats.snapshot()
+
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
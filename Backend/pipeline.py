@@ -0,0 +1,145 @@
+"""
+Deterministic Pipeline Mode
+Runs Tutor -> ScriptWriter -> ManimCoder in a fixed order without an LLM
+orchestrator, forwarding each agent's output to the next through session
+state, and assembles the final lesson JSON in Python. Stage outputs are
+cleared at the start of every run, so a turn never reuses an earlier
+turn's explanation, storyboard or code.
+"""
+
+import json
+import re
+from typing import AsyncGenerator
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from tools.cloud_render import MANIM_CODE_KEY
+
+# Session state keys written by each stage
+EXPLANATION_KEY = "explanation"
+STORYBOARD_KEY = "storyboard"
+RENDER_SUMMARY_KEY = "render_summary"
+LESSON_KEY = "lesson"
+
+# Outputs of a single pipeline run. Cleared by StageReset rather than given
+# ADK's temp: prefix, which the session services drop when applying an
+# event's state delta, so the next stage would never see them.
+STAGE_KEYS = (EXPLANATION_KEY, STORYBOARD_KEY, MANIM_CODE_KEY, RENDER_SUMMARY_KEY)
+
+
+def forward_state(base_instruction: str, *sections: tuple[str, str]):
+    """
+    Build an instruction provider that appends earlier stages' outputs
+    (state key, heading) to `base_instruction`.
+
+    A provider is used instead of `{key}` templating because the prompt
+    files contain literal braces in their JSON and code examples.
+    """
+    def provider(ctx: ReadonlyContext) -> str:
+        instruction = base_instruction
+        for key, heading in sections:
+            value = ctx.state.get(key)
+            if value:
+                instruction += f"\n\n## {heading}\n\n{value}"
+        return instruction
+
+    return provider
+
+
+def _strip_fences(text: str) -> str:
+    match = re.search(r"```(?:json|python)?\s*\n(.*?)```", text, re.DOTALL)
+    return match.group(1).strip() if match else text.strip()
+
+
+def _parse_storyboard(text: str):
+    """Storyboard as parsed JSON when possible, otherwise the raw text."""
+    try:
+        return json.loads(_strip_fences(text))
+    except (ValueError, TypeError):
+        return text
+
+
+def assemble_lesson(topic: str, state: dict) -> dict:
+    """
+    Build the Orchestrator's output JSON (see prompts/orchestrator.md) from
+    the outputs the pipeline stages left in session state.
+    """
+    explanation = state.get(EXPLANATION_KEY)
+    storyboard_text = state.get(STORYBOARD_KEY)
+    code = state.get(MANIM_CODE_KEY)
+    if not code and state.get(RENDER_SUMMARY_KEY) and "```" in state[RENDER_SUMMARY_KEY]:
+        code = _strip_fences(state[RENDER_SUMMARY_KEY])
+
+    failed_at = None
+    if not explanation:
+        failed_at = "tutor"
+    elif not storyboard_text:
+        failed_at = "scriptwriter"
+    elif not code:
+        failed_at = "manimcoder"
+
+    if failed_at:
+        return {
+            "status": "error",
+            "failed_at": failed_at,
+            "error_message": f"The {failed_at} stage produced no output",
+            "partial_results": {
+                "explanation": explanation,
+                "storyboard": _parse_storyboard(storyboard_text) if storyboard_text else None
+            },
+            "suggestion": "Try rephrasing the request or narrowing the topic"
+        }
+
+    storyboard = _parse_storyboard(storyboard_text)
+    scenes = storyboard if isinstance(storyboard, list) else []
+    duration = sum(scene.get("duration_seconds", 0) for scene in scenes if isinstance(scene, dict))
+    return {
+        "status": "success",
+        "topic": topic,
+        "explanation": {"content": explanation},
+        "storyboard": storyboard,
+        "code": {
+            "language": "python",
+            "framework": "manim-community",
+            "full_code": code
+        },
+        "render": state.get(RENDER_SUMMARY_KEY),
+        "metadata": {
+            "total_scenes": len(scenes),
+            "video_duration": f"{duration} seconds" if duration else None
+        }
+    }
+
+
+class StageReset(BaseAgent):
+    """First pipeline step: clears the previous run's stage outputs. Makes no model calls."""
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        yield Event(
+            author=self.name,
+            invocation_id=ctx.invocation_id,
+            branch=ctx.branch,
+            actions=EventActions(state_delta={key: None for key in STAGE_KEYS})
+        )
+
+
+class LessonAssembler(BaseAgent):
+    """Final pipeline step: emits the assembled lesson JSON. Makes no model calls."""
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        topic = ""
+        if ctx.user_content and ctx.user_content.parts:
+            topic = "".join(part.text or "" for part in ctx.user_content.parts)
+
+        lesson = assemble_lesson(topic, dict(ctx.session.state))
+        yield Event(
+            author=self.name,
+            invocation_id=ctx.invocation_id,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=json.dumps(lesson, indent=2))]),
+            actions=EventActions(state_delta={LESSON_KEY: lesson})
+        )
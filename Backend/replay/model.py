@@ -0,0 +1,134 @@
+"""
+Replay / Recording Models
+A LiteLlm-compatible model that plays back recorded turns, and a wrapper
+that records a live model's turns into the same transcript format.
+
+Transcript format (JSON):
+    {
+      "prompt": "user prompt",
+      "mode": "agentic" | "pipeline",
+      "agents": {
+        "Orchestrator": [[{"function_call": {"name": "...", "args": {...}}}], ...],
+        "Tutor": [[{"text": "..."}], ...]
+      }
+    }
+Each agent maps to its model turns in order; each turn is a list of parts.
+"""
+
+import json
+from typing import Any, AsyncGenerator
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from pydantic import Field, PrivateAttr
+
+
+class TranscriptExhausted(Exception):
+    """The pipeline asked an agent for more model turns than were recorded."""
+
+
+def _to_part(part: dict) -> types.Part:
+    if "function_call" in part:
+        call = part["function_call"]
+        return types.Part(function_call=types.FunctionCall(name=call["name"], args=call.get("args", {})))
+    return types.Part(text=part["text"])
+
+
+def _from_part(part: types.Part) -> dict:
+    if part.function_call:
+        return {"function_call": {"name": part.function_call.name, "args": dict(part.function_call.args or {})}}
+    return {"text": part.text or ""}
+
+
+class ReplayLlm(BaseLlm):
+    """Plays back one agent's recorded turns, one per model call."""
+
+    agent_name: str = ""
+    turns: list[list[dict]] = Field(default_factory=list)
+    _cursor: int = PrivateAttr(default=0)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        if self._cursor >= len(self.turns):
+            raise TranscriptExhausted(
+                f"{self.agent_name} requested model turn {self._cursor + 1}, "
+                f"but only {len(self.turns)} were recorded"
+            )
+        parts = [_to_part(part) for part in self.turns[self._cursor]]
+        self._cursor += 1
+        yield LlmResponse(content=types.Content(role="model", parts=parts), turn_complete=True)
+
+    @property
+    def calls(self) -> int:
+        return self._cursor
+
+
+class RecordingLlm(BaseLlm):
+    """Wraps a live model and records every complete turn it returns."""
+
+    inner: Any = None
+    agent_name: str = ""
+    turns: list[list[dict]] = Field(default_factory=list)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        async for response in self.inner.generate_content_async(llm_request, stream=stream):
+            if not response.partial and response.content and response.content.parts:
+                self.turns.append([_from_part(part) for part in response.content.parts])
+            yield response
+
+
+def load_transcript(path: str) -> dict:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def replay_models(transcript: dict):
+    """
+    Build a `model_for(agent_name, model_name)` factory for
+    agent.build_agent that serves each agent its recorded turns.
+    Returns the factory and the dict of models it creates.
+    """
+    models: dict[str, ReplayLlm] = {}
+
+    def model_for(agent_name: str, model_name: str) -> ReplayLlm:
+        models[agent_name] = ReplayLlm(
+            model=f"replay/{model_name}",
+            agent_name=agent_name,
+            turns=transcript["agents"].get(agent_name, [])
+        )
+        return models[agent_name]
+
+    return model_for, models
+
+
+def recording_models(live_model_for):
+    """
+    Build a `model_for` factory that records around `live_model_for`.
+    Returns the factory and the dict of recorders it creates.
+    """
+    recorders: dict[str, RecordingLlm] = {}
+
+    def model_for(agent_name: str, model_name: str) -> RecordingLlm:
+        recorders[agent_name] = RecordingLlm(
+            model=model_name,
+            agent_name=agent_name,
+            inner=live_model_for(agent_name, model_name)
+        )
+        return recorders[agent_name]
+
+    return model_for, recorders
+
+
+def save_transcript(path: str, prompt: str, recorders: dict, mode: str = "agentic"):
+    transcript = {
+        "prompt": prompt,
+        "mode": mode,
+        "agents": {name: recorder.turns for name, recorder in recorders.items()}
+    }
+    with open(path, "w") as f:
+        json.dump(transcript, f, indent=2)
@@ -0,0 +1,140 @@
+"""
+Stub Render / Storage Tools
+Drop-in replacements for ManimCoder's tools with the same names and
+signatures. They run our own in-process code (validation, hashing) but
+never touch the network, the bucket, or the manim renderer.
+"""
+
+import itertools
+from typing import Any, Dict, Optional
+
+from google.adk.tools.tool_context import ToolContext
+
+from tools.preflight import preflight, preflight_manim_code
+from tools.scene_source import scene_digests
+from tools.cloud_render import MANIM_CODE_KEY, RENDER_JOBS_KEY
+
+_job_ids = itertools.count(1)
+
+
+def query_manim_docs(class_name: str) -> str:
+    """
+    Tool function - gets Manim documentation for a class.
+
+    Args:
+        class_name: Name of Manim class to look up (e.g., 'Circle', 'FadeIn')
+
+    Returns:
+        Formatted documentation string
+    """
+    return f"# {class_name} Documentation (replay stub)\n\n**Signature:** `{class_name}(*args, **kwargs)`\n"
+
+
+def search_manim_docs(keyword: str) -> str:
+    """
+    Search Manim documentation by keyword.
+
+    Args:
+        keyword: Search term (class name or concept)
+
+    Returns:
+        List of matching classes with links
+    """
+    return f"# Search Results for '{keyword}'\n\n- **{keyword.title()}**: replay://{keyword}\n"
+
+
+def render_manim_code(manim_code: str, prefer_local: bool = False, quality: str = "auto",
+                      tool_context: Optional[ToolContext] = None) -> Dict[str, Any]:
+    """
+    Tool function to render Manim code.
+
+    Args:
+        manim_code: Complete Python code containing Manim Scene classes
+        prefer_local: If True, skip cloud and render locally immediately
+        quality: "auto" renders a fast preview now and upgrades it to final
+            quality in the background; "preview" or "final" render only that
+
+    Returns:
+        Dictionary with render status, scene count, and output info
+    """
+    check = preflight(manim_code)
+    if not check["ok"]:
+        return {"status": "error", "stage": "preflight", "errors": check["errors"]}
+    if tool_context is not None:
+        tool_context.state[MANIM_CODE_KEY] = manim_code
+
+    scenes = check["scenes"]
+    scene_digests(manim_code, scenes)
+    jobs = {scene: f"replay-{next(_job_ids)}" for scene in scenes}
+    if tool_context is not None:
+        tool_context.state[RENDER_JOBS_KEY] = jobs
+    return {
+        "status": "success",
+        "mode": "cloud",
+        "message": f"Dispatched {len(scenes)} render jobs (replay stub)",
+        "scenes": scenes,
+        "reused": [],
+        "jobs": jobs,
+        "errors": [],
+        "next_step": "Use wait_for_render() then stitch_cloud_video()"
+    }
+
+
+def wait_for_render(timeout_seconds: int = 300,
+                    tool_context: Optional[ToolContext] = None) -> Dict[str, Any]:
+    """
+    Wait until the jobs from the last render_manim_code or stitch_cloud_video
+    call have finished.
+
+    Args:
+        timeout_seconds: Maximum time to wait before returning
+
+    Returns:
+        Dictionary with completed, failed and still-pending scenes
+    """
+    jobs = dict(tool_context.state.get(RENDER_JOBS_KEY) or {}) if tool_context else {}
+    return {"status": "success", "completed": list(jobs), "failed": {}, "pending": []}
+
+
+def check_render_status() -> Dict[str, Any]:
+    """
+    Check the status of rendered videos.
+
+    Returns:
+        Dictionary with list of completed videos and their URLs
+    """
+    return {"status": "success", "completed_videos": 0, "final_video_ready": False, "videos": []}
+
+
+def stitch_cloud_video(scene_names: list[str],
+                       tool_context: Optional[ToolContext] = None) -> Dict[str, Any]:
+    """
+    Dispatch a job to stitch rendered scenes together.
+
+    Args:
+        scene_names: List of scene names in the order they should appear.
+
+    Returns:
+        Status dictionary with job info.
+    """
+    job_id = f"replay-{next(_job_ids)}"
+    if tool_context is not None:
+        tool_context.state[RENDER_JOBS_KEY] = {"final_video": job_id}
+    return {
+        "status": "success",
+        "message": "Stitching job dispatched (replay stub)",
+        "job_id": job_id,
+        "final_url": "replay://output/final_video.mp4"
+    }
+
+
+def stub_manim_tools():
+    return [
+        query_manim_docs,
+        search_manim_docs,
+        preflight_manim_code,
+        render_manim_code,
+        wait_for_render,
+        check_render_status,
+        stitch_cloud_video,
+    ]
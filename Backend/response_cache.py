@@ -0,0 +1,161 @@
+"""
+Model Response Cache
+before/after_model_callbacks that reuse Tutor and ScriptWriter answers for
+topics we have already explained. Keyed on the normalized prompt, a hash of
+the agent's full instruction (which in pipeline mode includes the upstream
+agent's output) and the model name.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from tools.cache import TieredCache, TTLCache
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_DIR = os.getenv(
+    "RESPONSE_CACHE_DIR", os.path.join(os.path.dirname(__file__), "response_cache")
+)
+# Agents whose answers depend only on the topic; empty disables the cache
+RESPONSE_CACHE_AGENTS = {
+    name.strip() for name in os.getenv("RESPONSE_CACHE_AGENTS", "Tutor,ScriptWriter").split(",") if name.strip()
+}
+
+# Session state flag set per request by the API: skip cached answers (they are still refreshed)
+BYPASS_CACHE_KEY = "bypass_response_cache"
+
+response_cache = TieredCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL, directory=RESPONSE_CACHE_DIR)
+# Keys computed before a model call, waiting for its response: (invocation_id, agent) -> key
+_pending = TTLCache(maxsize=256, ttl=600)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", prompt.lower()).split())
+
+
+def _text(content: Optional[types.Content]) -> str:
+    if not content or not content.parts:
+        return ""
+    return "".join(part.text or "" for part in content.parts)
+
+
+def _is_first_call(llm_request: LlmRequest) -> bool:
+    """
+    True when the request carries exactly one user prompt and none of this
+    agent's own turns: a fresh session, and the agent's first model call.
+    Other agents' output appears as user-role "For context:" notes.
+    """
+    prompts = 0
+    for content in llm_request.contents or []:
+        if content.role == "model":
+            return False
+        for part in content.parts or []:
+            if part.function_response:
+                return False
+            if part.text and not part.text.startswith("For context:"):
+                prompts += 1
+                break
+    return prompts == 1
+
+
+def _cache_key(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[str]:
+    if callback_context.agent_name not in RESPONSE_CACHE_AGENTS or not _is_first_call(llm_request):
+        return None
+    prompt = normalize_prompt(_text(callback_context.user_content))
+    if not prompt:
+        return None
+    instruction = (llm_request.config.system_instruction if llm_request.config else None) or ""
+    if isinstance(instruction, types.Content):
+        instruction = _text(instruction)
+    instruction_hash = hashlib.sha256(str(instruction).encode()).hexdigest()
+    return f"{callback_context.agent_name}:{llm_request.model}:{instruction_hash}:{prompt}"
+
+
+def _to_parts(stored: list[dict]) -> list[types.Part]:
+    parts = []
+    for part in stored:
+        if "function_call" in part:
+            call = part["function_call"]
+            parts.append(types.Part(function_call=types.FunctionCall(name=call["name"], args=call.get("args", {}))))
+        else:
+            parts.append(types.Part(text=part["text"]))
+    return parts
+
+
+def _from_parts(parts: list[types.Part]) -> Optional[list[dict]]:
+    stored = []
+    for part in parts:
+        if part.function_call:
+            stored.append({"function_call": {"name": part.function_call.name,
+                                             "args": dict(part.function_call.args or {})}})
+        elif part.text and not part.thought:
+            stored.append({"text": part.text})
+    # Only answers with text are worth replaying
+    return stored if any("text" in part for part in stored) else None
+
+
+class ResponseCacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"hits": 0, "misses": 0, "bypassed": 0, "stored": 0}
+
+    def incr(self, name: str):
+        with self._lock:
+            self.counts[name] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_ratio"] = round(counts["hits"] / lookups, 3) if lookups else 0.0
+        counts["entries"] = len(response_cache)
+        return counts
+
+
+response_cache_stats = ResponseCacheStats()
+
+
+def serve_cached_response(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """before_model_callback: answer from the cache and skip the model call on a hit."""
+    key = _cache_key(callback_context, llm_request)
+    if key is None:
+        return None
+    pending = f"{callback_context.invocation_id}:{callback_context.agent_name}"
+    if callback_context.state.get(BYPASS_CACHE_KEY):
+        response_cache_stats.incr("bypassed")
+        _pending.set(pending, key)
+        return None
+
+    stored = response_cache.get(key)
+    if stored is None:
+        response_cache_stats.incr("misses")
+        _pending.set(pending, key)
+        return None
+
+    response_cache_stats.incr("hits")
+    print(f"♻️  {callback_context.agent_name}: reused cached answer")
+    return LlmResponse(content=types.Content(role="model", parts=_to_parts(stored)), turn_complete=True)
+
+
+def cache_response(callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+    """after_model_callback: store complete first-call answers for later reuse."""
+    if llm_response.partial or llm_response.error_code or not llm_response.content:
+        return None
+    pending = f"{callback_context.invocation_id}:{callback_context.agent_name}"
+    key = _pending.get(pending)
+    if key:
+        _pending.delete(pending)
+        stored = _from_parts(llm_response.content.parts or [])
+        if stored is not None:
+            response_cache.set(key, stored)
+            response_cache_stats.incr("stored")
+    return None
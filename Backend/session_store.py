@@ -0,0 +1,380 @@
+"""
+SQLite Session Store
+A bounded, disk-backed implementation of ADK's session service. Sessions
+survive restarts, each session's history is capped by event count and
+bytes, idle sessions are evicted, and the whole store has a size ceiling.
+Nothing is cached in process memory beyond the session a request is using.
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.state import State
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(os.path.dirname(__file__), "sessions.db"))
+# Events kept per session; older turns are dropped a whole user turn at a time
+SESSION_MAX_EVENTS = int(os.getenv("SESSION_MAX_EVENTS", "200"))
+# Serialized event bytes kept per session
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_MB", "4")) * 1024 * 1024
+# Sessions untouched for this long are deleted
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", str(7 * 24 * 3600)))
+# Ceiling for all stored events; least recently used sessions go first
+SESSION_DB_MAX_BYTES = int(os.getenv("SESSION_DB_MAX_MB", "512")) * 1024 * 1024
+# Minimum seconds between eviction sweeps
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "300"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, id)
+);
+CREATE INDEX IF NOT EXISTS sessions_update_time ON sessions (update_time);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    author TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    size INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_session ON events (app_name, user_id, session_id, seq);
+CREATE TABLE IF NOT EXISTS app_states (
+    app_name TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_states (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id)
+);
+"""
+
+
+def _split_state(state: dict) -> tuple[dict, dict, dict]:
+    """Split a state dict into (app, user, session) parts; temp: keys are dropped."""
+    app, user, session = {}, {}, {}
+    for key, value in state.items():
+        if key.startswith(State.APP_PREFIX):
+            app[key[len(State.APP_PREFIX):]] = value
+        elif key.startswith(State.USER_PREFIX):
+            user[key[len(State.USER_PREFIX):]] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            session[key] = value
+    return app, user, session
+
+
+def _merge_state(app: dict, user: dict, session: dict) -> dict:
+    state = dict(session)
+    state.update({State.APP_PREFIX + key: value for key, value in app.items()})
+    state.update({State.USER_PREFIX + key: value for key, value in user.items()})
+    return state
+
+
+class SqliteSessionService(BaseSessionService):
+    """
+    ADK session service backed by a single SQLite file.
+
+    All SQL runs in worker threads (asyncio.to_thread) behind one lock, so
+    the event loop never blocks on disk.
+    """
+
+    def __init__(
+        self,
+        path: str = SESSION_DB_PATH,
+        max_events: int = SESSION_MAX_EVENTS,
+        max_bytes: int = SESSION_MAX_BYTES,
+        idle_ttl: float = SESSION_IDLE_TTL,
+        db_max_bytes: int = SESSION_DB_MAX_BYTES,
+        sweep_interval: float = SESSION_SWEEP_INTERVAL,
+    ):
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.db_max_bytes = db_max_bytes
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    # ------------------------------------------------------------------
+    # BaseSessionService interface
+    # ------------------------------------------------------------------
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = (session_id or "").strip() or str(uuid.uuid4())
+        return await asyncio.to_thread(self._create, app_name, user_id, session_id, state or {})
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        return await asyncio.to_thread(self._get, app_name, user_id, session_id, config)
+
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        return await asyncio.to_thread(self._list, app_name, user_id)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await asyncio.to_thread(self._delete, app_name, user_id, session_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        # Applies the state delta to the in-memory session and appends the event
+        event = await super().append_event(session, event)
+        await asyncio.to_thread(self._append, session, event)
+        return event
+
+    # ------------------------------------------------------------------
+    # SQL (runs in worker threads)
+    # ------------------------------------------------------------------
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Run the body of a `with` block as one write transaction."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _load_shared_state(self, app_name: str, user_id: str) -> tuple[dict, dict]:
+        row = self._conn.execute("SELECT state FROM app_states WHERE app_name = ?", (app_name,)).fetchone()
+        app = json.loads(row[0]) if row else {}
+        row = self._conn.execute(
+            "SELECT state FROM user_states WHERE app_name = ? AND user_id = ?", (app_name, user_id)
+        ).fetchone()
+        user = json.loads(row[0]) if row else {}
+        return app, user
+
+    def _save_state(self, conn, app_name: str, user_id: str, session_id: str,
+                    state: dict, now: float, insert: bool = False):
+        app_delta, user_delta, session_state = _split_state(state)
+        if app_delta:
+            app, _ = self._load_shared_state(app_name, user_id)
+            app.update(app_delta)
+            conn.execute(
+                "INSERT OR REPLACE INTO app_states (app_name, state) VALUES (?, ?)",
+                (app_name, json.dumps(app)),
+            )
+        if user_delta:
+            _, user = self._load_shared_state(app_name, user_id)
+            user.update(user_delta)
+            conn.execute(
+                "INSERT OR REPLACE INTO user_states (app_name, user_id, state) VALUES (?, ?, ?)",
+                (app_name, user_id, json.dumps(user)),
+            )
+        if insert:
+            conn.execute(
+                "INSERT INTO sessions (app_name, user_id, id, state, update_time) VALUES (?, ?, ?, ?, ?)",
+                (app_name, user_id, session_id, json.dumps(session_state), now),
+            )
+        else:
+            conn.execute(
+                "UPDATE sessions SET state = ?, update_time = ? WHERE app_name = ? AND user_id = ? AND id = ?",
+                (json.dumps(session_state), now, app_name, user_id, session_id),
+            )
+
+    def _create(self, app_name: str, user_id: str, session_id: str, state: dict) -> Session:
+        now = time.time()
+        with self._lock:
+            try:
+                with self._transaction() as conn:
+                    self._save_state(conn, app_name, user_id, session_id, state, now, insert=True)
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Session {session_id} already exists")
+            app, user = self._load_shared_state(app_name, user_id)
+        self._maybe_sweep()
+        return Session(
+            id=session_id,
+            app_name=app_name,
+            user_id=user_id,
+            state=_merge_state(app, user, _split_state(state)[2]),
+            last_update_time=now,
+        )
+
+    def _get(self, app_name: str, user_id: str, session_id: str,
+             config: Optional[GetSessionConfig]) -> Optional[Session]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, update_time FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?",
+                (app_name, user_id, session_id),
+            ).fetchone()
+            if row is None:
+                return None
+            if self.idle_ttl and time.time() - row[1] > self.idle_ttl:
+                with self._transaction() as conn:
+                    self._delete_rows(conn, app_name, user_id, session_id)
+                return None
+
+            where = "app_name = ? AND user_id = ? AND session_id = ?"
+            params: list = [app_name, user_id, session_id]
+            if config and config.after_timestamp:
+                where += " AND timestamp >= ?"
+                params.append(config.after_timestamp)
+            if config and config.num_recent_events:
+                query = (f"SELECT data FROM (SELECT seq, data FROM events WHERE {where} "
+                         "ORDER BY seq DESC LIMIT ?) ORDER BY seq")
+                params.append(config.num_recent_events)
+            else:
+                query = f"SELECT data FROM events WHERE {where} ORDER BY seq"
+            events = [Event.model_validate_json(data) for (data,) in self._conn.execute(query, params)]
+            app, user = self._load_shared_state(app_name, user_id)
+
+        return Session(
+            id=session_id,
+            app_name=app_name,
+            user_id=user_id,
+            state=_merge_state(app, user, json.loads(row[0])),
+            events=events,
+            last_update_time=row[1],
+        )
+
+    def _list(self, app_name: str, user_id: Optional[str]) -> ListSessionsResponse:
+        query = "SELECT user_id, id, state, update_time FROM sessions WHERE app_name = ?"
+        params: list = [app_name]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return ListSessionsResponse(sessions=[
+            Session(id=sid, app_name=app_name, user_id=uid, state=json.loads(state), last_update_time=updated)
+            for uid, sid, state, updated in rows
+        ])
+
+    def _delete_rows(self, conn, app_name: str, user_id: str, session_id: str):
+        conn.execute("DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                     (app_name, user_id, session_id))
+        conn.execute("DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?",
+                     (app_name, user_id, session_id))
+
+    def _delete(self, app_name: str, user_id: str, session_id: str):
+        with self._lock, self._transaction() as conn:
+            self._delete_rows(conn, app_name, user_id, session_id)
+
+    def _append(self, session: Session, event: Event):
+        data = event.model_dump_json(exclude_none=True)
+        now = time.time()
+        key = (session.app_name, session.user_id, session.id)
+        with self._lock, self._transaction() as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key
+            ).fetchone()
+            self._save_state(conn, *key, session.state, now, insert=not exists)
+            conn.execute(
+                "INSERT INTO events (app_name, user_id, session_id, author, timestamp, size, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*key, event.author, event.timestamp, len(data), data),
+            )
+            dropped = self._enforce_caps(conn, key)
+        session.last_update_time = now
+        if dropped:
+            del session.events[:min(dropped, len(session.events))]
+        self._maybe_sweep()
+
+    def _enforce_caps(self, conn, key: tuple) -> int:
+        """
+        Drop the oldest events of one session until it fits max_events and
+        max_bytes. Cuts land just before a user message so a model turn is
+        never split from its function responses, and never past the latest
+        user message so the turn in progress keeps its prompt. Returns the
+        number of events dropped.
+        """
+        rows = conn.execute(
+            "SELECT seq, author, size FROM events WHERE app_name = ? AND user_id = ? AND session_id = ? "
+            "ORDER BY seq", key
+        ).fetchall()
+        count, total = len(rows), sum(size for _, _, size in rows)
+        if count <= self.max_events and total <= self.max_bytes:
+            return 0
+
+        last_user = max((i for i, (_, author, _) in enumerate(rows) if author == "user"), default=0)
+        cut = 0
+        while cut < last_user and (count - cut > self.max_events or total > self.max_bytes):
+            total -= rows[cut][2]
+            cut += 1
+        while cut < last_user and rows[cut][1] != "user":
+            cut += 1
+        if cut:
+            conn.execute(
+                "DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ? AND seq < ?",
+                (*key, rows[cut][0]),
+            )
+        return cut
+
+    def _maybe_sweep(self):
+        now = time.time()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        self.sweep(now)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Evict idle sessions, then least recently updated sessions until the
+        store is under db_max_bytes. Returns the number of sessions removed.
+        """
+        now = now or time.time()
+        removed = 0
+        with self._lock, self._transaction() as conn:
+            if self.idle_ttl:
+                idle = conn.execute(
+                    "SELECT app_name, user_id, id FROM sessions WHERE update_time < ?", (now - self.idle_ttl,)
+                ).fetchall()
+                for key in idle:
+                    self._delete_rows(conn, *key)
+                removed += len(idle)
+
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM events").fetchone()[0]
+            if total > self.db_max_bytes:
+                sizes = conn.execute(
+                    "SELECT s.app_name, s.user_id, s.id, COALESCE(SUM(e.size), 0) FROM sessions s "
+                    "LEFT JOIN events e ON e.app_name = s.app_name AND e.user_id = s.user_id "
+                    "AND e.session_id = s.id GROUP BY s.app_name, s.user_id, s.id ORDER BY s.update_time"
+                ).fetchall()
+                for app_name, user_id, session_id, size in sizes:
+                    if total <= self.db_max_bytes:
+                        break
+                    self._delete_rows(conn, app_name, user_id, session_id)
+                    total -= size
+                    removed += 1
+
+        if removed:
+            print(f"🧹 Evicted {removed} sessions")
+        return removed
@@ -0,0 +1,74 @@
+"""
+Pipeline Turn Test - a second request in the same session must not be
+assembled from the first request's stage outputs.
+Replays two turns through the pipeline with recorded model output and stub
+render tools; in the second, ManimCoder's only submission fails preflight.
+"""
+
+import asyncio
+import copy
+import os
+from google.genai import types
+from agent import build_agent, build_runner
+from pipeline import LESSON_KEY
+from replay.model import load_transcript, replay_models
+from replay.stubs import stub_manim_tools
+from response_cache import BYPASS_CACHE_KEY
+from tools.cloud_render import MANIM_CODE_KEY
+
+TRANSCRIPT = os.path.join(os.path.dirname(__file__), "replay", "transcripts", "pythagoras_pipeline.json")
+
+SECOND_TURN = {
+    "Tutor": [[{"text": "A right triangle's legs and hypotenuse satisfy a^2 + b^2 = c^2."}]],
+    "ScriptWriter": [[{"text": "[{\"scene\": 1, \"duration_seconds\": 10}]"}]],
+    "ManimCoder": [
+        [{"function_call": {"name": "render_manim_code", "args": {"manim_code": "class Broken(Scene:\n    pass"}}}],
+        [{"text": "The code did not pass validation."}]
+    ]
+}
+
+
+async def run_turn(runner, session_id: str, prompt: str) -> dict:
+    lesson = None
+    async for event in runner.run_async(
+        user_id="test-user",
+        session_id=session_id,
+        new_message=types.Content(role="user", parts=[types.Part(text=prompt)]),
+        state_delta={BYPASS_CACHE_KEY: True}
+    ):
+        lesson = (event.actions.state_delta or {}).get(LESSON_KEY) or lesson
+    return lesson
+
+
+async def run_two_turns():
+    transcript = copy.deepcopy(load_transcript(TRANSCRIPT))
+    for agent_name, turns in SECOND_TURN.items():
+        transcript["agents"][agent_name] += turns
+
+    model_for, _ = replay_models(transcript)
+    runner = build_runner(build_agent("pipeline", model_for=model_for, manim_tools=stub_manim_tools()))
+    first = await run_turn(runner, "turns", transcript["prompt"])
+    second = await run_turn(runner, "turns", "Now explain it with a proof")
+    session = await runner.session_service.get_session(app_name="Chalkline", user_id="test-user", session_id="turns")
+    return first, second, session.state
+
+
+def test_second_turn_does_not_reuse_stage_outputs():
+    first, second, state = asyncio.run(run_two_turns())
+
+    print(f"1️⃣  First turn: {first['status']}")
+    print(f"2️⃣  Second turn: {second['status']} (failed_at={second.get('failed_at')})")
+
+    assert first["status"] == "success"
+    assert first["code"]["full_code"]
+    # The first turn's code must not be passed off as the second turn's
+    assert second["status"] == "error"
+    assert second["failed_at"] == "manimcoder"
+    assert "A right triangle" in second["partial_results"]["explanation"]
+    # Code that failed preflight is never recorded
+    assert not state.get(MANIM_CODE_KEY)
+
+
+if __name__ == "__main__":
+    test_second_turn_does_not_reuse_stage_outputs()
+    print("✅ Second turn was assembled from its own stage outputs")
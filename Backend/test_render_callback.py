@@ -0,0 +1,86 @@
+"""
+Render callback test - the worker's completion pushes must be signed, and a
+lost push must not leave wait_for_render() blocked until its timeout.
+"""
+
+import time
+from cloud import callback_auth
+from cloud.callback_auth import sign, verify
+
+SECRET = "test-secret"
+BODY = b'{"job_id": "j1", "status": "done"}'
+
+
+def test_callback_signature():
+    headers = sign(BODY, SECRET)
+
+    assert verify(BODY, headers, SECRET)
+    # Altered body, wrong secret, no secret configured, unsigned
+    assert not verify(BODY.replace(b"done", b"failed"), headers, SECRET)
+    assert not verify(BODY, headers, "other-secret")
+    assert not verify(BODY, headers, None)
+    assert not verify(BODY, {}, SECRET)
+    # A captured callback replayed later
+    stale = str(int(time.time()) - callback_auth.MAX_SKEW_SECONDS - 1)
+    replayed = {callback_auth.TIMESTAMP_HEADER: stale,
+                callback_auth.SIGNATURE_HEADER: callback_auth._digest(SECRET, stale, BODY)}
+    assert not verify(BODY, replayed, SECRET)
+    assert sign(BODY, None) == {}
+
+
+def test_wait_falls_back_to_long_poll(monkeypatch):
+    from tools import cloud_render
+    from tools.render_jobs import render_jobs
+
+    polled = []
+
+    def fake_long_poll(renderer_url, job_ids, timeout):
+        polled.append(job_ids)
+        return {job_id: {"job_id": job_id, "status": "done"} for job_id in job_ids}
+
+    class FakeContext:
+        state = {cloud_render.RENDER_JOBS_KEY: {"Intro": "job-a", "Proof": "job-b"}}
+
+    monkeypatch.setenv("BLAXEL_RENDERER_URL", "http://worker")
+    monkeypatch.setattr(cloud_render, "RENDER_CALLBACK_URL", "http://api/api/render/callback")
+    monkeypatch.setattr(cloud_render, "RENDER_CALLBACK_GRACE", 0.2)
+    monkeypatch.setattr(cloud_render, "_long_poll_worker", fake_long_poll)
+
+    # job-a's push arrives; job-b's is lost
+    render_jobs.complete({"job_id": "job-a", "status": "done"})
+    start = time.monotonic()
+    result = cloud_render.wait_for_render(timeout_seconds=30, tool_context=FakeContext())
+    elapsed = time.monotonic() - start
+
+    print(f"⏱️  wait_for_render returned after {elapsed:.2f}s, long-polling {polled}")
+    assert result["status"] == "success"
+    assert sorted(result["completed"]) == ["Intro", "Proof"]
+    assert polled == [["job-b"]]
+    assert elapsed < 5
+
+
+def test_queued_final_render_is_not_final(monkeypatch):
+    from tools import cloud_render
+    from tools.render_jobs import render_jobs
+
+    monkeypatch.setattr(cloud_render, "post", lambda url, payload, **kwargs: {
+        "jobs": [{"job_id": job_id, "status": "queued"} for job_id in payload["job_ids"]]
+    })
+    entry = {"digest": "d1", "status": "done", "quality": "preview", "blob": "cache/p.mp4",
+             "final": {"status": "dispatched", "job_id": "final-a", "blob": "cache/f.mp4"}}
+    digests = {"Intro": "d1"}
+
+    # Queued on the worker: asking for final quality must render again
+    manifest = cloud_render._refresh_finals({"Intro": entry}, "http://worker")
+    assert not cloud_render._reusable(manifest, digests, "Intro", "blob", "final")
+    assert cloud_render._reusable(manifest, digests, "Intro", "blob", "auto")
+
+    render_jobs.complete({"job_id": "final-a", "status": "done"})
+    manifest = cloud_render._refresh_finals(manifest, "http://worker")
+    assert manifest["Intro"]["final"]["status"] == "done"
+    assert cloud_render._reusable(manifest, digests, "Intro", "blob", "final")
+
+
+if __name__ == "__main__":
+    test_callback_signature()
+    print("✅ Only fresh, correctly signed callbacks are accepted")
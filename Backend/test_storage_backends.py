@@ -0,0 +1,152 @@
+"""
+Storage backend test - the worker's render, playlist and stitch steps must
+behave the same on the memory and local backends, including when two jobs
+race to write the same lesson playlist.
+Manim and ffmpeg are replaced by stand-ins that write small fake files, so
+only the storage side of each step is exercised.
+"""
+
+import os
+import subprocess
+import sys
+import uuid
+import pytest
+from cloud import worker
+from cloud.hls import PLAYLIST_NAME
+from cloud.storage_backend import LocalBackend, MemoryBackend, PreconditionError
+
+QUALITY = "-pql"
+LESSON = "lessons/test/index.m3u8"
+
+# Stand-in for `ffmpeg -f concat ... pipe:1`: writes the listed files to stdout in order
+CONCAT = (
+    "import sys\n"
+    "for line in open(sys.argv[1]):\n"
+    "    sys.stdout.buffer.write(open(line.strip()[len(\"file '\"):-1], 'rb').read())\n"
+)
+
+
+@pytest.fixture(params=["memory", "local"])
+def bucket(request, tmp_path, monkeypatch):
+    name = f"test-{uuid.uuid4().hex[:8]}"
+    if request.param == "local":
+        backend = LocalBackend(name, root=str(tmp_path / "storage"))
+    else:
+        backend = MemoryBackend(name)
+    monkeypatch.setattr(worker, "get_bucket", lambda bucket_name: backend)
+    return backend
+
+
+@pytest.fixture
+def fake_tools(monkeypatch):
+    """Replace manim and ffmpeg with stand-ins that write small fake files."""
+
+    def fake_render(bucket, script_blob_name, scene_name, quality, cache_key, workdir, script_text=None):
+        output_path = os.path.join(workdir, f"{scene_name}.mp4")
+        with open(output_path, "wb") as f:
+            f.write(f"<{scene_name}>".encode())
+        bucket.upload_file(f"output/{scene_name}.mp4", output_path)
+        return output_path
+
+    def fake_publish_hls(bucket, video_path, hls_dir, workdir):
+        bucket.upload_bytes(f"{hls_dir}/seg_000.m4s", b"segment")
+        bucket.upload_bytes(f"{hls_dir}/{PLAYLIST_NAME}", "#EXTM3U\n#EXTINF:6.500,\nseg_000.m4s\n#EXT-X-ENDLIST\n")
+
+    real_popen = subprocess.Popen
+
+    def fake_popen(cmd, **kwargs):
+        assert cmd[0] == "ffmpeg"
+        return real_popen([sys.executable, "-c", CONCAT, cmd[cmd.index("-i") + 1]], **kwargs)
+
+    monkeypatch.setattr(worker, "render_and_upload", fake_render)
+    monkeypatch.setattr(worker, "publish_hls", fake_publish_hls)
+    monkeypatch.setattr(worker.subprocess, "Popen", fake_popen)
+    monkeypatch.setattr(worker.shutil, "which", lambda name: f"/usr/bin/{name}")
+
+
+def scene_playlist(scene_name: str) -> str:
+    return f"{worker.hls_dir_name(scene_name, None, QUALITY)}/{PLAYLIST_NAME}"
+
+
+def test_render_scene_extends_lesson_playlist(bucket, fake_tools, tmp_path):
+    assert worker.set_lesson_layout(bucket, LESSON, [scene_playlist("Intro"), scene_playlist("Proof")]) == 0
+
+    # Proof finishes first: the lesson is registered as waiting, but cannot play past Intro yet
+    worker.render_scene(bucket.name, None, "Proof", quality=QUALITY, script_text="", workdir=str(tmp_path))
+    assert bucket.exists("output/Proof.mp4")
+    first = bucket.download_text(LESSON)
+    assert "#EXTINF" not in first
+
+    worker.render_scene(bucket.name, None, "Intro", quality=QUALITY, script_text="", workdir=str(tmp_path))
+    playlist = bucket.download_text(LESSON)
+    print(f"📺 Lesson playlist on {bucket.scheme}:\n{playlist}")
+    assert playlist.count("#EXTINF") == 2
+    assert "#EXT-X-DISCONTINUITY" in playlist
+    assert playlist.rstrip().endswith("#EXT-X-ENDLIST")
+    # A growing playlist keeps the target duration it started with (RFC 8216)
+    target = [line for line in first.splitlines() if line.startswith("#EXT-X-TARGETDURATION")]
+    assert target and target[0] in playlist.splitlines()
+
+
+def test_playlist_write_conflict(bucket, fake_tools, tmp_path, monkeypatch):
+    worker.render_scene(bucket.name, None, "Intro", quality=QUALITY, script_text="", workdir=str(tmp_path))
+    assert worker.set_lesson_layout(bucket, LESSON, [scene_playlist("Intro"), scene_playlist("Proof")]) == 1
+
+    # A stale generation is refused, and so is creating an object that exists
+    generation = bucket.generation(LESSON)
+    with pytest.raises(PreconditionError):
+        bucket.upload_bytes(LESSON, "#EXTM3U\n", if_generation_match=generation + 1)
+    with pytest.raises(PreconditionError):
+        bucket.upload_bytes(LESSON, "#EXTM3U\n", if_generation_match=0)
+    assert bucket.generation(LESSON) == generation
+
+    # Another job rewrites the playlist between Proof's generation read and its write
+    upload_bytes = bucket.upload_bytes
+    conflicts = []
+
+    def racing_upload(object_name, data, **kwargs):
+        if object_name == LESSON and kwargs.get("if_generation_match") is not None and not conflicts:
+            conflicts.append(kwargs["if_generation_match"])
+            upload_bytes(LESSON, "#EXTM3U\n#EXT-X-PLAYLIST-TYPE:EVENT\n")
+        return upload_bytes(object_name, data, **kwargs)
+
+    monkeypatch.setattr(bucket, "upload_bytes", racing_upload)
+    worker.render_scene(bucket.name, None, "Proof", quality=QUALITY, script_text="", workdir=str(tmp_path))
+    playlist = bucket.download_text(LESSON)
+    assert conflicts == [generation]
+    assert playlist.count("#EXTINF") == 2
+    assert playlist.rstrip().endswith("#EXT-X-ENDLIST")
+
+
+def test_render_and_upload(bucket, tmp_path, monkeypatch):
+    def fake_manim(cmd, **kwargs):
+        quality, script_path, scene = cmd[1:4]
+        media_dir = cmd[cmd.index("--media_dir") + 1]
+        folder = os.path.join(media_dir, "videos", "myscript", {"-qh": "1080p60"}[quality])
+        os.makedirs(folder)
+        with open(os.path.join(folder, f"{scene}.mp4"), "w") as f:
+            f.write(open(script_path).read())
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+    monkeypatch.setattr(worker, "WARM_RENDER", False)
+    monkeypatch.setattr(worker.subprocess, "run", fake_manim)
+    monkeypatch.setattr(worker.render_cache, "put", lambda key, path: None)
+
+    path = worker.render_and_upload(bucket, None, "Intro", "-qh", "key-a", str(tmp_path), script_text="<A>")
+    assert path.endswith(os.path.join("1080p60", "Intro.mp4"))
+    assert bucket.download_text("cache/key-a.mp4") == "<A>"
+    assert bucket.download_text("output/Intro.mp4") == "<A>"
+
+
+def test_stitch_videos(bucket, fake_tools, tmp_path):
+    for scene in ("Intro", "Proof"):
+        worker.render_scene(bucket.name, None, scene, quality=QUALITY, script_text="", workdir=str(tmp_path))
+
+    # A missing scene is skipped rather than failing the whole stitch
+    worker.stitch_videos(bucket.name, "Intro,Missing,Proof", workdir=str(tmp_path))
+    assert bucket.download_text("output/final_video.mp4") == "<Intro><Proof>"
+    assert not [name for name in bucket.list("output/") if name.endswith(".part")]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
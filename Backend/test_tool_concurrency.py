@@ -0,0 +1,96 @@
+"""
+Concurrency test - a stuck tool call must not freeze other requests.
+Simulates several in-flight /api/agent requests sharing one event loop
+while one of them is blocked inside a slow (synchronous) tool.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tools import concurrency
+from tools.concurrency import offload
+
+
+def stuck_docs_lookup(class_name: str) -> str:
+    """Stand-in for a docs fetch / GCS upload that hangs."""
+    time.sleep(3)
+    return f"# {class_name}"
+
+
+async def busy_request(ticks: list, stop: asyncio.Event):
+    """Stand-in for another request that keeps streaming model events."""
+    while not stop.is_set():
+        ticks.append(time.monotonic())
+        await asyncio.sleep(0.05)
+
+
+async def run_concurrency_check():
+    stuck_tool = offload(stuck_docs_lookup, timeout=1)
+    ticks = []
+    stop = asyncio.Event()
+
+    others = [asyncio.create_task(busy_request(ticks, stop)) for _ in range(4)]
+
+    start = time.monotonic()
+    result = await stuck_tool("Circle")
+    elapsed = time.monotonic() - start
+
+    stop.set()
+    await asyncio.gather(*others)
+    return result, elapsed, ticks, start
+
+
+def test_stuck_tool_does_not_block_event_loop():
+    result, elapsed, ticks, start = asyncio.run(run_concurrency_check())
+
+    print(f"⏱️  Stuck tool returned after {elapsed:.2f}s: {result}")
+    print(f"📦 Other requests made {len(ticks)} progress ticks meanwhile")
+
+    # The deadline fires instead of waiting out the 3s hang
+    assert elapsed < 2
+    assert result["status"] == "error"
+    assert "timed out" in result["message"]
+
+    # 4 requests ticking every 50ms for ~1s; a blocked loop would give ~4
+    ticks_during_call = [t for t in ticks if start < t < start + elapsed]
+    assert len(ticks_during_call) >= 40
+
+
+def quick_docs_lookup(class_name: str) -> str:
+    time.sleep(0.05)
+    return f"# {class_name}"
+
+
+async def run_pool_isolation_check():
+    stuck_render = offload(stuck_docs_lookup, timeout=0.2, pool="render")
+    docs_lookup = offload(quick_docs_lookup, timeout=1)
+
+    # Every render thread is left busy by a call that has already timed out
+    timed_out = await asyncio.gather(*(stuck_render("Scene") for _ in range(2)))
+
+    start = time.monotonic()
+    lookups = await asyncio.gather(*(docs_lookup(f"Class{i}") for i in range(4)))
+    return timed_out, lookups, time.monotonic() - start
+
+
+def test_timed_out_render_does_not_hold_tool_slots():
+    pools = dict(concurrency.POOLS)
+    concurrency.POOLS["render"] = ThreadPoolExecutor(max_workers=2)
+    concurrency.POOLS["tools"] = ThreadPoolExecutor(max_workers=2)
+    try:
+        timed_out, lookups, elapsed = asyncio.run(run_pool_isolation_check())
+    finally:
+        concurrency.POOLS.update(pools)
+
+    print(f"⏱️  4 doc lookups took {elapsed:.2f}s with every render thread stuck")
+    assert all(result["status"] == "error" for result in timed_out)
+    assert lookups == [f"# Class{i}" for i in range(4)]
+    # Two rounds of 50ms on the 2-thread tool pool, not the 3s render hang
+    assert elapsed < 1
+
+
+if __name__ == "__main__":
+    test_stuck_tool_does_not_block_event_loop()
+    print("✅ Event loop stayed responsive while the tool was stuck")
+    test_timed_out_render_does_not_hold_tool_slots()
+    print("✅ Doc lookups ran while timed-out renders held the render pool")
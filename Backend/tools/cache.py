@@ -0,0 +1,147 @@
+"""
+Bounded LRU + TTL cache with an optional on-disk tier.
+Values must be JSON-serializable so they can survive restarts.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import Any, Optional
+
+
+@dataclass
+class CacheEntry:
+    """A cached value plus the metadata needed to revalidate it."""
+    value: Any
+    expires_at: float
+    validators: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory LRU cache whose entries expire after `ttl` seconds.
+
+    Expired entries are kept (until evicted by size) so callers can
+    revalidate them instead of refetching from scratch.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def get(self, key: str) -> Any:
+        entry = self.get_entry(key)
+        return entry.value if entry and entry.fresh else None
+
+    def set_entry(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None,
+            validators: Optional[dict[str, str]] = None) -> CacheEntry:
+        entry = CacheEntry(
+            value=value,
+            expires_at=time.time() + (self.ttl if ttl is None else ttl),
+            validators=validators or {},
+        )
+        self.set_entry(key, entry)
+        return entry
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    """
+    One JSON file per key under `directory`. Writes are atomic (rename).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        try:
+            with open(self._path(key), "r") as f:
+                data = json.load(f)
+            return CacheEntry(**data)
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def set_entry(self, key: str, entry: CacheEntry):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(asdict(entry), f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError):
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def delete(self, key: str):
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+
+class TieredCache(TTLCache):
+    """
+    TTLCache backed by an optional DiskCache. Memory misses are filled from
+    disk, and every write goes to both tiers.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600, directory: Optional[str] = None):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.disk = DiskCache(directory) if directory else None
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        entry = super().get_entry(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                super().set_entry(key, entry)
+        return entry
+
+    def set_entry(self, key: str, entry: CacheEntry):
+        super().set_entry(key, entry)
+        if self.disk is not None:
+            self.disk.set_entry(key, entry)
+
+    def delete(self, key: str):
+        super().delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
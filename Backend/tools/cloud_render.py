@@ -3,10 +3,22 @@ Manim Cloud Render Tool
 Allows the agent to trigger parallel cloud rendering of Manim code.
 """
 
+import hashlib
 import os
-import re
+import time
+import uuid
 from typing import Optional, Dict, Any
 from dotenv import load_dotenv
+from google.adk.tools.tool_context import ToolContext
+from tools.scene_source import scene_digests
+from tools.render_jobs import FINISHED, render_jobs
+from tools.local_render import iter_render_scenes
+from tools.preflight import preflight
+from cloud.storage_backend import STORAGE_BACKEND, get_bucket
+from cloud.telemetry import STORAGE_LATENCY, timed
+from tools.http_client import HTTPStatusError, post, post_many
+from cloud.warm_render import quality_flag
+from cloud.hls import PLAYLIST_NAME, final_playlist_name
 
 load_dotenv()
 
@@ -15,81 +27,312 @@ GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID")
 GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME")
 GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME")
 
+# Public base URL of the bucket, used to hand out the lesson playlist. Other
+# storage backends need it set explicitly (e.g. a static server over the volume)
+HLS_BASE_URL = os.getenv("HLS_BASE_URL") or (
+    f"https://storage.googleapis.com/{GCS_BUCKET_NAME}" if GCS_BUCKET_NAME and STORAGE_BACKEND == "gcs" else None
+)
 
-def render_manim_code(manim_code: str, prefer_local: bool = False) -> Dict[str, Any]:
+# Public URL of this backend's /api/render/callback. When set (along with
+# RENDER_CALLBACK_SECRET, shared with the worker, which the endpoint requires),
+# the worker pushes job completions to us; otherwise we long-poll the worker.
+RENDER_CALLBACK_URL = os.getenv("RENDER_CALLBACK_URL") if os.getenv("RENDER_CALLBACK_SECRET") else None
+# How long to wait on pushes before long-polling the worker for jobs that have
+# not reported, in case a callback was lost
+RENDER_CALLBACK_GRACE = float(os.getenv("RENDER_CALLBACK_GRACE", "60"))
+
+# Session state key holding {scene_name: job_id} for the last dispatch
+RENDER_JOBS_KEY = "render_jobs"
+
+# Session state key holding the worker batch IDs of the last dispatch
+RENDER_BATCH_KEY = "render_batch"
+
+# Scenes per /render_batch request. A batch is queued on whichever worker
+# instance receives it, so smaller batches spread a lesson across instances
+# (more parallel renders) at the cost of more requests; 0 sends one batch
+RENDER_BATCH_SIZE = int(os.getenv("RENDER_BATCH_SIZE", "4"))
+
+# Session state key holding the last code passed to render_manim_code
+MANIM_CODE_KEY = "manim_code"
+
+# Session state key holding the last rendered version of each scene:
+# {scene_name: {"digest", "status", "job_id" and "blob" (cloud) or "path" (local)}},
+# plus "final": {"status", "job_id", "blob", "hls"} for a background final-quality
+# render, whose status becomes "done" once the worker reports it finished
+RENDER_MANIFEST_KEY = "render_manifest"
+
+# Session state key holding this session's lesson playlist blob
+# (lessons/{id}/index.m3u8); stable across re-renders so players can keep it
+LESSON_PLAYLIST_KEY = "lesson_playlist"
+
+
+def _reusable(manifest: dict, digests: dict[str, str], scene: str, field: str,
+              quality: str = "auto") -> bool:
+    """True if `scene` rendered successfully before with identical source (at final quality, if asked for)."""
+    entry = manifest.get(scene) or {}
+    if quality == "final" and not _final_done(entry):
+        return False
+    return (
+        bool(digests.get(scene))
+        and entry.get("digest") == digests[scene]
+        and entry.get("status") == "done"
+        and bool(entry.get(field))
+    )
+
+
+def _final_done(entry: dict) -> bool:
+    """True if a manifest entry was rendered at final quality, or its background final render has finished."""
+    return entry.get("quality") == "final" or (entry.get("final") or {}).get("status") == "done"
+
+
+def _refresh_finals(manifest: dict, renderer_url: Optional[str]) -> dict:
+    """
+    Record which background final-quality renders have finished, from the
+    callbacks received so far or else one non-blocking poll of the worker.
+    A failed final render is dropped from its entry, so the scene is
+    rendered again the next time final quality is asked for.
+
+    Returns:
+        The updated manifest (a copy; the input is left untouched)
+    """
+    job_ids = {
+        scene: entry["final"]["job_id"] for scene, entry in manifest.items()
+        if (entry.get("final") or {}).get("job_id") and entry["final"].get("status") not in FINISHED
+    }
+    if not job_ids:
+        return manifest
+    records = render_jobs.wait(list(job_ids.values()), 0)
+    unreported = [job_id for job_id, job in records.items() if not job or job["status"] not in FINISHED]
+    if unreported and renderer_url:
+        try:
+            body = post(f"{renderer_url}/jobs/wait", {"job_ids": unreported, "timeout": 0}, retries=0)
+            records.update({job["job_id"]: job for job in body["jobs"]})
+        except Exception as e:
+            print(f"⚠️ Could not check final renders: {e}")
+
+    manifest = dict(manifest)
+    for scene, job_id in job_ids.items():
+        status = (records.get(job_id) or {}).get("status")
+        if status == "done":
+            manifest[scene] = {**manifest[scene], "final": {**manifest[scene]["final"], "status": "done"}}
+        elif status == "failed":
+            manifest[scene] = {k: v for k, v in manifest[scene].items() if k != "final"}
+    return manifest
+
+
+def _final_hls(entry: dict) -> Optional[str]:
+    """A manifest entry's final-quality HLS playlist, when one was rendered or queued."""
+    if entry.get("quality") == "final":
+        return entry.get("hls")
+    return (entry.get("final") or {}).get("hls")
+
+
+def _preferred(entry: dict, field: str) -> Optional[list[str]]:
+    """[final, preview] candidates for a manifest entry's `field`, so the worker uses the final render once it exists."""
+    final = (entry.get("final") or {}).get(field)
+    return [final, entry[field]] if final else entry.get(field)
+
+
+def _dispatch_batch(renderer_url: str, manim_code: str, scenes: list[str], digests: dict[str, str],
+                    playlist: Optional[str], qualities: list[str]) -> dict:
+    """
+    Queue every scene at every quality in concurrent /render_batch requests
+    of up to RENDER_BATCH_SIZE scenes each, sending the script inline.
+    Workers without /render_batch get the script through the bucket and one
+    concurrent /render per scene and quality instead.
+
+    Returns:
+        {"batch_ids", "jobs": [{"scene", "profile", "job_id", ...}], "errors"}
+    """
+    size = RENDER_BATCH_SIZE if RENDER_BATCH_SIZE > 0 else len(scenes)
+    chunks = [scenes[i:i + size] for i in range(0, len(scenes), size)]
+    responses = post_many([
+        (f"{renderer_url}/render_batch", {
+            "bucket": GCS_BUCKET_NAME,
+            "script": manim_code,
+            "scenes": [{"scene": scene, "source_hash": digests.get(scene)} for scene in chunk],
+            "playlist": playlist,
+            "qualities": qualities,
+            "callback_url": RENDER_CALLBACK_URL
+        })
+        for chunk in chunks
+    ])
+    batch_ids, jobs, errors, unbatched = [], [], [], []
+    for chunk, resp in zip(chunks, responses):
+        if isinstance(resp, HTTPStatusError) and resp.status_code in (404, 405):
+            unbatched.extend(chunk)
+        elif isinstance(resp, Exception):
+            errors.append(f"{', '.join(chunk)}: {resp}")
+        else:
+            batch_ids.append(resp.get("batch_id"))
+            jobs.extend(resp.get("jobs", []))
+    if unbatched:
+        fallback = _dispatch_scenes(renderer_url, manim_code, unbatched, digests, playlist, qualities)
+        jobs.extend(fallback["jobs"])
+        errors.extend(fallback["errors"])
+    return {"batch_ids": batch_ids, "jobs": jobs, "errors": errors}
+
+
+def _dispatch_scenes(renderer_url: str, manim_code: str, scenes: list[str], digests: dict[str, str],
+                     playlist: Optional[str], qualities: list[str]) -> dict:
+    """
+    One concurrent /render per scene and quality, for workers without
+    /render_batch. The script is stored under a name derived from its
+    content, so concurrent sessions never overwrite each other's script
+    before the worker downloads it.
+    """
+    script_name = f"scripts/{hashlib.sha256(manim_code.encode()).hexdigest()}.py"
+    bucket = get_bucket(GCS_BUCKET_NAME)
+    if not bucket.exists(script_name):
+        with timed("storage.upload", STORAGE_LATENCY, "storage", op="upload"):
+            bucket.upload_bytes(script_name, manim_code)
+
+    # Previews first, so they are queued ahead of the final renders
+    calls = [(scene, profile) for profile in qualities for scene in scenes]
+    responses = post_many([
+        (f"{renderer_url}/render", {
+            "bucket": GCS_BUCKET_NAME,
+            "script": script_name,
+            "scene": scene,
+            "source_hash": digests.get(scene),
+            "playlist": playlist,
+            "quality": profile,
+            "callback_url": RENDER_CALLBACK_URL
+        })
+        for scene, profile in calls
+    ])
+    jobs, errors = [], []
+    for (scene, profile), resp in zip(calls, responses):
+        if isinstance(resp, Exception):
+            errors.append(f"{scene} ({profile}): {resp}")
+        else:
+            jobs.append({**resp, "scene": scene, "profile": profile})
+    return {"jobs": jobs, "errors": errors}
+
+
+def render_manim_code(manim_code: str, prefer_local: bool = False, quality: str = "auto",
+                      tool_context: Optional[ToolContext] = None) -> Dict[str, Any]:
     """
     Tool function to render Manim code. Automatically falls back to local rendering
     when cloud isn't available.
     
     This function first tries Blaxel parallel rendering for speed.
-    If cloud isn't configured or fails, it falls back to local sequential rendering.
+    If cloud isn't configured or fails, it falls back to local parallel rendering.
+    Scenes whose code (and the helpers they use) is unchanged since this
+    session's last successful render are reused instead of re-rendered.
     
     Args:
         manim_code: Complete Python code containing Manim Scene classes
         prefer_local: If True, skip cloud and render locally immediately
+        quality: "auto" renders a fast preview now and upgrades it to final
+            quality in the background; "preview" or "final" render only that
     
     Returns:
         Dictionary with render status, scene count, and output info
     """
-    import subprocess
-    import tempfile
-    import os
-    
-    # Extract scene names first
-    scene_pattern = r'class\s+(\w+)\s*\(\s*(?:Scene|ThreeDScene|MovingCameraScene)\s*\)'
-    scene_names = re.findall(scene_pattern, manim_code)
-    
-    if not scene_names:
+    # Validate and discover scenes before using any upload or render slot
+    check = preflight(manim_code)
+    if not check["ok"]:
         return {
             "status": "error",
-            "message": "No Scene classes found in the code"
+            "stage": "preflight",
+            "message": "Code failed validation; fix these errors and call render_manim_code again",
+            "errors": check["errors"]
         }
+    scene_names = check["scenes"]
+
+    # Keep the latest valid submission so the pipeline can assemble the lesson from it
+    if tool_context is not None:
+        tool_context.state[MANIM_CODE_KEY] = manim_code
+
+    # Normalized, dependency-aware source hashes: unchanged scenes are reused
+    # from this session's manifest, and the worker can reuse identical renders
+    digests = scene_digests(manim_code, scene_names)
+    manifest = dict(tool_context.state.get(RENDER_MANIFEST_KEY) or {}) if tool_context else {}
     
     # Try cloud rendering first (if configured and not preferring local)
     BLAXEL_RENDERER_URL = os.getenv("BLAXEL_RENDERER_URL")
     
     if not prefer_local and BLAXEL_RENDERER_URL and GCS_BUCKET_NAME:
         try:
-            import requests
-            from google.cloud import storage
-            
-            # 1. Upload to GCS
-            client = storage.Client()
-            bucket = client.bucket(GCS_BUCKET_NAME)
-            script_name = "agent_render.py"
-            blob = bucket.blob(script_name)
-            blob.upload_from_string(manim_code)
-            
-            # 2. Dispatch Blaxel requests
+            if quality == "final":
+                manifest = _refresh_finals(manifest, BLAXEL_RENDERER_URL)
+            reused = [scene for scene in scene_names if _reusable(manifest, digests, scene, "blob", quality)]
+            to_render = [scene for scene in scene_names if scene not in reused]
+
+            playlist = None
+            if tool_context is not None:
+                # A new playlist per dispatch: a published playlist's segments
+                # never change, so a re-render gets its own URL
+                playlist = f"lessons/{uuid.uuid4().hex}/{PLAYLIST_NAME}"
+                tool_context.state[LESSON_PLAYLIST_KEY] = playlist
+
+            # Dispatch the changed scenes in a few concurrent batch requests;
+            # the script travels inline, so nothing is uploaded to the bucket for it
             dispatched = []
             errors = []
-            
-            for scene in scene_names:
+            jobs = {}
+            batch_ids = []
+            new_manifest = {scene: manifest[scene] for scene in reused}
+            profile = "final" if quality == "final" else "preview"
+            # "auto" also queues final-quality renders, behind every preview
+            qualities = [profile, "final"] if quality == "auto" else [profile]
+
+            if to_render:
                 try:
-                    resp = requests.post(f"{BLAXEL_RENDERER_URL}/render", json={
-                        "bucket": GCS_BUCKET_NAME,
-                        "script": script_name,
-                        "scene": scene
-                    }, timeout=10)
-                    
-                    if resp.status_code == 200:
-                        dispatched.append(scene)
-                    else:
-                        errors.append(f"{scene}: {resp.text}")
+                    batch = _dispatch_batch(BLAXEL_RENDERER_URL, manim_code, to_render, digests, playlist, qualities)
+                    batch_ids = batch["batch_ids"]
+                    errors.extend(batch["errors"])
+                    for job in batch["jobs"]:
+                        scene = job["scene"]
+                        if job["profile"] == profile and scene not in jobs:
+                            dispatched.append(scene)
+                            jobs[scene] = job["job_id"]
+                            new_manifest[scene] = {
+                                "digest": digests.get(scene),
+                                "status": "dispatched",
+                                "quality": profile,
+                                "job_id": job["job_id"],
+                                # Content-addressed cache/{key}.mp4 when a hash was sent
+                                "blob": job.get("output_blob") or f"output/{scene}.mp4",
+                                "hls": job.get("hls_playlist")
+                            }
+                        elif scene in new_manifest:
+                            new_manifest[scene]["final"] = {
+                                "status": "dispatched",
+                                "job_id": job["job_id"],
+                                "blob": job.get("output_blob"),
+                                "hls": job.get("hls_playlist")
+                            }
                 except Exception as e:
-                    errors.append(f"{scene}: {str(e)}")
-            
-            if dispatched:
+                    errors.append(str(e))
+
+            if dispatched or (reused and not to_render):
+                playlist_url, final_playlist_url = _publish_playlist(
+                    BLAXEL_RENDERER_URL, playlist, scene_names, new_manifest
+                )
+                if tool_context is not None:
+                    tool_context.state[RENDER_JOBS_KEY] = jobs
+                    tool_context.state[RENDER_BATCH_KEY] = batch_ids
+                    tool_context.state[RENDER_MANIFEST_KEY] = new_manifest
                 return {
                     "status": "success",
                     "mode": "cloud",
-                    "message": f"Dispatched {len(dispatched)} render jobs to Blaxel",
+                    "message": f"Dispatched {len(dispatched)} render jobs to Blaxel, reused {len(reused)} unchanged scenes",
                     "scenes": dispatched,
+                    "reused": reused,
+                    "jobs": jobs,
+                    "batch_ids": batch_ids,
                     "errors": errors,
                     "bucket": GCS_BUCKET_NAME,
-                    "output_path": f"gs://{GCS_BUCKET_NAME}/output/",
+                    "output_path": get_bucket(GCS_BUCKET_NAME).uri("output/"),
+                    "playlist_url": playlist_url,
+                    # Exists once every final-quality render is done; switch to it then
+                    "final_playlist_url": final_playlist_url,
                     "estimated_time": "45-60 seconds for parallel rendering",
-                    "next_step": "Use check_render_status() then stitch_cloud_video()"
+                    "quality": quality,
+                    "next_step": "Share playlist_url to start playback now; use wait_for_render(), "
+                                 "then stitch_cloud_video() only if a downloadable file is needed"
                 }
             else:
                  cloud_error = f"Failed to dispatch to Blaxel: {errors}"
@@ -106,10 +349,62 @@ def render_manim_code(manim_code: str, prefer_local: bool = False) -> Dict[str,
     # Fall back to LOCAL RENDERING
     output_dir = os.path.join(os.path.dirname(__file__), "..", "output")
     output_dir = os.path.abspath(output_dir)
-# ... (rest of local rendering is identical) ...
+    
+    reuse = {
+        scene: manifest[scene]["path"] for scene in scene_names
+        if _reusable(manifest, digests, scene, "path", quality) and os.path.exists(manifest[scene]["path"])
+    }
+    # No background upgrade locally: "auto" renders the preview only
+    profile = "final" if quality == "final" else "preview"
+    result = render_manim_locally(manim_code, output_dir, reuse=reuse, quality=quality_flag(profile))
+    result["mode"] = "local"
+    result["cloud_error"] = cloud_error
+    if tool_context is not None and result.get("results"):
+        tool_context.state[RENDER_MANIFEST_KEY] = {
+            r["scene"]: {
+                "digest": digests.get(r["scene"]), "status": "done", "path": r["path"],
+                "quality": (manifest.get(r["scene"]) or {}).get("quality") if r["status"] == "reused" else profile
+            }
+            for r in result["results"] if r["status"] in ("success", "reused")
+        }
+    return result
+
+
+def _publish_playlist(renderer_url: str, playlist: Optional[str], scene_names: list[str],
+                      manifest: dict) -> tuple[Optional[str], Optional[str]]:
+    """
+    Tell the worker the lesson's scene order so it can serve finished scenes
+    as an HLS playlist while the rest render, and publish the final-quality
+    renders as a second playlist once they are all done.
+
+    Returns:
+        (playlist URL, final playlist URL); the first is None when a scene
+        has no HLS rendition (e.g. rendered by an older worker), the second
+        when some scene has no final render
+    """
+    entries = [manifest.get(scene) or {} for scene in scene_names]
+    scene_playlists = [entry.get("hls") for entry in entries]
+    final_playlists = [_final_hls(entry) for entry in entries]
+    if not all(final_playlists):
+        final_playlists = None
+    if not playlist or not HLS_BASE_URL or not all(scene_playlists):
+        return None, None
+    try:
+        post(f"{renderer_url}/playlist", {
+            "bucket": GCS_BUCKET_NAME,
+            "name": playlist,
+            "scenes": scene_playlists,
+            "finals": final_playlists
+        })
+    except Exception as e:
+        print(f"⚠️ Could not publish lesson playlist: {e}")
+        return None, None
+    final_url = f"{HLS_BASE_URL}/{final_playlist_name(playlist)}" if final_playlists else None
+    return f"{HLS_BASE_URL}/{playlist}", final_url
 
 
-def stitch_cloud_video(scene_names: list[str]) -> Dict[str, Any]:
+def stitch_cloud_video(scene_names: list[str],
+                       tool_context: Optional[ToolContext] = None) -> Dict[str, Any]:
     """
     Dispatch a cloud job to stitch rendered scenes together using ffmpeg.
     
@@ -124,30 +419,144 @@ def stitch_cloud_video(scene_names: list[str]) -> Dict[str, Any]:
         return {"status": "error", "message": "Cloud/Blaxel not configured"}
         
     try:
-        import requests
         scenes_str = ",".join(scene_names)
+
+        # Stitch this session's exact renders (including reused ones) when we know them
+        manifest = (tool_context.state.get(RENDER_MANIFEST_KEY) or {}) if tool_context else {}
+        blobs = [_preferred(manifest.get(scene) or {}, "blob") for scene in scene_names]
         
-        resp = requests.post(f"{BLAXEL_RENDERER_URL}/stitch", json={
-            "bucket": GCS_BUCKET_NAME,
-            "scenes": scenes_str
-        }, timeout=10)
-        
-        if resp.status_code == 200:
-            return {
-                "status": "success",
-                "message": "Stitching job dispatched to Blaxel",
-                "final_url": f"gs://{GCS_BUCKET_NAME}/output/final_video.mp4"
-            }
-        else:
-            return {"status": "error", "message": f"Failed to dispatch stitch job: {resp.text}"}
+        try:
+            body = post(f"{BLAXEL_RENDERER_URL}/stitch", {
+                "bucket": GCS_BUCKET_NAME,
+                "scenes": scenes_str,
+                "blobs": blobs if all(blobs) else None,
+                "callback_url": RENDER_CALLBACK_URL
+            })
+        except HTTPStatusError as e:
+            return {"status": "error", "message": f"Failed to dispatch stitch job: {e.detail}"}
+
+        job_id = body.get("job_id")
+        if tool_context is not None:
+            tool_context.state[RENDER_JOBS_KEY] = {"final_video": job_id}
+        return {
+            "status": "success",
+            "message": "Stitching job dispatched to Blaxel",
+            "job_id": job_id,
+            "final_url": get_bucket(GCS_BUCKET_NAME).uri("output/final_video.mp4"),
+            "next_step": "Use wait_for_render() to wait for the stitched video"
+        }
             
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
+def _long_poll_worker(renderer_url: str, job_ids: list[str], timeout: float) -> dict[str, Optional[dict]]:
+    """
+    Wait on the worker's /jobs/wait endpoint in <=30s long-polls until all
+    jobs have finished or `timeout` elapses.
+    """
+    deadline = time.time() + timeout
+    records: dict[str, Optional[dict]] = {job_id: None for job_id in job_ids}
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return records
+        try:
+            # This loop already retries until the deadline
+            body = post(f"{renderer_url}/jobs/wait", {
+                "job_ids": job_ids,
+                "timeout": min(30, remaining)
+            }, timeout=min(30, remaining) + 10, retries=0)
+        except Exception:
+            time.sleep(min(2, max(remaining, 0)))
+            continue
+
+        for job in body["jobs"]:
+            records[job["job_id"]] = job
+        if body["done"]:
+            return records
+
+
+def wait_for_render(timeout_seconds: int = 300,
+                    tool_context: Optional[ToolContext] = None) -> Dict[str, Any]:
+    """
+    Wait until the jobs from the last render_manim_code or stitch_cloud_video
+    call have finished. Blocks efficiently instead of polling.
+    
+    Args:
+        timeout_seconds: Maximum time to wait before returning
+    
+    Returns:
+        Dictionary with completed, failed and still-pending scenes
+    """
+    jobs = tool_context.state.get(RENDER_JOBS_KEY) if tool_context else None
+    if jobs is None:
+        return {"status": "error", "message": "No render jobs to wait for. Call render_manim_code first."}
+    if not jobs:
+        return {
+            "status": "success", "completed": [], "failed": {}, "pending": [],
+            "message": "Nothing was re-rendered; every scene was reused from the previous render"
+        }
+    jobs = dict(jobs)
+    
+    BLAXEL_RENDERER_URL = os.getenv("BLAXEL_RENDERER_URL")
+    job_ids = list(jobs.values())
+    if RENDER_CALLBACK_URL:
+        deadline = time.time() + timeout_seconds
+        records = render_jobs.wait(job_ids, min(timeout_seconds, RENDER_CALLBACK_GRACE))
+        unreported = [job_id for job_id, job in records.items()
+                      if not job or job["status"] not in FINISHED]
+        remaining = deadline - time.time()
+        if unreported and BLAXEL_RENDERER_URL and remaining > 0:
+            records.update(_long_poll_worker(BLAXEL_RENDERER_URL, unreported, remaining))
+    elif BLAXEL_RENDERER_URL:
+        records = _long_poll_worker(BLAXEL_RENDERER_URL, job_ids, timeout_seconds)
+    else:
+        return {"status": "error", "message": "Cloud/Blaxel not configured"}
+    
+    completed, failed, pending, unknown = [], {}, [], []
+    for scene, job_id in jobs.items():
+        job = records.get(job_id)
+        status = job["status"] if job else "pending"
+        if status == "done":
+            completed.append(scene)
+        elif status == "failed":
+            failed[scene] = job.get("error")
+        elif status == "unknown":
+            unknown.append(scene)
+        else:
+            pending.append(scene)
+
+    # Completed renders become reusable; failed ones must be rendered again
+    manifest = dict(tool_context.state.get(RENDER_MANIFEST_KEY) or {})
+    for scene in completed:
+        if scene in manifest:
+            manifest[scene] = {**manifest[scene], "status": "done"}
+    for scene in failed:
+        manifest.pop(scene, None)
+    # Background final renders are not waited for, only noted once finished
+    tool_context.state[RENDER_MANIFEST_KEY] = _refresh_finals(manifest, BLAXEL_RENDERER_URL)
+    
+    result = {
+        "status": "success" if not (failed or pending or unknown) else "incomplete",
+        "completed": completed,
+        "failed": failed,
+        "pending": pending,
+    }
+    if unknown:
+        # The job lives on another worker instance; fall back to the bucket
+        result["unknown"] = unknown
+        result["next_step"] = "Use check_render_status() to confirm these scenes"
+    elif pending:
+        result["next_step"] = "Call wait_for_render() again"
+    elif failed:
+        result["next_step"] = "Fix the failing scenes and call render_manim_code() again"
+    return result
+
+
 def check_render_status() -> Dict[str, Any]:
     """
-    Check the status of rendered videos in GCS.
+    Check the status of rendered videos in the bucket.
     
     Returns:
         Dictionary with list of completed videos and their URLs
@@ -156,26 +565,22 @@ def check_render_status() -> Dict[str, Any]:
         return {"status": "error", "message": "GCS_BUCKET_NAME not configured"}
     
     try:
-        from google.cloud import storage
-        
-        client = storage.Client()
-        bucket = client.bucket(GCS_BUCKET_NAME)
+        bucket = get_bucket(GCS_BUCKET_NAME)
         
         # List all videos in output/
-        blobs = bucket.list_blobs(prefix="output/")
         videos = []
         final_video_ready = False
         
-        for blob in blobs:
-            if blob.name.endswith(".mp4"):
-                name = blob.name.replace("output/", "")
+        for blob_name, size in bucket.list("output/").items():
+            if blob_name.endswith(".mp4"):
+                name = blob_name.replace("output/", "")
                 if name == "final_video.mp4":
                     final_video_ready = True
                 
                 videos.append({
                     "name": name,
-                    "url": f"gs://{GCS_BUCKET_NAME}/{blob.name}",
-                    "size_mb": round(blob.size / (1024 * 1024), 2) if blob.size else 0
+                    "url": bucket.uri(blob_name),
+                    "size_mb": round(size / (1024 * 1024), 2)
                 })
         
         return {
@@ -194,59 +599,81 @@ def get_final_video_url() -> str:
     Get the URL where the stitched final video will be available.
     
     Returns:
-        GCS URL or local path for the final video
+        Bucket URI or local path for the final video
     """
     if GCS_BUCKET_NAME:
-        return f"gs://{GCS_BUCKET_NAME}/output/final_video.mp4"
+        return get_bucket(GCS_BUCKET_NAME).uri("output/final_video.mp4")
     return "./final_video.mp4"
 
 
 # For local testing without cloud
-def render_manim_locally(manim_code: str, output_dir: str = "./output") -> Dict[str, Any]:
+def render_manim_locally(manim_code: str, output_dir: str = "./output",
+                         reuse: Optional[Dict[str, str]] = None,
+                         quality: str = "-ql") -> Dict[str, Any]:
     """
-    Fallback: Render Manim code locally (sequential, slower).
+    Fallback: Render Manim code locally, one manim process per scene in parallel.
     
     Args:
         manim_code: Complete Python code
-        output_dir: Where to save videos
+        output_dir: Where to keep finished videos, as {scene digest}-{quality}.mp4
+        reuse: {scene_name: video_path} of unchanged scenes to skip
+        quality: Manim quality flag, e.g. -ql or -qh
     
     Returns:
-        Dictionary with render status
+        Dictionary with render status and per-scene results
+        (path, duration, stderr tail) in completion order
     """
-    import subprocess
+    import shutil
     import tempfile
-    import os
     
-    # Extract scenes
-    scene_pattern = r'class\s+(\w+)\s*\(\s*(?:Scene|ThreeDScene|MovingCameraScene)\s*\)'
-    scene_names = re.findall(scene_pattern, manim_code)
+    check = preflight(manim_code)
+    if not check["ok"]:
+        return {"status": "error", "stage": "preflight", "errors": check["errors"]}
+    scene_names = check["scenes"]
+    digests = scene_digests(manim_code, scene_names)
     
-    if not scene_names:
-        return {"status": "error", "message": "No Scene classes found"}
-    
-    # Write code to temp file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
+    # Render into a private directory: manim names its output after the
+    # module and scene, so renders sharing output_dir would overwrite each
+    # other's videos (and slices) whenever two lessons use a scene name
+    script_dir = tempfile.mkdtemp(prefix="chalkline-")
+    script_path = os.path.join(script_dir, "lesson.py")
+    with open(script_path, "w") as f:
         f.write(manim_code)
-        script_path = f.name
     
     os.makedirs(output_dir, exist_ok=True)
-    rendered = []
+
+    def publish(result: Dict[str, Any]) -> Dict[str, Any]:
+        # Keep the video under a name derived from its content, so a path
+        # recorded in one session's manifest never holds another's render
+        if result["status"] != "success":
+            return result
+        scene = result["scene"]
+        digest = digests.get(scene) or hashlib.sha256(f"{scene}\n{manim_code}".encode()).hexdigest()
+        path = os.path.join(output_dir, f"{digest}-{quality.lstrip('-')}.mp4")
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(result["path"], tmp_path)
+        os.replace(tmp_path, path)
+        return {**result, "path": path}
     
+    reuse = reuse or {}
     try:
-        for scene in scene_names:
-            cmd = [
-                "manim", "-pql", script_path, scene,
-                "--media_dir", output_dir
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode == 0:
-                rendered.append(scene)
+        to_render = [scene for scene in scene_names if scene not in reuse]
+        results = [
+            {"scene": scene, "status": "reused", "path": reuse[scene], "duration": 0.0, "stderr_tail": ""}
+            for scene in scene_names if scene in reuse
+        ]
+        if to_render:
+            media_dir = os.path.join(script_dir, "media")
+            results += [publish(r) for r in iter_render_scenes(script_path, to_render, media_dir, quality)]
+        rendered = [r["scene"] for r in results if r["status"] in ("success", "reused")]
         
         return {
-            "status": "success",
-            "message": f"Rendered {len(rendered)}/{len(scene_names)} scenes locally",
-            "scenes": rendered,
+            "status": "success" if rendered else "error",
+            "message": f"Rendered {len(to_render)} scenes locally, reused {len(reuse)}; "
+                       f"{len(rendered)}/{len(scene_names)} ready",
+            "scenes": [scene for scene in scene_names if scene in rendered],
+            "results": results,
             "output_dir": output_dir
         }
     finally:
-        os.unlink(script_path)
+        shutil.rmtree(script_dir, ignore_errors=True)
@@ -0,0 +1,63 @@
+"""
+Off-loading for blocking tool functions.
+Runs synchronous tools (HTTP lookups, GCS uploads, manim subprocesses) on
+bounded thread pools so they never stall the FastAPI event loop. Quick
+lookups and long render/wait calls get separate pools, so sessions waiting
+on renders cannot starve doc lookups.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+TOOL_THREADS = int(os.getenv("TOOL_THREADS", "8"))
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "60"))
+# Threads for render/wait tools, which block for minutes at a time
+RENDER_TOOL_THREADS = int(os.getenv("RENDER_TOOL_THREADS", "16"))
+
+POOLS = {
+    "tools": ThreadPoolExecutor(max_workers=TOOL_THREADS, thread_name_prefix="tool"),
+    "render": ThreadPoolExecutor(max_workers=RENDER_TOOL_THREADS, thread_name_prefix="render-tool"),
+}
+
+
+async def run_blocking(func: Callable, *args, timeout: Optional[float] = None,
+                       pool: str = "tools", **kwargs) -> Any:
+    """
+    Run `func(*args, **kwargs)` on the named pool (see POOLS) and await it.
+
+    Raises:
+        asyncio.TimeoutError: if the call does not finish within `timeout`
+    """
+    loop = asyncio.get_running_loop()
+    # Carry context vars (request ID, trace context) into the pool thread
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await asyncio.wait_for(loop.run_in_executor(POOLS[pool], call), timeout)
+
+
+def offload(func: Callable, timeout: Optional[float] = None, pool: str = "tools") -> Callable:
+    """
+    Wrap a blocking tool function as an async tool with a deadline.
+
+    The wrapper keeps the original name, docstring and signature so the
+    agent sees the same tool schema. On timeout the agent gets an error
+    result; the worker thread is left to finish on its own, since Python
+    threads cannot be cancelled, and keeps its slot in `pool` until then.
+    Long-running tools therefore belong on the "render" pool.
+    """
+    deadline = TOOL_TIMEOUT if timeout is None else timeout
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await run_blocking(func, *args, timeout=deadline, pool=pool, **kwargs)
+        except asyncio.TimeoutError:
+            return {
+                "status": "error",
+                "message": f"{func.__name__} timed out after {deadline:g}s"
+            }
+
+    return wrapper
@@ -1,12 +1,16 @@
 """
 Web-based Manim Documentation Tool
-Fetches documentation from docs.manim.community instead of local source code.
+Serves documentation from an in-process index of the installed manim package,
+falling back to docs.manim.community when manim is not importable.
 """
 
 import httpx
 from typing import Optional
 import re
 
+from tools.manim_index import get_manim_index, format_entry
+from tools.http_client import fetch_parsed, afetch_parsed, HTTPStatusError
+
 # Base URL for Manim Community documentation
 MANIM_DOCS_BASE = "https://docs.manim.community/en/stable"
 
@@ -21,6 +25,12 @@ async def fetch_manim_class_docs(class_name: str) -> str:
     Returns:
         Formatted documentation string from the web
     """
+    index = get_manim_index()
+    if index is not None:
+        entry = index.lookup(class_name)
+        if entry:
+            return format_entry(entry)
+
     # Map common class categories to their module paths
     class_module_map = {
         # Geometry
@@ -96,16 +106,14 @@ async def fetch_manim_class_docs(class_name: str) -> str:
     if doc_path:
         url = f"{MANIM_DOCS_BASE}/{doc_path}.html"
         
+        def parse_doc_page(html: str) -> str:
+            return _parse_manim_doc_page(html, class_name)
+
         try:
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                response = await client.get(url)
-                
-                if response.status_code == 200:
-                    # Parse the HTML and extract relevant content
-                    html = response.text
-                    return _parse_manim_doc_page(html, class_name)
-                else:
-                    return f"Could not fetch documentation for '{class_name}'. HTTP {response.status_code}"
+            # Parsed pages are cached per URL, and each URL maps to one class
+            return await afetch_parsed(url, parse_doc_page)
+        except HTTPStatusError as e:
+            return f"Could not fetch documentation for '{class_name}'. HTTP {e.status_code}"
         except httpx.TimeoutException:
             return f"Timeout while fetching documentation for '{class_name}'"
         except Exception as e:
@@ -176,57 +184,103 @@ async def search_manim_web(query: str) -> str:
     Returns:
         Search results with links and brief descriptions
     """
-    search_url = f"{MANIM_DOCS_BASE}/search.html"
-    
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            # The Manim docs use Sphinx search which requires JS
-            # So we'll use a simpler approach - check the reference index
-            response = await client.get(f"{MANIM_DOCS_BASE}/reference.html")
-            
-            if response.status_code == 200:
-                html = response.text
-                
-                # Find all links containing the query
-                pattern = rf'href="([^"]*{query}[^"]*)"[^>]*>([^<]*{query}[^<]*)<'
-                matches = re.findall(pattern, html, re.IGNORECASE)
-                
-                if matches:
-                    output = f"# Search Results for '{query}'\n\n"
-                    seen = set()
-                    for href, text in matches[:15]:
-                        if text not in seen:
-                            seen.add(text)
-                            full_url = f"{MANIM_DOCS_BASE}/{href}" if not href.startswith('http') else href
-                            output += f"- **{text}**: {full_url}\n"
-                    return output
-                else:
-                    return f"No results found for '{query}' in Manim documentation."
-            else:
-                return f"Could not search documentation. HTTP {response.status_code}"
+        # The Manim docs use Sphinx search which requires JS
+        # So we'll use a simpler approach - check the reference index
+        links = await afetch_parsed(f"{MANIM_DOCS_BASE}/reference.html", _parse_reference_links)
+    except HTTPStatusError as e:
+        return f"Could not search documentation. HTTP {e.status_code}"
     except Exception as e:
         return f"Error searching documentation: {str(e)}"
 
+    # Find all links containing the query
+    query_lower = query.lower()
+    matches = [
+        (href, text) for href, text in links
+        if query_lower in href.lower() and query_lower in text.lower()
+    ]
+
+    if matches:
+        output = f"# Search Results for '{query}'\n\n"
+        seen = set()
+        for href, text in matches[:15]:
+            if text not in seen:
+                seen.add(text)
+                full_url = f"{MANIM_DOCS_BASE}/{href}" if not href.startswith('http') else href
+                output += f"- **{text}**: {full_url}\n"
+        return output
+    else:
+        return f"No results found for '{query}' in Manim documentation."
+
+
+def _parse_reference_links(html: str) -> list[list[str]]:
+    """Extract every (href, text) link pair from the reference index page."""
+    return [list(pair) for pair in re.findall(r'href="([^"]*)"[^>]*>([^<]+)<', html)]
+
 
 # ============================================================
 # SYNCHRONOUS TOOL FUNCTIONS (used by the agent)
 # ============================================================
 # These use pure synchronous requests to avoid async conflicts
-# with LiteLLM/OpenAI clients.
+# with LiteLLM/OpenAI clients. Fetches go through the shared pooled
+# session, and parsed pages are cached (see tools/http_client.py).
 
-import requests
 from bs4 import BeautifulSoup
 
+
+def _parse_class_page(html: str) -> dict:
+    """Extract the description and parameter list from a class page."""
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Get class description
+    desc = ""
+    desc_elem = soup.find('dd', class_='field-body')
+    if desc_elem:
+        desc = desc_elem.get_text(strip=True)[:500]
+    
+    # Get parameters
+    params = []
+    param_section = soup.find('dl', class_='py parameter')
+    if param_section:
+        for dt in param_section.find_all('dt')[:5]:
+            params.append(dt.get_text(strip=True))
+    
+    return {"description": desc, "parameters": params}
+
+
+def _parse_genindex_links(html: str) -> list[list[str]]:
+    """Extract (text, href) pairs for reference entries in genindex.html."""
+    soup = BeautifulSoup(html, 'html.parser')
+    links = []
+    for link in soup.find_all('a'):
+        href = link.get('href', '')
+        if 'reference' in href:
+            links.append([link.get_text(strip=True), href])
+    return links
+
+
 def query_manim_docs(class_name: str) -> str:
     """
-    Tool function - gets Manim documentation from the web.
+    Tool function - gets Manim documentation for a class.
     
     Args:
         class_name: Name of Manim class to look up (e.g., 'Circle', 'FadeIn')
     
     Returns:
-        Formatted documentation string from docs.manim.community
+        Formatted documentation string from the installed manim package,
+        or from docs.manim.community if manim is not installed
     """
+    index = get_manim_index()
+    if index is not None:
+        entry = index.lookup(class_name)
+        if entry:
+            return format_entry(entry)
+        suggestions = index.suggest(class_name)
+        output = f"# {class_name}\n\n'{class_name}' is not exported by the installed manim package.\n"
+        if suggestions:
+            output += f"Did you mean: {', '.join(suggestions)}?\n"
+        return output
+
     # Common class to module mapping for faster lookups
     class_module_map = {
         'Circle': 'reference/manim.mobject.geometry.arc.Circle',
@@ -257,34 +311,21 @@ def query_manim_docs(class_name: str) -> str:
             # Try generic search
             url = f"https://docs.manim.community/en/stable/reference/manim.mobject.mobject.Mobject.html"
         
-        response = requests.get(url, timeout=10, headers={'User-Agent': 'ManimCoder/1.0'})
-        
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Get class description
-            desc = ""
-            desc_elem = soup.find('dd', class_='field-body')
-            if desc_elem:
-                desc = desc_elem.get_text(strip=True)[:500]
-            
-            # Get parameters
-            params = []
-            param_section = soup.find('dl', class_='py parameter')
-            if param_section:
-                for dt in param_section.find_all('dt')[:5]:
-                    params.append(dt.get_text(strip=True))
-            
-            output = f"# {class_name} Documentation (from docs.manim.community)\n\n"
-            output += f"**Description:** {desc if desc else 'See full documentation'}\n\n"
-            if params:
-                output += "**Parameters:**\n"
-                for p in params:
-                    output += f"- {p}\n"
-            output += f"\n**Full documentation:** {url}\n"
-            return output
-        else:
+        try:
+            page = fetch_parsed(url, _parse_class_page)
+        except HTTPStatusError:
             return f"# {class_name}\n\nCheck https://docs.manim.community for documentation."
+        
+        desc = page["description"]
+        params = page["parameters"]
+        output = f"# {class_name} Documentation (from docs.manim.community)\n\n"
+        output += f"**Description:** {desc if desc else 'See full documentation'}\n\n"
+        if params:
+            output += "**Parameters:**\n"
+            for p in params:
+                output += f"- {p}\n"
+        output += f"\n**Full documentation:** {url}\n"
+        return output
             
     except Exception as e:
         return f"# {class_name}\n\nDocumentation lookup failed: {str(e)}\nUse standard Manim syntax."
@@ -300,43 +341,44 @@ def search_manim_docs(keyword: str) -> str:
     Returns:
         List of matching classes with links
     """
+    index = get_manim_index()
+    if index is not None:
+        matches = index.search(keyword)
+        if not matches:
+            return f"No results found for '{keyword}' in Manim documentation."
+        output = f"# Search Results for '{keyword}'\n\n"
+        for entry in matches:
+            summary = entry.summary[:120]
+            output += f"- **{entry.name}**: {entry.url}"
+            output += f" — {summary}\n" if summary else "\n"
+        return output
+
     try:
-        # Use DuckDuckGo-style search URL for Manim docs
-        search_url = f"https://docs.manim.community/en/stable/search.html?q={keyword}"
+        # genindex.html is parsed once and cached; filtering happens in memory
+        try:
+            links = fetch_parsed(f"{MANIM_DOCS_BASE}/genindex.html", _parse_genindex_links)
+        except HTTPStatusError as e:
+            return f"Could not search documentation. HTTP {e.status_code}"
         
-        response = requests.get(
-            f"https://docs.manim.community/en/stable/genindex.html",
-            timeout=10,
-            headers={'User-Agent': 'ManimCoder/1.0'}
-        )
+        # Find matching index entries
+        results = []
+        keyword_lower = keyword.lower()
         
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Find matching index entries
-            results = []
-            keyword_lower = keyword.lower()
-            
-            for link in soup.find_all('a'):
-                text = link.get_text(strip=True)
-                href = link.get('href', '')
-                
-                if keyword_lower in text.lower() and 'reference' in href:
-                    full_url = f"https://docs.manim.community/en/stable/{href}"
-                    if text not in [r[0] for r in results]:  # Avoid duplicates
-                        results.append((text, full_url))
-                        if len(results) >= 10:
-                            break
-            
-            if results:
-                output = f"# Search Results for '{keyword}'\n\n"
-                for name, url in results:
-                    output += f"- **{name}**: {url}\n"
-                return output
-            else:
-                return f"No results found for '{keyword}' in Manim documentation."
+        for text, href in links:
+            if keyword_lower in text.lower():
+                full_url = f"{MANIM_DOCS_BASE}/{href}"
+                if text not in [r[0] for r in results]:  # Avoid duplicates
+                    results.append((text, full_url))
+                    if len(results) >= 10:
+                        break
+        
+        if results:
+            output = f"# Search Results for '{keyword}'\n\n"
+            for name, url in results:
+                output += f"- **{name}**: {url}\n"
+            return output
         else:
-            return f"Could not search documentation. HTTP {response.status_code}"
+            return f"No results found for '{keyword}' in Manim documentation."
             
     except Exception as e:
         return f"Error searching documentation: {str(e)}"
@@ -0,0 +1,254 @@
+"""
+Shared HTTP layer for the doc tools and the render worker client.
+One pooled keep-alive client per process, and a cache of *parsed* responses
+that revalidates with ETag / Last-Modified instead of refetching.
+
+POSTs to the render worker (`post`, `post_many`) run on a background event
+loop, so any tool thread can have several in flight at once over the same
+warm connections. They carry an `Idempotency-Key` header and are retried
+with jittered exponential backoff on transport errors, 429 and 5xx; the
+worker answers a repeated key with its first response instead of queuing a
+second render.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable, Coroutine, Optional, Union
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from tools.cache import TieredCache, CacheEntry
+from cloud.telemetry import outgoing_headers
+
+USER_AGENT = "ManimCoder/1.0"
+HTTP_TIMEOUT = float(os.getenv("DOC_HTTP_TIMEOUT", "10"))
+HTTP_POOL_SIZE = int(os.getenv("DOC_HTTP_POOL_SIZE", "10"))
+
+# Parsed-response cache; DOC_CACHE_DIR enables the on-disk tier
+DOC_CACHE_TTL = float(os.getenv("DOC_CACHE_TTL", "86400"))
+DOC_CACHE_SIZE = int(os.getenv("DOC_CACHE_SIZE", "256"))
+DOC_CACHE_DIR = os.getenv("DOC_CACHE_DIR")
+
+doc_cache = TieredCache(maxsize=DOC_CACHE_SIZE, ttl=DOC_CACHE_TTL, directory=DOC_CACHE_DIR)
+
+# Render worker requests in flight at once, their timeout and retries
+RENDER_HTTP_CONCURRENCY = int(os.getenv("RENDER_HTTP_CONCURRENCY", "8"))
+RENDER_HTTP_TIMEOUT = float(os.getenv("RENDER_HTTP_TIMEOUT", "30"))
+RENDER_HTTP_RETRIES = int(os.getenv("RENDER_HTTP_RETRIES", "4"))
+# Base and cap, in seconds, of the backoff between retries
+RENDER_HTTP_BACKOFF = float(os.getenv("RENDER_HTTP_BACKOFF", "0.5"))
+RENDER_HTTP_BACKOFF_MAX = float(os.getenv("RENDER_HTTP_BACKOFF_MAX", "8"))
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HTTPStatusError(Exception):
+    """Raised when a fetch returns anything other than 200/304, or a POST anything other than 200."""
+
+    def __init__(self, url: str, status_code: int, detail: str = ""):
+        super().__init__(f"HTTP {status_code} for {url}" + (f": {detail}" if detail else ""))
+        self.url = url
+        self.status_code = status_code
+        self.detail = detail
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_async_clients: dict[int, httpx.AsyncClient] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_render_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide pooled `requests` session."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["User-Agent"] = USER_AGENT
+                _session = session
+    return _session
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Return the pooled `httpx` client for the running event loop.
+    httpx clients cannot be shared across loops, so one is kept per loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(id(loop))
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            headers={"User-Agent": USER_AGENT},
+            # Sized for the render worker POSTs too, which share the background loop's client
+            limits=httpx.Limits(
+                max_connections=max(HTTP_POOL_SIZE, RENDER_HTTP_CONCURRENCY),
+                max_keepalive_connections=max(HTTP_POOL_SIZE, RENDER_HTTP_CONCURRENCY),
+            ),
+        )
+        _async_clients[id(loop)] = client
+    return client
+
+
+def _conditional_headers(entry: Optional[CacheEntry]) -> dict[str, str]:
+    headers = {}
+    if entry is not None:
+        if "etag" in entry.validators:
+            headers["If-None-Match"] = entry.validators["etag"]
+        if "last_modified" in entry.validators:
+            headers["If-Modified-Since"] = entry.validators["last_modified"]
+    return headers
+
+
+def _validators(response_headers) -> dict[str, str]:
+    validators = {}
+    if response_headers.get("ETag"):
+        validators["etag"] = response_headers["ETag"]
+    if response_headers.get("Last-Modified"):
+        validators["last_modified"] = response_headers["Last-Modified"]
+    return validators
+
+
+def _cache_key(url: str, parse: Callable[[str], Any]) -> str:
+    return f"{url}|{getattr(parse, '__name__', 'parse')}"
+
+
+def _store(key: str, entry: Optional[CacheEntry], status_code: int, text: str,
+           headers, parse: Callable[[str], Any], url: str) -> Any:
+    if status_code == 304 and entry is not None:
+        # Not modified: extend the existing parsed value
+        doc_cache.set(key, entry.value, validators=entry.validators)
+        return entry.value
+    if status_code != 200:
+        raise HTTPStatusError(url, status_code)
+    value = parse(text)
+    doc_cache.set(key, value, validators=_validators(headers))
+    return value
+
+
+def fetch_parsed(url: str, parse: Callable[[str], Any]) -> Any:
+    """
+    GET `url` and return `parse(body)`, served from cache while fresh and
+    revalidated with a conditional request once stale.
+
+    Raises:
+        HTTPStatusError: for non-200/304 responses
+        requests.RequestException: for transport errors
+    """
+    key = _cache_key(url, parse)
+    entry = doc_cache.get_entry(key)
+    if entry is not None and entry.fresh:
+        return entry.value
+
+    response = get_session().get(url, timeout=HTTP_TIMEOUT, headers=_conditional_headers(entry))
+    return _store(key, entry, response.status_code, response.text, response.headers, parse, url)
+
+
+async def afetch_parsed(url: str, parse: Callable[[str], Any]) -> Any:
+    """
+    Async counterpart of `fetch_parsed` using the pooled httpx client.
+
+    Raises:
+        HTTPStatusError: for non-200/304 responses
+        httpx.HTTPError: for transport errors
+    """
+    key = _cache_key(url, parse)
+    entry = doc_cache.get_entry(key)
+    if entry is not None and entry.fresh:
+        return entry.value
+
+    response = await get_async_client().get(url, headers=_conditional_headers(entry))
+    return _store(key, entry, response.status_code, response.text, response.headers, parse, url)
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Return the event loop that runs `post`/`post_many`, starting its thread on first use."""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="http-client", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(RENDER_HTTP_BACKOFF_MAX, RENDER_HTTP_BACKOFF * 2 ** attempt))
+
+
+async def apost(url: str, payload: dict, headers: Optional[dict] = None,
+                timeout: Optional[float] = None, retries: int = RENDER_HTTP_RETRIES) -> dict:
+    """
+    POST `payload` as JSON to the render worker and return the decoded
+    response, retrying transient failures under one idempotency key. Must
+    run on the background loop; use `post`/`post_many` from synchronous code.
+
+    Raises:
+        HTTPStatusError: for non-200 responses that are not retried, or
+            the last one once retries run out
+        httpx.TransportError: when the last attempt fails to connect or times out
+    """
+    global _render_semaphore
+    # Only ever awaited on the background loop, so no lock is needed
+    if _render_semaphore is None:
+        _render_semaphore = asyncio.Semaphore(RENDER_HTTP_CONCURRENCY)
+    client = get_async_client()
+    headers = {**(headers or {})}
+    headers.setdefault(IDEMPOTENCY_HEADER, uuid.uuid4().hex)
+    for attempt in range(retries + 1):
+        try:
+            # Bound requests in flight, but not the backoff sleeps below
+            async with _render_semaphore:
+                resp = await client.post(url, json=payload, headers=headers,
+                                         timeout=timeout or RENDER_HTTP_TIMEOUT)
+            if resp.status_code == 200:
+                return resp.json()
+            if resp.status_code not in RETRY_STATUSES or attempt == retries:
+                raise HTTPStatusError(url, resp.status_code, resp.text)
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+        await asyncio.sleep(backoff_delay(attempt))
+
+
+def _run(coro: Coroutine) -> Any:
+    future: Future = asyncio.run_coroutine_threadsafe(coro, _background_loop())
+    return future.result()
+
+
+def post(url: str, payload: dict, timeout: Optional[float] = None,
+         retries: int = RENDER_HTTP_RETRIES) -> dict:
+    """Blocking `apost` for tool functions; forwards this thread's request ID and trace."""
+    return _run(apost(url, payload, outgoing_headers(), timeout, retries))
+
+
+def post_many(calls: list[tuple[str, dict]], timeout: Optional[float] = None) -> list[Union[dict, Exception]]:
+    """
+    Send several (url, payload) POSTs concurrently, at most
+    `RENDER_HTTP_CONCURRENCY` at a time. Returns each response, or the
+    exception that ended its retries, in the order of `calls`.
+    """
+    headers = outgoing_headers()
+
+    async def gather():
+        return await asyncio.gather(
+            *(apost(url, payload, headers, timeout) for url, payload in calls),
+            return_exceptions=True
+        )
+
+    return _run(gather())
@@ -0,0 +1,198 @@
+"""
+Parallel Local Renderer
+Renders scenes concurrently when cloud rendering is unavailable. Scenes run
+on a pool of warm manim processes (or one `manim` CLI process each with
+WARM_RENDER=0); the pool size follows available cores and memory, and every
+scene has its own timeout. Partial movie files are kept
+in a shared, size-capped cache so re-renders only encode changed animations.
+"""
+
+import contextvars
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, Optional
+
+from cloud.render_cache import PartialMovieCache, write_manim_config
+from cloud.slicing import render_sliced
+from cloud.warm_render import QUALITY_FOLDERS, WARM_RENDER, WarmRenderer
+from cloud.telemetry import ERRORS, SUBPROCESS_LATENCY, tracer
+
+LOCAL_RENDER_TIMEOUT = float(os.getenv("LOCAL_RENDER_TIMEOUT", "600"))
+# Rough peak RSS of one low-quality manim render, used to cap parallelism
+LOCAL_RENDER_MEMORY_MB = int(os.getenv("LOCAL_RENDER_MEMORY_MB", "1024"))
+LOCAL_RENDER_WORKERS = os.getenv("LOCAL_RENDER_WORKERS")
+LOCAL_PARTIAL_CACHE_DIR = os.getenv("LOCAL_PARTIAL_CACHE_DIR", "./output/partial_movies")
+LOCAL_PARTIAL_CACHE_MAX_MB = int(os.getenv("LOCAL_PARTIAL_CACHE_MAX_MB", "2048"))
+
+STDERR_TAIL_LINES = 20
+
+_partial_cache: Optional[PartialMovieCache] = None
+_warm_renderer: Optional[WarmRenderer] = None
+
+
+def partial_cache() -> PartialMovieCache:
+    global _partial_cache
+    if _partial_cache is None:
+        _partial_cache = PartialMovieCache(LOCAL_PARTIAL_CACHE_DIR, LOCAL_PARTIAL_CACHE_MAX_MB * 1024 * 1024)
+    return _partial_cache
+
+
+def warm_renderer() -> WarmRenderer:
+    global _warm_renderer
+    if _warm_renderer is None:
+        _warm_renderer = WarmRenderer(workers=default_workers())
+    return _warm_renderer
+
+
+def _available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _available_memory_bytes() -> Optional[int]:
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def default_workers() -> int:
+    """Number of concurrent renders: min(cores, available memory / per-render budget)."""
+    if LOCAL_RENDER_WORKERS:
+        return max(1, int(LOCAL_RENDER_WORKERS))
+    workers = _available_cores()
+    memory = _available_memory_bytes()
+    if memory is not None:
+        workers = min(workers, memory // (LOCAL_RENDER_MEMORY_MB * 1024 * 1024))
+    return max(1, workers)
+
+
+def _find_output(media_dir: str, script_path: str, scene: str, quality: str) -> Optional[str]:
+    module = os.path.splitext(os.path.basename(script_path))[0]
+    expected = os.path.join(media_dir, "videos", module, QUALITY_FOLDERS.get(quality[-1], "480p15"), f"{scene}.mp4")
+    if os.path.exists(expected):
+        return expected
+    for root, dirs, files in os.walk(os.path.join(media_dir, "videos", module)):
+        if f"{scene}.mp4" in files:
+            return os.path.join(root, f"{scene}.mp4")
+    return None
+
+
+def _tail(text: str) -> str:
+    return "\n".join((text or "").strip().splitlines()[-STDERR_TAIL_LINES:])
+
+
+def render_scene(script_path: str, scene: str, media_dir: str,
+                 quality: str = "-ql", timeout: Optional[float] = None,
+                 dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Render one scene in a warm manim process, or with the manim CLI when
+    WARM_RENDER=0 (no preview player in either case).
+    With `dry_run`, manim executes the scene without writing any video.
+
+    Returns:
+        Dictionary with scene, status, path, duration and stderr tail
+    """
+    with tracer.start_as_current_span(
+        "manim.render", attributes={"scene": scene, "quality": quality, "dry_run": dry_run}
+    ) as span:
+        if dry_run:
+            result = _render(script_path, scene, media_dir, quality, timeout, dry_run)
+        else:
+            with partial_cache().use(scene) as partial_dir:
+                result = _render(script_path, scene, media_dir, quality, timeout, dry_run, partial_dir)
+        span.set_attribute("status", result["status"])
+    SUBPROCESS_LATENCY.labels(command="manim", status=result["status"]).observe(result["duration"])
+    if result["status"] != "success":
+        ERRORS.labels(component="render", kind=result["status"]).inc()
+    return result
+
+
+def _render(script_path: str, scene: str, media_dir: str, quality: str,
+            timeout: Optional[float], dry_run: bool,
+            partial_dir: Optional[str] = None) -> Dict[str, Any]:
+    if not WARM_RENDER:
+        config_path = None
+        if partial_dir:
+            config_path = write_manim_config(f"{os.path.splitext(script_path)[0]}.{scene}.cfg", partial_dir)
+        return _run_manim(script_path, scene, media_dir, quality, timeout, dry_run, config_path)
+
+    if dry_run:
+        result = warm_renderer().render(
+            script_path, scene, media_dir, quality, timeout=timeout or LOCAL_RENDER_TIMEOUT, dry_run=True
+        )
+    else:
+        # Long scenes are split into time slices rendered side by side
+        result = render_sliced(
+            warm_renderer(), script_path, scene, media_dir, quality, partial_dir,
+            timeout=timeout or LOCAL_RENDER_TIMEOUT
+        )
+    if result["status"] == "success" and not dry_run and not (result["path"] and os.path.exists(result["path"])):
+        result = {**result, "status": "error", "stderr_tail": "Render finished but no video was written"}
+    return {"scene": scene, **result}
+
+
+def _run_manim(script_path: str, scene: str, media_dir: str, quality: str,
+               timeout: Optional[float], dry_run: bool,
+               config_path: Optional[str] = None) -> Dict[str, Any]:
+    start = time.monotonic()
+    cmd = ["manim", quality, script_path, scene, "--media_dir", media_dir]
+    if config_path:
+        cmd += ["--config_file", config_path]
+    if dry_run:
+        cmd.append("--dry_run")
+    try:
+        result = subprocess.run(
+            cmd, capture_output=True, text=True,
+            timeout=timeout or LOCAL_RENDER_TIMEOUT
+        )
+    except subprocess.TimeoutExpired as e:
+        stderr = e.stderr.decode(errors="replace") if isinstance(e.stderr, bytes) else e.stderr
+        return {
+            "scene": scene,
+            "status": "timeout",
+            "path": None,
+            "duration": round(time.monotonic() - start, 2),
+            "stderr_tail": _tail(stderr)
+        }
+
+    path = None
+    if result.returncode == 0 and not dry_run:
+        path = _find_output(media_dir, script_path, scene, quality)
+    ok = result.returncode == 0 and (dry_run or path is not None)
+    return {
+        "scene": scene,
+        "status": "success" if ok else "error",
+        "path": path,
+        "duration": round(time.monotonic() - start, 2),
+        "stderr_tail": "" if ok else _tail(result.stderr)
+    }
+
+
+def iter_render_scenes(script_path: str, scene_names: list[str], media_dir: str,
+                       quality: str = "-ql", workers: Optional[int] = None,
+                       timeout: Optional[float] = None,
+                       dry_run: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Render scenes concurrently, yielding each scene's result as it completes.
+    """
+    workers = min(workers or default_workers(), len(scene_names)) or 1
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="manim") as pool:
+        futures = [
+            # Each render gets a copy of the caller's context so its span nests under the request
+            pool.submit(contextvars.copy_context().run,
+                        render_scene, script_path, scene, media_dir, quality, timeout, dry_run)
+            for scene in scene_names
+        ]
+        for future in as_completed(futures):
+            yield future.result()
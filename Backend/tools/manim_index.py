@@ -0,0 +1,244 @@
+"""
+Offline Manim Documentation Index
+Builds an in-process index from the installed `manim` package so doc lookups
+are served from memory instead of docs.manim.community.
+"""
+
+import difflib
+import inspect
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+MANIM_DOCS_BASE = "https://docs.manim.community/en/stable"
+
+# Words that carry no search signal in docstring summaries
+_STOPWORDS = {
+    "the", "and", "for", "with", "this", "that", "from", "are", "into", "its",
+    "can", "which", "will", "all", "not", "use", "used", "using", "given",
+    "when", "each", "than", "then", "them", "has", "have", "but", "also",
+}
+
+# Search weights per field a token was found in
+_NAME_WEIGHT = 3
+_MODULE_WEIGHT = 2
+_SUMMARY_WEIGHT = 1
+_SUBSTRING_WEIGHT = 5
+
+
+@dataclass
+class DocEntry:
+    """A single documented class or function from the manim package."""
+    name: str
+    kind: str
+    module: str
+    signature: str
+    summary: str
+    parameters: list[tuple[str, str]] = field(default_factory=list)
+    bases: list[str] = field(default_factory=list)
+    example: str = ""
+
+    @property
+    def url(self) -> str:
+        if self.kind == "class":
+            return f"{MANIM_DOCS_BASE}/reference/{self.module}.{self.name}.html"
+        return f"{MANIM_DOCS_BASE}/reference/{self.module}.html#{self.module}.{self.name}"
+
+
+def _split_camel(name: str) -> list[str]:
+    """Split 'ReplacementTransform' / 'MathTex' / 'ThreeDAxes' into words."""
+    return re.findall(r'[A-Z]+(?=[A-Z][a-z]|\d|\b)|[A-Z]?[a-z]+|[A-Z]+|\d+', name)
+
+
+def _tokenize(text: str) -> list[str]:
+    words = re.findall(r'[A-Za-z][A-Za-z0-9]+', text)
+    tokens = []
+    for word in words:
+        tokens.append(word.lower())
+        tokens.extend(part.lower() for part in _split_camel(word))
+    return [t for t in tokens if len(t) > 1 and t not in _STOPWORDS]
+
+
+def _section(doc: str, title: str) -> list[str]:
+    """Return the lines of a numpydoc section (e.g. 'Parameters')."""
+    lines = doc.splitlines()
+    for i in range(len(lines) - 1):
+        if lines[i].strip() == title and set(lines[i + 1].strip()) == {"-"}:
+            body = []
+            for j in range(i + 2, len(lines)):
+                # Next section header ends this one
+                if j + 1 < len(lines) and lines[j].strip() and set(lines[j + 1].strip()) == {"-"}:
+                    break
+                body.append(lines[j])
+            return body
+    return []
+
+
+def _parse_parameters(doc: str) -> list[tuple[str, str]]:
+    params = []
+    for line in _section(doc, "Parameters"):
+        if line and not line[0].isspace():
+            name = line.split(":")[0].strip()
+            params.append((name, ""))
+        elif params and line.strip():
+            name, desc = params[-1]
+            params[-1] = (name, f"{desc} {line.strip()}".strip())
+    return params
+
+
+def _parse_example(doc: str) -> str:
+    """Extract the first code block of the 'Examples' section."""
+    lines = _section(doc, "Examples")
+    code = []
+    in_block = False
+    for line in lines:
+        stripped = line.strip()
+        if not in_block:
+            if stripped.startswith(".. manim::") or stripped.startswith(".. code-block::"):
+                in_block = True
+            continue
+        if stripped.startswith(":") and not code:
+            continue  # directive options
+        if stripped and not line[0].isspace():
+            break
+        code.append(line)
+    return inspect.cleandoc("\n".join(code)) if code else ""
+
+
+def _summary(doc: str) -> str:
+    paragraph = doc.strip().split("\n\n")[0] if doc else ""
+    return re.sub(r'\s+', ' ', paragraph).strip()
+
+
+def _signature(name: str, obj) -> str:
+    try:
+        sig = str(inspect.signature(obj))
+    except (TypeError, ValueError):
+        sig = "(...)"
+    return f"{name}{sig}"
+
+
+class ManimDocIndex:
+    """
+    Inverted index over the public classes and functions exported by `manim`.
+    """
+
+    def __init__(self, entries: list[DocEntry]):
+        self.entries = {entry.name: entry for entry in entries}
+        self._lower = {name.lower(): name for name in self.entries}
+        self._postings: dict[str, dict[str, int]] = {}
+
+        for entry in entries:
+            self._add(entry.name, _tokenize(entry.name), _NAME_WEIGHT)
+            self._add(entry.name, _tokenize(entry.module.replace(".", " ")), _MODULE_WEIGHT)
+            self._add(entry.name, _tokenize(entry.summary), _SUMMARY_WEIGHT)
+
+    def _add(self, name: str, tokens: list[str], weight: int):
+        for token in set(tokens):
+            postings = self._postings.setdefault(token, {})
+            postings[name] = max(postings.get(name, 0), weight)
+
+    @classmethod
+    def from_module(cls, module) -> "ManimDocIndex":
+        entries = []
+        for name in dir(module):
+            if name.startswith("_"):
+                continue
+            obj = getattr(module, name)
+            if inspect.isclass(obj):
+                kind = "class"
+            elif inspect.isfunction(obj):
+                kind = "function"
+            else:
+                continue
+            obj_module = getattr(obj, "__module__", "") or ""
+            if not obj_module.startswith("manim"):
+                continue
+
+            doc = inspect.getdoc(obj) or ""
+            entries.append(DocEntry(
+                name=name,
+                kind=kind,
+                module=obj_module,
+                signature=_signature(name, obj),
+                summary=_summary(doc),
+                parameters=_parse_parameters(doc),
+                bases=[b.__name__ for b in getattr(obj, "__bases__", ()) if b is not object],
+                example=_parse_example(doc),
+            ))
+        return cls(entries)
+
+    def lookup(self, name: str) -> Optional[DocEntry]:
+        name = name.strip()
+        if name in self.entries:
+            return self.entries[name]
+        canonical = self._lower.get(name.lower())
+        return self.entries[canonical] if canonical else None
+
+    def suggest(self, name: str, limit: int = 5) -> list[str]:
+        return difflib.get_close_matches(name, list(self.entries), n=limit, cutoff=0.6)
+
+    def search(self, query: str, limit: int = 10) -> list[DocEntry]:
+        """
+        Rank entries by weighted token overlap with the query, boosting
+        names that contain the query as a substring.
+        """
+        scores: dict[str, int] = {}
+        for token in set(_tokenize(query)):
+            for name, weight in self._postings.get(token, {}).items():
+                scores[name] = scores.get(name, 0) + weight
+
+        needle = query.strip().lower()
+        if needle:
+            for lower, name in self._lower.items():
+                if needle in lower:
+                    scores[name] = scores.get(name, 0) + _SUBSTRING_WEIGHT
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], len(item[0]), item[0]))
+        return [self.entries[name] for name, _ in ranked[:limit]]
+
+
+def format_entry(entry: DocEntry) -> str:
+    """Render an entry in the same shape as the web-based doc tools."""
+    output = f"# {entry.name} Documentation (from installed manim)\n\n"
+    output += f"**Module:** `{entry.module}`\n\n"
+    if entry.bases:
+        output += f"**Bases:** {', '.join(entry.bases)}\n\n"
+    output += f"**Description:** {entry.summary or 'See full documentation'}\n\n"
+    output += f"**Signature:** `{entry.signature}`\n\n"
+    if entry.parameters:
+        output += "**Parameters:**\n"
+        for name, desc in entry.parameters[:10]:
+            output += f"- `{name}`: {desc}\n" if desc else f"- `{name}`\n"
+        output += "\n"
+    if entry.example:
+        output += f"**Example:**\n```python\n{entry.example}\n```\n"
+    output += f"\n**Full documentation:** {entry.url}\n"
+    return output
+
+
+_index: Optional[ManimDocIndex] = None
+_index_error: Optional[str] = None
+_index_lock = threading.Lock()
+
+
+def get_manim_index() -> Optional[ManimDocIndex]:
+    """
+    Return the process-wide index, building it on first use.
+
+    Returns None when manim cannot be imported, so callers can fall back
+    to the web documentation.
+    """
+    global _index, _index_error
+    if _index is not None or _index_error is not None:
+        return _index
+
+    with _index_lock:
+        if _index is None and _index_error is None:
+            try:
+                import manim
+                _index = ManimDocIndex.from_module(manim)
+            except Exception as e:
+                _index_error = str(e)
+    return _index
@@ -0,0 +1,223 @@
+"""
+Pre-render Validation for Generated Manim Code
+Static checks that run in milliseconds before any upload or render slot is
+used: parsing, Scene subclass discovery, forbidden imports/calls and
+unknown names. An optional `manim --dry_run` pass catches runtime errors.
+"""
+
+import ast
+import builtins
+import importlib
+import os
+import tempfile
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+# Base classes that make a class renderable, beyond any name ending in "Scene"
+SCENE_BASES = {"Scene", "ThreeDScene", "MovingCameraScene", "ZoomedScene",
+               "VectorScene", "LinearTransformationScene", "SpecialThreeDScene"}
+
+# Generated scenes never need process, file or network access
+FORBIDDEN_MODULES = {"os", "sys", "subprocess", "shutil", "socket", "requests", "urllib",
+                     "http", "httpx", "importlib", "ctypes", "multiprocessing", "pickle",
+                     "builtins", "signal", "threading", "asyncio"}
+FORBIDDEN_CALLS = {"eval", "exec", "compile", "open", "__import__", "input", "breakpoint"}
+
+MAX_ISSUES = 20
+
+
+def _issue(kind: str, message: str, node: ast.AST = None) -> Dict[str, Any]:
+    return {
+        "type": kind,
+        "message": message,
+        "line": getattr(node, "lineno", None),
+    }
+
+
+def _base_name(base: ast.expr) -> str:
+    if isinstance(base, ast.Name):
+        return base.id
+    if isinstance(base, ast.Attribute):
+        return base.attr
+    return ""
+
+
+def _defines_construct(cls: ast.ClassDef) -> bool:
+    return any(
+        isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)) and stmt.name == "construct"
+        for stmt in cls.body
+    )
+
+
+def discover_scenes(tree: ast.Module) -> list[str]:
+    """
+    Top-level classes that subclass a Scene (directly, via another in-file
+    class, via `manim.Scene`, or via any base named `*Scene`) and have a
+    `construct` method of their own or from an in-file ancestor.
+    """
+    classes = {stmt.name: stmt for stmt in tree.body if isinstance(stmt, ast.ClassDef)}
+    is_scene: dict[str, bool] = {}
+    has_construct: dict[str, bool] = {}
+
+    def resolve(name: str, seen: frozenset) -> tuple[bool, bool]:
+        if name in is_scene:
+            return is_scene[name], has_construct[name]
+        cls = classes[name]
+        scene, construct = False, _defines_construct(cls)
+        for base in cls.bases:
+            base_name = _base_name(base)
+            if base_name in classes and base_name not in seen:
+                base_scene, base_construct = resolve(base_name, seen | {name})
+                scene = scene or base_scene
+                construct = construct or base_construct
+            elif base_name in SCENE_BASES or base_name.endswith("Scene"):
+                scene = True
+        is_scene[name], has_construct[name] = scene, construct
+        return scene, construct
+
+    return [name for name in classes if all(resolve(name, frozenset()))]
+
+
+@lru_cache(maxsize=None)
+def _star_exports(module_name: str):
+    """Names a `from module import *` brings in, or None if unknown."""
+    try:
+        module = importlib.import_module(module_name)
+    except Exception:
+        return None
+    names = getattr(module, "__all__", None)
+    if names is None:
+        names = [n for n in dir(module) if not n.startswith("_")]
+    return frozenset(names)
+
+
+def _bound_names(tree: ast.Module) -> set:
+    """Every name bound anywhere in the module (deliberately scope-insensitive)."""
+    bound = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            bound.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name != "*":
+                    bound.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            bound.update(node.names)
+        elif isinstance(node, ast.MatchAs) and node.name:
+            bound.add(node.name)
+    return bound
+
+
+def _check_imports(tree: ast.Module, errors: list, warnings: list) -> Optional[set]:
+    """Flag forbidden imports and return the names star imports provide."""
+    star_names = set()
+    for node in ast.walk(tree):
+        modules = []
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules = [node.module]
+            if any(alias.name == "*" for alias in node.names):
+                exports = _star_exports(node.module)
+                if exports is None:
+                    warnings.append(_issue(
+                        "unresolved_import",
+                        f"Cannot resolve 'from {node.module} import *'; skipping unknown-name check",
+                        node
+                    ))
+                    star_names = None
+                elif star_names is not None:
+                    star_names |= exports
+        for module in modules:
+            if module.split(".")[0] in FORBIDDEN_MODULES:
+                errors.append(_issue("forbidden_import", f"Import of '{module}' is not allowed", node))
+    return star_names
+
+
+def preflight(manim_code: str) -> Dict[str, Any]:
+    """
+    Statically validate Manim code.
+
+    Returns:
+        Dictionary with ok flag, discovered scene names, errors and warnings.
+        Each issue has a type, message and line number.
+    """
+    errors, warnings = [], []
+    try:
+        tree = ast.parse(manim_code)
+    except SyntaxError as e:
+        return {
+            "ok": False,
+            "scenes": [],
+            "errors": [{"type": "syntax", "message": e.msg, "line": e.lineno, "column": e.offset}],
+            "warnings": []
+        }
+
+    scenes = discover_scenes(tree)
+    if not scenes:
+        errors.append(_issue("no_scenes", "No Scene subclasses with a construct() method found"))
+
+    star_names = _check_imports(tree, errors, warnings)
+
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id in FORBIDDEN_CALLS):
+            errors.append(_issue("forbidden_call", f"Call to '{node.func.id}()' is not allowed", node))
+
+    if star_names is not None:
+        known = _bound_names(tree) | star_names | set(dir(builtins))
+        reported = set()
+        for node in ast.walk(tree):
+            if (isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)
+                    and node.id not in known and node.id not in reported):
+                reported.add(node.id)
+                errors.append(_issue("unknown_name", f"Name '{node.id}' is not defined", node))
+
+    errors.sort(key=lambda issue: issue["line"] or 0)
+    return {
+        "ok": not errors,
+        "scenes": scenes,
+        "errors": errors[:MAX_ISSUES],
+        "warnings": warnings[:MAX_ISSUES]
+    }
+
+
+def preflight_manim_code(manim_code: str, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Tool function - validate Manim code before rendering it.
+
+    Args:
+        manim_code: Complete Python code containing Manim Scene classes
+        dry_run: Also run every scene through `manim --dry_run` (slower,
+            catches runtime errors such as bad arguments)
+
+    Returns:
+        Dictionary with ok flag, scene names, and structured errors
+    """
+    result = preflight(manim_code)
+    if not dry_run or not result["ok"]:
+        return result
+
+    from tools.local_render import iter_render_scenes
+
+    with tempfile.TemporaryDirectory() as workdir:
+        script_path = os.path.join(workdir, "preflight.py")
+        with open(script_path, "w") as f:
+            f.write(manim_code)
+        for scene_result in iter_render_scenes(script_path, result["scenes"],
+                                               os.path.join(workdir, "media"), dry_run=True):
+            if scene_result["status"] != "success":
+                result["errors"].append({
+                    "type": "dry_run",
+                    "scene": scene_result["scene"],
+                    "message": scene_result["stderr_tail"] or scene_result["status"],
+                    "line": None
+                })
+    result["ok"] = not result["errors"]
+    return result
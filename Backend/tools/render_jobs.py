@@ -0,0 +1,50 @@
+"""
+Render Job Registry
+Collects job completions pushed by the render worker (POST
+/api/render/callback) so render tools can block until their jobs finish
+instead of polling the bucket.
+"""
+
+import threading
+import time
+from typing import Optional
+
+FINISHED = ("done", "failed")
+
+
+class RenderJobRegistry:
+    """Thread-safe map of job_id -> latest job record reported by the worker."""
+
+    def __init__(self, ttl: float = 3600):
+        self.ttl = ttl
+        self._jobs: dict[str, dict] = {}
+        self._changed = threading.Condition()
+
+    def complete(self, job: dict):
+        with self._changed:
+            self._prune()
+            self._jobs[job["job_id"]] = {**job, "received_at": time.time()}
+            self._changed.notify_all()
+
+    def wait(self, job_ids: list[str], timeout: float) -> dict[str, Optional[dict]]:
+        """
+        Block until every job in `job_ids` has reported a finished status or
+        `timeout` elapses. Jobs that never reported map to None.
+        """
+        deadline = time.time() + timeout
+        with self._changed:
+            while True:
+                records = {job_id: self._jobs.get(job_id) for job_id in job_ids}
+                pending = [r for r in records.values() if not r or r["status"] not in FINISHED]
+                remaining = deadline - time.time()
+                if not pending or remaining <= 0:
+                    return records
+                self._changed.wait(remaining)
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [j for j, r in self._jobs.items() if r["received_at"] < cutoff]:
+            del self._jobs[job_id]
+
+
+render_jobs = RenderJobRegistry()
@@ -0,0 +1,133 @@
+"""
+Scene Source Normalization
+Hashes each Scene class by its normalized AST, together with the module
+code it depends on, so that retries which only differ in whitespace,
+comments, docstrings or unrelated scenes map to the same render.
+"""
+
+import ast
+import hashlib
+
+
+def _strip_docstrings(tree: ast.AST) -> ast.AST:
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            body = node.body
+            if (body and isinstance(body[0], ast.Expr)
+                    and isinstance(body[0].value, ast.Constant)
+                    and isinstance(body[0].value.value, str)):
+                node.body = body[1:] or [ast.Pass()]
+    return tree
+
+
+def normalize_source(node: ast.AST) -> str:
+    """Canonical source for a node: no comments, docstrings or formatting."""
+    return ast.unparse(_strip_docstrings(node))
+
+
+def _defined_names(stmt: ast.stmt) -> set[str]:
+    """Names a module-level definition binds (empty for side-effect statements)."""
+    if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return {stmt.name}
+    if isinstance(stmt, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+        targets = stmt.targets if isinstance(stmt, ast.Assign) else [stmt.target]
+        names = set()
+        for target in targets:
+            bound = _target_names(target)
+            if bound is None:
+                # Attribute/subscript assignment (e.g. config.frame_rate = 30) mutates shared state
+                return set()
+            names |= bound
+        return names
+    return set()
+
+
+def _target_names(target: ast.expr):
+    if isinstance(target, ast.Name):
+        return {target.id}
+    if isinstance(target, ast.Starred):
+        return _target_names(target.value)
+    if isinstance(target, (ast.Tuple, ast.List)):
+        names = set()
+        for element in target.elts:
+            bound = _target_names(element)
+            if bound is None:
+                return None
+            names |= bound
+        return names
+    return None
+
+
+def _used_names(node: ast.AST) -> set[str]:
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name)}
+
+
+def scene_digests(manim_code: str, scene_names: list[str]) -> dict[str, str]:
+    """
+    Compute a content hash for each named Scene class.
+
+    A scene's hash covers its own normalized class body, any in-file scene
+    classes it inherits from, and only the module-level code it depends on:
+    imports and other side-effecting statements (e.g. `config.*` changes)
+    always, plus every helper, constant or class it references, followed
+    transitively. Editing one scene, or a helper only one scene uses,
+    therefore changes only that scene's hash.
+
+    Returns:
+        Mapping of scene name to hex digest; empty if the code does not parse
+    """
+    try:
+        tree = ast.parse(manim_code)
+    except SyntaxError:
+        return {}
+
+    wanted = set(scene_names)
+    classes = {}
+    always = []        # (position, source) of imports and side-effect statements
+    definitions = {}   # name -> [(position, stmt)] of module-level definitions
+    for position, stmt in enumerate(tree.body):
+        if isinstance(stmt, ast.ClassDef) and stmt.name in wanted:
+            classes[stmt.name] = stmt
+            continue
+        names = _defined_names(stmt)
+        if names:
+            for name in names:
+                definitions.setdefault(name, []).append((position, stmt))
+        else:
+            always.append((position, normalize_source(stmt)))
+
+    def lineage(name: str, seen: set) -> list[ast.ClassDef]:
+        # `name` and its in-file scene base classes
+        if name in seen or name not in classes:
+            return []
+        seen.add(name)
+        nodes = [classes[name]]
+        for base in classes[name].bases:
+            if isinstance(base, ast.Name):
+                nodes.extend(lineage(base.id, seen))
+        return nodes
+
+    def dependencies(nodes: list[ast.AST]) -> list[tuple[int, str]]:
+        # Module-level definitions reachable from `nodes`, in source order
+        pending = set().union(*(_used_names(node) for node in nodes))
+        visited, included = set(), {}
+        while pending:
+            name = pending.pop()
+            if name in visited:
+                continue
+            visited.add(name)
+            for position, stmt in definitions.get(name, []):
+                if position not in included:
+                    included[position] = normalize_source(stmt)
+                    pending |= _used_names(stmt)
+        return sorted(included.items())
+
+    digests = {}
+    for name in scene_names:
+        if name not in classes:
+            continue
+        scenes = lineage(name, set())
+        prelude = sorted(always + dependencies(scenes))
+        payload = "\n".join([source for _, source in prelude] + [normalize_source(node) for node in scenes])
+        digests[name] = hashlib.sha256(payload.encode()).hexdigest()
+    return digests
@@ -5,6 +5,10 @@ import { useGSAP } from '@gsap/react';
 import { AppState, ProjectData, AnimationScene } from './types';
 import Stickman from './components/Stickman';
 import ChalkBoard from './components/ChalkBoard';
+import LessonPlayer from './components/LessonPlayer';
+import {
+  streamLesson, describeEvent, playlistUrlFrom, finalPlaylistUrlFrom, finalPlaylistReady, StreamResult
+} from './services/api';
 
 // --- Hand-Drawn Chalk Style Decorations ---
 const ChalkDecor: React.FC<{ type: string; className?: string; color?: string }> = ({ type, className, color = "#ffffff" }) => {
@@ -73,6 +77,29 @@ const INITIAL_PROJECT: ProjectData = {
   ]
 };
 
+// Scenes of a finished lesson: the pipeline's storyboard, or the `script`
+// array of a lesson the agent wrote as JSON text
+const scenesFrom = (result: StreamResult): AnimationScene[] => {
+  let lesson = result.lesson;
+  if (!lesson && result.response) {
+    try { lesson = JSON.parse(result.response.replace(/```json\n?|\n?```/g, '')); } catch { lesson = null; }
+  }
+  const storyboard = lesson?.storyboard;
+  const raw: any[] = (Array.isArray(storyboard) ? storyboard : storyboard?.scenes) || lesson?.script || [];
+  if (raw.length === 0 && result.response) {
+    return [{ id: 's1', title: 'GENERATED RESPONSE', narrative: result.response.substring(0, 100) + "...", stickmanAction: 'explaining', assetId: '1', mathContent: 'EQUATION', duration: 10 }];
+  }
+  return raw.map((s: any, i: number) => ({
+    id: s.id || `s${i + 1}`,
+    title: `SCENE ${i + 1}`,
+    narrative: s.narration?.voice_over || s.narration || s.narrative || "...",
+    stickmanAction: ['pointing', 'explaining', 'thinking'][i % 3] as any,
+    assetId: '1',
+    mathContent: ['EQUATION', 'INTEGRAL', 'WAVE', 'SIGMA', 'PI'][i % 5],
+    duration: s.duration_seconds || s.duration || 5
+  }));
+};
+
 const App: React.FC = () => {
   const [state, setState] = useState<AppState>(AppState.IDLE);
   const [project, setProject] = useState<ProjectData>(INITIAL_PROJECT);
@@ -85,6 +112,12 @@ const App: React.FC = () => {
   const [isModelSpeaking, setIsModelSpeaking] = useState(false);
   const [chatInput, setChatInput] = useState('');
   const [transcriptions, setTranscriptions] = useState<{ text: string, sender: 'user' | 'model' }[]>([]);
+  // Progress lines from the lesson stream, newest last
+  const [progressLog, setProgressLog] = useState<string[]>([]);
+  // HLS playlist of the rendered lesson, playable while scenes still render
+  const [playlistUrl, setPlaylistUrl] = useState<string | null>(null);
+  // Final-quality playlist, played in place of the preview once it exists
+  const [finalPlaylistUrl, setFinalPlaylistUrl] = useState<string | null>(null);
 
   const playRef = useRef<number | null>(null);
 
@@ -167,34 +200,50 @@ const App: React.FC = () => {
 
   const [isLoading, setIsLoading] = useState(false);
 
+  // The preview playlist never changes once ended, so the upgrade to final
+  // quality is a switch to the separate final playlist when it appears
+  useEffect(() => {
+    if (!finalPlaylistUrl || playlistUrl === finalPlaylistUrl) return;
+    let cancelled = false;
+    const check = async () => {
+      if (await finalPlaylistReady(finalPlaylistUrl) && !cancelled) {
+        setPlaylistUrl(finalPlaylistUrl);
+        setProgressLog(log => [...log, 'Switched to final quality']);
+      }
+    };
+    check();
+    const timer = window.setInterval(check, 10000);
+    return () => { cancelled = true; clearInterval(timer); };
+  }, [finalPlaylistUrl, playlistUrl]);
+
   const handleVisualizeClick = async () => {
     if (!topicInput.trim()) return;
     setIsLoading(true);
     setSelectedFileName(topicInput);
+    setProgressLog([]);
+    setPlaylistUrl(null);
+    setFinalPlaylistUrl(null);
+    // Open the editor right away; progress shows in the console panel
+    setTimeout(() => setState(AppState.EDITOR), 800);
 
     try {
-      const result = await import('./services/api').then(m => m.generateLesson(topicInput));
-      let newScenes: AnimationScene[] = [];
-      if (typeof result === 'object' && 'script' in result && Array.isArray(result.script)) {
-        newScenes = result.script.map((s: any, i: number) => ({
-          id: s.id || `s${i + 1}`,
-          title: `SCENE ${i + 1}`,
-          narrative: s.narration || s.narrative || "...",
-          stickmanAction: ['pointing', 'explaining', 'thinking'][i % 3] as any,
-          assetId: '1',
-          mathContent: ['EQUATION', 'INTEGRAL', 'WAVE', 'SIGMA', 'PI'][i % 5],
-          duration: s.duration || 5
-        }));
-      } else if (typeof result === 'string') {
-        newScenes = [{
-          id: 's1', title: 'GENERATED RESPONSE', narrative: result.substring(0, 100) + "...", stickmanAction: 'explaining', assetId: '1', mathContent: 'EQUATION', duration: 10
-        }];
+      const result = await streamLesson(topicInput, event => {
+        const line = describeEvent(event);
+        if (line) setProgressLog(log => [...log, line]);
+        const url = playlistUrlFrom(event);
+        if (url) setPlaylistUrl(url);
+        const finalUrl = finalPlaylistUrlFrom(event);
+        if (finalUrl) setFinalPlaylistUrl(finalUrl);
+      });
+      const newScenes = scenesFrom(result);
+      if (newScenes.length > 0) {
+        setCurrentSceneIndex(0);
+        setProject(prev => ({ ...prev, scenes: newScenes }));
       }
-      if (newScenes.length > 0) setProject(prev => ({ ...prev, scenes: newScenes }));
-      setTimeout(() => setState(AppState.EDITOR), 800);
+      setProgressLog(log => [...log, 'Lesson ready']);
     } catch (error) {
       console.error("Failed to generate lesson:", error);
-      setTimeout(() => setState(AppState.EDITOR), 800);
+      setProgressLog(log => [...log, `Failed: ${(error as Error).message}`]);
     } finally {
       setIsLoading(false);
     }
@@ -265,11 +314,17 @@ const App: React.FC = () => {
       <div className="editor-layout overflow-y-auto bg-[#080808]">
         <div className="flex gap-10 items-stretch h-full">
           <div className="viewport-container flex-[5] min-h-[600px] flex flex-col p-0 overflow-hidden relative border-[#222] bg-[#0c0c0c]">
-            <div ref={stickmanContainer} className="absolute bottom-36 right-16 w-[240px] h-[280px] z-20 pointer-events-none">
-              <Stickman action={isModelSpeaking ? 'explaining' : currentScene.stickmanAction} color="#f8e16c" style="sketchy" />
-            </div>
-            <div className="flex-1 flex flex-col items-center justify-center p-20 relative">
-              <div ref={mathContainer} className="w-full max-w-6xl"><ChalkDecor type={currentScene.mathContent} className="w-full h-auto max-h-[500px]" color="#ffffff" /></div>
+            {!playlistUrl && (
+              <div ref={stickmanContainer} className="absolute bottom-36 right-16 w-[240px] h-[280px] z-20 pointer-events-none">
+                <Stickman action={isModelSpeaking ? 'explaining' : currentScene.stickmanAction} color="#f8e16c" style="sketchy" />
+              </div>
+            )}
+            <div className={`flex-1 flex flex-col items-center justify-center relative ${playlistUrl ? 'p-6' : 'p-20'}`}>
+              {playlistUrl ? (
+                <LessonPlayer src={playlistUrl} className="w-full max-w-6xl max-h-full rounded-2xl bg-black" />
+              ) : (
+                <div ref={mathContainer} className="w-full max-w-6xl"><ChalkDecor type={currentScene.mathContent} className="w-full h-auto max-h-[500px]" color="#ffffff" /></div>
+              )}
             </div>
             <div className="bg-black/90 border-t-[2px] border-[#222] p-5 px-10 flex items-center gap-10 relative z-30">
               <button onClick={() => setIsPlaying(!isPlaying)} className="w-14 h-14 bg-[#f8e16c] text-black rounded-2xl flex items-center justify-center transition-all shadow-[0_0_25px_rgba(248,225,108,0.2)]">
@@ -287,7 +342,15 @@ const App: React.FC = () => {
               <div className="ai-card-notch !bg-[#121212] !border-[#222] !text-[#f8e16c] !text-[11px] !py-3">CONSULTANT_OPERATOR_v2.4</div>
               <div className="ai-card-body h-full flex flex-col gap-8 !bg-[#121212] !border-[#222] !p-8">
                 <div className="flex-1 overflow-y-auto custom-log-scroll mono text-[12px] leading-relaxed opacity-90 pr-4">
-                  <div className="italic opacity-30 px-4 py-8 border-2 border-dashed border-white/10 rounded-3xl chalk-font text-2xl text-center">"Live communication is currently handled by the backend."</div>
+                  {progressLog.length > 0 ? (
+                    <ul className="flex flex-col gap-2">
+                      {progressLog.map((line, i) => (
+                        <li key={i} className={i === progressLog.length - 1 && isLoading ? 'text-[#f8e16c]' : 'text-white/70'}>› {line}</li>
+                      ))}
+                    </ul>
+                  ) : (
+                    <div className="italic opacity-30 px-4 py-8 border-2 border-dashed border-white/10 rounded-3xl chalk-font text-2xl text-center">"Live communication is currently handled by the backend."</div>
+                  )}
                 </div>
               </div>
             </div>
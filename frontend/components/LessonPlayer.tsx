@@ -0,0 +1,48 @@
+import React, { useEffect, useRef } from 'react';
+
+// hls.js is loaded from the CDN in index.html, like pdf.js and KaTeX
+declare global {
+  interface Window { Hls?: any; }
+}
+
+interface LessonPlayerProps {
+  // HLS playlist of the lesson; changing it keeps the playback position
+  src: string;
+  className?: string;
+}
+
+const LessonPlayer: React.FC<LessonPlayerProps> = ({ src, className }) => {
+  const video = useRef<HTMLVideoElement>(null);
+
+  useEffect(() => {
+    const el = video.current;
+    if (!el) return;
+    const resumeAt = el.currentTime;
+    const wasPlaying = !el.paused;
+    const resume = () => {
+      if (resumeAt > 0) el.currentTime = resumeAt;
+      if (wasPlaying) el.play().catch(() => {});
+    };
+
+    // Safari and iOS play HLS natively; everything else goes through hls.js
+    if (el.canPlayType('application/vnd.apple.mpegurl')) {
+      el.src = src;
+      el.addEventListener('loadedmetadata', resume, { once: true });
+      return () => el.removeEventListener('loadedmetadata', resume);
+    }
+    const Hls = window.Hls;
+    if (!Hls?.isSupported()) {
+      console.error("HLS playback is not supported in this browser");
+      return;
+    }
+    const hls = new Hls();
+    hls.loadSource(src);
+    hls.attachMedia(el);
+    hls.on(Hls.Events.MANIFEST_PARSED, resume);
+    return () => hls.destroy();
+  }, [src]);
+
+  return <video ref={video} className={className} controls playsInline />;
+};
+
+export default LessonPlayer;
@@ -1,6 +1,13 @@
 
 const API_URL = (import.meta as any).env?.VITE_API_URL || '/api/agent';
 
+// Session returned by the backend; sent back so follow-up prompts continue it
+let sessionId: string | undefined;
+
+export const resetSession = () => {
+    sessionId = undefined;
+};
+
 export interface AgentResponse {
     explanation: string;
     script: any[];
@@ -14,7 +21,7 @@ export const generateLesson = async (prompt: string): Promise<AgentResponse | st
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ prompt }),
+            body: JSON.stringify({ prompt, session_id: sessionId }),
         });
 
         if (!response.ok) {
@@ -23,6 +30,7 @@ export const generateLesson = async (prompt: string): Promise<AgentResponse | st
         }
 
         const data = await response.json();
+        if (data?.session_id) sessionId = data.session_id;
 
         // The agent might return a JSON string or a direct object depending on how google.adk behaves
         // and how process_request parses the output.
@@ -44,3 +52,110 @@ export const generateLesson = async (prompt: string): Promise<AgentResponse | st
         throw error;
     }
 };
+
+export interface AgentStreamEvent {
+    event: 'agent' | 'handoff' | 'tool_call' | 'tool_response' | 'render' | 'text' | 'done' | 'error';
+    data: any;
+}
+
+// HLS playlist of the lesson, from a `render` event. It lists every scene that
+// has finished so far and grows as the rest render, so playback can start
+// on scene 1 right away (hls.js, or natively in Safari).
+export const playlistUrlFrom = (event: AgentStreamEvent): string | null =>
+    event.event === 'render' ? event.data?.response?.playlist_url ?? null : null;
+
+// Final-quality playlist of the lesson, from the same `render` event. It only
+// exists once every final render is done; poll it with finalPlaylistReady
+// and switch the player over when it appears.
+export const finalPlaylistUrlFrom = (event: AgentStreamEvent): string | null =>
+    event.event === 'render' ? event.data?.response?.final_playlist_url ?? null : null;
+
+export const finalPlaylistReady = async (url: string): Promise<boolean> => {
+    try {
+        const response = await fetch(url, { method: 'HEAD', cache: 'no-store' });
+        return response.ok;
+    } catch {
+        return false;
+    }
+};
+
+// Payload of the final `done` event
+export interface StreamResult {
+    response: string;
+    lesson: any | null;
+    session_id?: string;
+}
+
+// One human-readable progress line for a stream event, or null for events
+// not worth showing (e.g. partial text tokens)
+export const describeEvent = (event: AgentStreamEvent): string | null => {
+    const { data } = event;
+    switch (event.event) {
+        case 'agent': return `${data.agent} is working...`;
+        case 'handoff': return `${data.from} → ${data.to}`;
+        case 'tool_call': return `${data.agent}: calling ${data.name}`;
+        case 'tool_response': return `${data.agent}: ${data.name} finished`;
+        case 'render': return data.response?.message || `${data.name} finished`;
+        case 'error': return `Error: ${data.detail}`;
+        default: return null;
+    }
+};
+
+// Streams the same pipeline as generateLesson via Server-Sent Events, calling
+// onEvent for every agent handoff, tool call, render dispatch and text chunk.
+// Resolves with the `done` event's payload (response text and lesson JSON).
+export const streamLesson = async (
+    prompt: string,
+    onEvent: (event: AgentStreamEvent) => void,
+): Promise<StreamResult> => {
+    const response = await fetch(`${API_URL}/stream`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+        },
+        body: JSON.stringify({ prompt, session_id: sessionId }),
+    });
+
+    if (!response.ok || !response.body) {
+        throw new Error(`Error: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result: StreamResult = { response: '', lesson: null };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // SSE messages are separated by a blank line
+        let boundary = buffer.indexOf('\n\n');
+        while (boundary !== -1) {
+            const message = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            boundary = buffer.indexOf('\n\n');
+
+            let eventName = 'message';
+            let data = '';
+            for (const line of message.split('\n')) {
+                if (line.startsWith('event: ')) eventName = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            if (!data) continue;
+
+            const parsed = JSON.parse(data);
+            onEvent({ event: eventName as AgentStreamEvent['event'], data: parsed });
+
+            if (eventName === 'done') {
+                result = parsed;
+                if (parsed.session_id) sessionId = parsed.session_id;
+            }
+            if (eventName === 'error') throw new Error(parsed.detail);
+        }
+    }
+
+    return result;
+};